@@ -1,20 +1,66 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.services.auth_service import AuthService
-from app.core.security import get_current_user
-from app.models.schemas import UserInDB
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Body, Depends, Query
+
+from app.core.security import require_admin
+from app.models.schemas import UserInDB, UserRolesBulkUpdate
+from app.services.analytics_service import AnalyticsService
+from app.services.user_directory_service import UserDirectoryService
+
+router = APIRouter(prefix="/api/v1/admin", tags=["admin"])
+
+
+@router.get("/users")
+async def list_users(
+    email: Optional[str] = Query(None, description="Email prefix"),
+    name: Optional[str] = Query(None, description="Name prefix, case-insensitive"),
+    role: Optional[str] = Query(None, description="Role name"),
+    strategy: Optional[str] = Query(None, description="Login provider: google or facebook"),
+    status: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: UserInDB = Depends(require_admin),
+):
+    """
+    Browse users matching all the given filters, one page at a time.
+    Pass the returned ``next_cursor`` to get the next page; it is null on the last page.
+    """
+    return await UserDirectoryService().list_users(
+        email_prefix=email, name_prefix=name, role=role, strategy=strategy, status=status,
+        cursor=cursor, limit=limit,
+    )
+
+
+@router.post("/users/roles")
+async def bulk_update_roles(
+    body: UserRolesBulkUpdate = Body(...),
+    current_user: UserInDB = Depends(require_admin),
+):
+    """Add and/or remove roles (by name) of up to 10,000 users at once; returns the write counts."""
+    return await UserDirectoryService().bulk_update_roles(body.user_ids, body.add, body.remove)
 
-router = APIRouter(prefix="/admin", tags=["admin"])
 
 @router.patch("/users/{user_id}/role")
 async def update_user_role(
     user_id: str,
     new_role: str,
-    auth_service: AuthService = Depends(AuthService),
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: UserInDB = Depends(require_admin),
+):
+    """Replace the roles of a user by ``new_role``."""
+    return await UserDirectoryService().update_user_role(user_id, new_role)
+
+
+@router.get("/analytics/logins")
+async def login_analytics(
+    period: str = Query("day", description="hour or day"),
+    since: Optional[datetime] = Query(None, description="Defaults to 30 days before until"),
+    until: Optional[datetime] = Query(None, description="Defaults to now"),
+    current_user: UserInDB = Depends(require_admin),
 ):
-    # Seul un admin peut modifier les rôles
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Permission denied")
-    
-    user = await auth_service.update_user_role(user_id, new_role)
-    return user
\ No newline at end of file
+    """
+    Signups and returning logins by provider, active users and total logins per hour or day,
+    read from the rollups (UTC buckets).
+    """
+    rollups = await AnalyticsService().get_rollups(period, since, until)
+    return {"period": period, "rollups": rollups}
@@ -1,12 +1,11 @@
 from fastapi import APIRouter, HTTPException, Request, Response, Query, Cookie, Body, Depends, Header
 from fastapi.responses import RedirectResponse
 from pydantic import BaseModel
-from authlib.integrations.starlette_client import OAuth
 from starlette.config import Config
 from app.core.config import settings
-from app.services.auth_service import AuthService
+from app.services.auth_service import AuthService, get_user_etags, user_etag
 from app.models.schemas import UserInDB, UserUpdate
-from app.core.security import create_access_token, create_refresh_token, decode_access_token, decode_refresh_token, get_current_user
+from app.core.security import create_access_token, create_refresh_token, decode_access_token, decode_refresh_token, get_current_user, verify_access_token, revoke_access_token
 from app.utils.logger import logger
 from jose import jwt, JWTError
 import traceback
@@ -18,37 +17,134 @@ from app.models.database import db
 from urllib.parse import urlencode, quote
 from fastapi.responses import JSONResponse
 from app.utils.encoders import custom_jsonable_encoder
+from app.utils.etag import etag_matches, not_modified, set_etag
+from app.services.login_handoff import get_login_handoff_store
+import asyncio
 router = APIRouter(prefix="/api/v1/auth", tags=["auth-web"])
-oauth = OAuth()
-
-# Configure OAuth providers
-oauth.register(
-    name="google",
-    client_id=settings.GOOGLE_CLIENT_ID,
-    client_secret=settings.GOOGLE_CLIENT_SECRET,
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
-    client_kwargs={'scope': 'openid email profile'}
-)
-
-oauth.register(
-    name="facebook",
-    client_id=settings.FACEBOOK_CLIENT_ID,
-    client_secret=settings.FACEBOOK_CLIENT_SECRET,
-    authorize_url="https://www.facebook.com/v10.0/dialog/oauth",
-    access_token_url="https://graph.facebook.com/v10.0/oauth/access_token",
-    client_kwargs={"scope": "email"},
-)
+_oauth = None
+
+
+def get_oauth():
+    """OAuth clients, created on the first login: authlib and its dependencies take a large
+    share of the worker's import time."""
+    global _oauth
+    if _oauth is None:
+        from authlib.integrations.starlette_client import OAuth
+
+        _oauth = OAuth()
+        # Configure OAuth providers
+        _oauth.register(
+            name="google",
+            client_id=settings.GOOGLE_CLIENT_ID,
+            client_secret=settings.GOOGLE_CLIENT_SECRET,
+            server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
+            client_kwargs={'scope': 'openid email profile'}
+        )
+        _oauth.register(
+            name="facebook",
+            client_id=settings.FACEBOOK_CLIENT_ID,
+            client_secret=settings.FACEBOOK_CLIENT_SECRET,
+            authorize_url="https://www.facebook.com/v10.0/dialog/oauth",
+            access_token_url="https://graph.facebook.com/v10.0/oauth/access_token",
+            client_kwargs={"scope": "email"},
+        )
+    return _oauth
 
 class RefreshTokenRequest(BaseModel):
     refresh_token: str
 
+
+class HandoffRequest(BaseModel):
+    code: str
+
+
+async def user_not_modified(request: Request, email: str, auth_service: AuthService):
+    """304 response when the client's cached user is current, checked without reading the user
+    when this worker knows its revision."""
+    if not request.headers.get("if-none-match"):
+        return None
+    etag = get_user_etags().get(email) or await auth_service.get_user_etag(email)
+    if etag and etag_matches(request, etag):
+        return not_modified(etag)
+    return None
+
+
+def set_user_etag(response: Response, email: str, user: UserInDB):
+    etag = user_etag(user.id, user.revision, user.updated_at)
+    get_user_etags().put(email, etag)
+    set_etag(response, etag)
+
+
+async def login_user_data(user: UserInDB) -> dict:
+    """The user returned to the frontend after a login, with its roles resolved."""
+    user_data = user.model_dump(by_alias=True, exclude={"refresh_token"})
+    user_data["_id"] = str(user_data["_id"])
+    user_data.setdefault("roles", [])
+    if user_data["roles"]:
+        roles = await db.roles.find({
+            "_id": {"$in": [ObjectId(rid) for rid in user_data["roles"]]},
+        }).to_list(length=None)
+        user_data["roles"] = [
+            {"_id": str(r["_id"]), "name": r["name"], "permissions": r["permissions"]}
+            for r in roles
+        ]
+    return user_data
+
+
+def set_auth_cookies(response: Response, access_token: str, refresh_token: str):
+    # Refresh token (HttpOnly)
+    response.set_cookie(
+        key="refresh_token",
+        value=refresh_token,
+        httponly=True,
+        secure=settings.ENV == "production",
+        samesite="Lax",
+        max_age=settings.REFRESH_TOKEN_EXPIRE_MINUTES * 60
+    )
+    # Access token (HttpOnly) - short lived
+    response.set_cookie(
+        key="access_token",
+        value=access_token,
+        httponly=True,
+        secure=settings.ENV == "production",
+        samesite="Lax",
+        max_age=60 * 15  # 15 minutes
+    )
+
+
+async def login_redirect(user: UserInDB, state: str = None) -> RedirectResponse:
+    """
+    Redirect to the frontend after an OAuth login, with the tokens in HttpOnly cookies.
+
+    In handoff mode the URL only carries a single-use code, exchanged by the callback page
+    at POST /handoff; the user is not serialized (nor its roles read) during the callback.
+    """
+    frontend_redirect = state or settings.FRONTEND_CALLBACK_URI
+    if settings.LOGIN_HANDOFF:
+        code = await asyncio.to_thread(get_login_handoff_store().create, {"email": user.email})
+        redirect_url = f"{frontend_redirect}?{urlencode({'code': code})}"
+    else:
+        user_data = await login_user_data(user)
+        redirect_url = f"{frontend_redirect}?user={quote(json.dumps(user_data, default=str))}"
+
+    # get_or_create_user has just stored a new refresh token for this login
+    refresh_token = user.refresh_token
+    if not refresh_token:
+        refresh_token = create_refresh_token(data={"sub": user.email})
+        await AuthService().update_refresh_token(user.email, refresh_token)
+
+    redirect_resp = RedirectResponse(url=redirect_url, status_code=303)
+    set_auth_cookies(redirect_resp, create_access_token(data={"sub": user.email}), refresh_token)
+    return redirect_resp
+
+
 @router.get("/login/google")
 async def login_google(request: Request, redirect_uri: str = Query(settings.FRONTEND_CALLBACK_URI)):
     request_id = str(uuid.uuid4())
     try:
         logger.info("Initiating Google login", extra={"request_id": request_id, "frontend_redirect_uri": redirect_uri})
 
-        return await oauth.google.authorize_redirect(
+        return await get_oauth().google.authorize_redirect(
             request,
             redirect_uri=settings.GOOGLE_REDIRECT_URI,
             state=redirect_uri   # Pass frontend redirect URI through state
@@ -71,11 +167,8 @@ async def callback_google(
     logger.info("Google callback initiated", extra={"request_id": request_id, "state": state, "code": code})
     try:
         # Exchange code for tokens
-        token = await oauth.google.authorize_access_token(request)
-        logger.debug(f"Google OAuth token response: {json.dumps(token, indent=2)}")
-
+        token = await get_oauth().google.authorize_access_token(request)
         userinfo = token.get("userinfo")
-        logger.debug(f"Google userinfo: {json.dumps(userinfo, indent=2)}")
 
         if not userinfo:
             logger.error("Missing user information from Google", extra={"request_id": request_id, "token": token})
@@ -84,75 +177,8 @@ async def callback_google(
         # Process user authentication
         auth_service = AuthService()
         user = await auth_service.get_or_create_user(userinfo)
-        access_token = create_access_token(data={"sub": user.email})
-        refresh_token = create_refresh_token(data={"sub": user.email})
-
-        # Update user's refresh token
-        await auth_service.update_refresh_token(user.email, refresh_token)
-
-        # Prepare user data
-        user_data = user.model_dump(by_alias=True)
-        user_data["_id"] = str(user_data["_id"])
-        #user_data.pop("refresh_token", None)
-
-        # Handle roles
-        user_data.setdefault("roles", [])
-        if user_data["roles"]:
-            roles = await db.roles.find({
-                "_id": {"$in": [ObjectId(rid) for rid in user_data["roles"]]},
-            }).to_list(length=None)
-            user_data["roles"] = [
-                {"_id": str(r["_id"]), "name": r["name"], "permissions": r["permissions"]}
-                for r in roles
-            ]
-
-        # Prepare redirect URL and strip sensitive fields from user_data
-        user_data.pop("refresh_token", None)
-        frontend_redirect = state or settings.FRONTEND_CALLBACK_URI
-        user_data_json = json.dumps(user_data, default=str)
-        user_data_encoded = quote(user_data_json)
-        redirect_url = f"{frontend_redirect}?user={user_data_encoded}"
-
-        # Build redirect response and attach cookies to it so browser receives them
-        redirect_resp = RedirectResponse(url=redirect_url, status_code=303)
-        # Refresh token (HttpOnly)
-        redirect_resp.set_cookie(
-            key="refresh_token",
-            value=refresh_token,
-            httponly=True,
-            secure=settings.ENV == "production",
-            samesite="Lax",
-            max_age=settings.REFRESH_TOKEN_EXPIRE_MINUTES * 60
-        )
-        # Access token (HttpOnly) - short lived
-        redirect_resp.set_cookie(
-            key="access_token",
-            value=access_token,
-            httponly=True,
-            secure=settings.ENV == "production",
-            samesite="Lax",
-            max_age=60 * 15  # 15 minutes
-        )
-
-        # Redirect to frontend
-        frontend_redirect = state or settings.FRONTEND_CALLBACK_URI
-        access_token_encoded = quote(access_token)
-        token_type_encoded = quote("bearer")
-        user_data_json = json.dumps(user_data, default=str)
-        user_data_encoded = quote(user_data_json)
-
-        # Redirect to frontend with user info only (tokens are stored in HttpOnly cookies)
-        redirect_url = f"{frontend_redirect}?user={user_data_encoded}"
-
-        # Log the final response data
-        response_data = {
-            "token_type": "bearer",
-            "user": user_data,
-            "redirect_url": redirect_url
-        }
-        logger.debug(f"Final response data: {json.dumps(response_data, indent=2, default=str)}")
+        redirect_resp = await login_redirect(user, state)
         logger.info(f"Google auth successful for {user.email}", extra={"request_id": request_id})
-        logger.info(f"Redirecting to frontend", extra={"request_id": request_id, "redirect_url": redirect_url})
         return redirect_resp
 
     except HTTPException as he:
@@ -167,7 +193,7 @@ async def callback_google(
 
 @router.get("/login/facebook")
 async def login_facebook(request: Request, redirect_uri: str = Query(settings.FRONTEND_CALLBACK_URI)):
-    return await oauth.facebook.authorize_redirect(
+    return await get_oauth().facebook.authorize_redirect(
         request,
         redirect_uri=settings.FACEBOOK_REDIRECT_URI,
         state=redirect_uri  # Ajouter le state
@@ -183,8 +209,8 @@ async def callback_facebook(
     logger.info("Facebook callback initiated", extra={"request_id": request_id, "state": state, "code": code})
     try:
         # Exchange code for tokens
-        token = await oauth.facebook.authorize_access_token(request)
-        userinfo_response = await oauth.facebook.get(
+        token = await get_oauth().facebook.authorize_access_token(request)
+        userinfo_response = await get_oauth().facebook.get(
             "https://graph.facebook.com/me?fields=id,name,email,picture",
             token=token
         )
@@ -199,63 +225,8 @@ async def callback_facebook(
         auth_service = AuthService()
         user = await auth_service.get_or_create_user(userinfo)
 
-        # Generate tokens
-        access_token = create_access_token(data={"sub": user.email})
-        refresh_token = create_refresh_token(data={"sub": user.email})
-
-        # Update user's refresh token
-        await auth_service.update_refresh_token(user.email, refresh_token)
-
-        # Prepare user data
-        user_data = user.model_dump(by_alias=True)
-        user_data["_id"] = str(user_data["_id"])
-
-        # Handle roles
-        user_data.setdefault("roles", [])
-        if user_data["roles"]:
-            roles = await db.roles.find({
-                "_id": {"$in": [ObjectId(rid) for rid in user_data["roles"]]},
-            }).to_list(length=None)
-            user_data["roles"] = [
-                {"_id": str(r["_id"]), "name": r["name"], "permissions": r["permissions"]}
-                for r in roles
-            ]
-
-        # Remove refresh token from user payload and build redirect
-        user_data.pop("refresh_token", None)
-        frontend_redirect = state or settings.FRONTEND_CALLBACK_URI
-        user_data_json = json.dumps(user_data, default=str)
-        user_data_encoded = quote(user_data_json)
-        redirect_url = f"{frontend_redirect}?user={user_data_encoded}"
-
-        # Build redirect response and set cookies on it
-        redirect_resp = RedirectResponse(url=redirect_url, status_code=303)
-        redirect_resp.set_cookie(
-            key="refresh_token",
-            value=refresh_token,
-            httponly=True,
-            secure=settings.ENV == "production",
-            samesite="lax",
-            max_age=settings.REFRESH_TOKEN_EXPIRE_MINUTES * 60
-        )
-        # Also set short lived access token cookie
-        redirect_resp.set_cookie(
-            key="access_token",
-            value=access_token,
-            httponly=True,
-            secure=settings.ENV == "production",
-            samesite="lax",
-            max_age=60 * 15
-        )
-
-        response_data = {
-            "token_type": "bearer",
-            "user": user_data,
-            "redirect_url": redirect_url
-        }
-        logger.debug(f"Final response data: {json.dumps(response_data, indent=2, default=str)}")
+        redirect_resp = await login_redirect(user, state)
         logger.info(f"Facebook auth successful for {user.email}", extra={"request_id": request_id})
-        logger.info(f"Redirecting to frontend", extra={"request_id": request_id, "redirect_url": redirect_url})
         return redirect_resp
 
     except HTTPException as he:
@@ -424,7 +395,7 @@ async def refresh_tokens(
     
     
 @router.post("/logout")
-async def logout(response: Response, refresh_token: str = Body(...)):
+async def logout(request: Request, response: Response, refresh_token: str = Body(...)):
     try:
         if not refresh_token:
             raise HTTPException(status_code=400, detail="Refresh token missing")
@@ -446,6 +417,11 @@ async def logout(response: Response, refresh_token: str = Body(...)):
         await auth_service.update_refresh_token(user.email, None)
         print(f"Refresh token cleared in database for user: {user.email}")
 
+        # The access token presented with the request stops working too
+        authorization = request.headers.get("authorization", "")
+        if authorization.startswith("Bearer "):
+            await revoke_access_token(authorization.split(" ")[1])
+
         # Clear cookie
         response.delete_cookie("refresh_token")
         print("Refresh token cookie deleted")
@@ -476,8 +452,9 @@ async def logout_cookies(request: Request, response: Response):
             response.delete_cookie("access_token")
             raise HTTPException(status_code=401, detail="Invalid refresh token")
 
-        # Clear refresh token in DB
+        # Clear refresh token in DB and revoke the access token cookie
         await auth_service.update_refresh_token(user.email, None)
+        await revoke_access_token(request.cookies.get("access_token"))
 
         # Delete cookies
         response.delete_cookie("refresh_token")
@@ -522,7 +499,7 @@ async def update_profile(
         print(f"Received access_token: {access_token}")
         # Decode and validate token
         try:
-            payload = decode_access_token(access_token)
+            payload = await verify_access_token(access_token)
             print(f"Decoded payload: {payload}")
             email = payload.get("sub")
             if not email:
@@ -551,8 +528,9 @@ async def update_profile(
         try:
             result = await db.users.update_one(
                 {"email": email},
-                {"$set": update_data}
+                {"$set": update_data, "$inc": {"revision": 1}}
             )
+            get_user_etags().invalidate(email)
             
             if result.modified_count == 0:
                 logger.warning(f"No changes made for user {email}")
@@ -601,7 +579,7 @@ async def update_profile_cookie(
         if not access_token:
             raise HTTPException(status_code=401, detail="Access token missing")
 
-        payload = decode_access_token(access_token)
+        payload = await verify_access_token(access_token)
         email = payload.get("sub")
         if not email:
             raise HTTPException(status_code=401, detail="Invalid token")
@@ -628,7 +606,7 @@ async def update_profile_cookie(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/getMe")
-async def get_me(authorization: str = Header(...)):
+async def get_me(response: Response, request: Request, authorization: str = Header(...)):
     print(f"Authorization header: {authorization}")
     """
     Retrieve the currently authenticated user's information.
@@ -642,18 +620,22 @@ async def get_me(authorization: str = Header(...)):
             raise HTTPException(status_code=401, detail="Invalid authorization header")
         
         access_token = authorization.split(" ")[1]
-        payload = decode_access_token(access_token)
+        payload = await verify_access_token(access_token)
         email = payload.get("sub")
         
         if not email:
             raise HTTPException(status_code=401, detail="Invalid token")
 
         auth_service = AuthService()
+        unchanged = await user_not_modified(request, email, auth_service)
+        if unchanged:
+            return unchanged
         user = await auth_service.get_user_by_email(email)
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
+        set_user_etag(response, email, user)
         user_data = user.model_dump(by_alias=True)
         user_data["_id"] = str(user_data["_id"])
         
@@ -681,23 +663,29 @@ async def get_me(authorization: str = Header(...)):
 
 
 @router.get("/session")
-async def get_session(request: Request):
-    """Return current user based on access_token cookie (HttpOnly)."""
+async def get_session(request: Request, response: Response):
+    """Return current user based on access_token cookie (HttpOnly).
+    Responses carry an ETag: a matching If-None-Match gets an empty 304.
+    """
     try:
         access_token = request.cookies.get("access_token")
         if not access_token:
             raise HTTPException(status_code=401, detail="Access token missing")
 
-        payload = decode_access_token(access_token)
+        payload = await verify_access_token(access_token)
         email = payload.get("sub")
         if not email:
             raise HTTPException(status_code=401, detail="Invalid token")
 
         auth_service = AuthService()
+        unchanged = await user_not_modified(request, email, auth_service)
+        if unchanged:
+            return unchanged
         user = await auth_service.get_user_by_email(email)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
+        set_user_etag(response, email, user)
         # Dump the Pydantic model to a dict and ensure any ObjectId values are converted to strings
         user_data = user.model_dump(by_alias=True)
 
@@ -726,6 +714,27 @@ async def get_session(request: Request):
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@router.post("/handoff")
+async def exchange_handoff(handoff: HandoffRequest = Body(...)):
+    """Exchange the single-use code of a login redirect for the logged in user."""
+    try:
+        payload = await asyncio.to_thread(get_login_handoff_store().redeem, handoff.code)
+        if not payload:
+            raise HTTPException(status_code=404, detail="Unknown or expired login code")
+
+        user = await AuthService().get_user_by_email(payload["email"])
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        user_data = await login_user_data(user)
+        return {"user": user_data}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error exchanging login code: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
 @router.get("/debug/cookies")
 async def debug_cookies(request: Request):
     """DEV DEBUG: return cookies sent by the browser for inspection."""
@@ -5,7 +5,7 @@ from starlette.config import Config
 from app.core.config import settings
 from app.services.auth_service import AuthService
 from app.models.schemas import UserInDB
-from app.core.security import create_access_token, create_refresh_token, decode_access_token, decode_refresh_token
+from app.core.security import create_access_token, create_refresh_token, decode_access_token, decode_refresh_token, verify_access_token
 from app.utils.logger import logger  # Importer le logger global
 from jose import jwt, JWTError
 import traceback
@@ -207,7 +207,7 @@ async def decode_token(token: str):
     })
 async def me(token: str):
     try:
-        payload = decode_access_token(token)
+        payload = await verify_access_token(token)
         email = payload.get("sub")
         if email is None:
             raise HTTPException(status_code=401, detail="Invalid token")
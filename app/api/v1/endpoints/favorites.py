@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends
+
+from app.core.security import require_token_email
+from app.models.schemas import FavoritesMerge, FavoritesUpdate
+from app.services.favorites_service import FavoritesService
+
+router = APIRouter(prefix="/api/v1/favorites", tags=["favorites"])
+
+
+@router.get("")
+async def list_favorites(email: str = Depends(require_token_email)):
+    """Favorite product ids, most recently added first."""
+    return {"product_ids": await FavoritesService().get_favorite_ids(email)}
+
+
+@router.get("/products")
+async def favorite_products(email: str = Depends(require_token_email)):
+    """Full product records of every favorite, in one request."""
+    return {"items": await FavoritesService().get_favorite_products(email)}
+
+
+@router.post("")
+async def add_favorites(body: FavoritesUpdate, email: str = Depends(require_token_email)):
+    return {"product_ids": await FavoritesService().add_favorites(email, body.product_ids)}
+
+
+@router.post("/remove")
+async def remove_favorites(body: FavoritesUpdate, email: str = Depends(require_token_email)):
+    return {"product_ids": await FavoritesService().remove_favorites(email, body.product_ids)}
+
+
+@router.post("/merge")
+async def merge_favorites(body: FavoritesMerge, email: str = Depends(require_token_email)):
+    """Merge the guest favorites saved before login; returns the merged server list."""
+    return {"product_ids": await FavoritesService().merge_guest_favorites(email, body.product_ids, body.names)}
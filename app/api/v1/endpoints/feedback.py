@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Request
+
+from app.core.security import get_token_email
+from app.models.schemas import FeedbackBatch
+from app.services.feedback_service import BufferFull, get_feedback_buffer
+
+router = APIRouter(prefix="/api/v1/feedback", tags=["feedback"])
+
+
+@router.post("/events", status_code=202)
+async def record_feedback_events(batch: FeedbackBatch, request: Request):
+    """
+    Record a batch of like/dislike/favorite/click events.
+    Events are buffered and written behind the response, so this never waits on Mongo.
+    """
+    received_at = datetime.utcnow()
+    user_email = await get_token_email(request)
+    events = [
+        {
+            **event.model_dump(),
+            "ts": event.ts or received_at,
+            "received_at": received_at,
+            "user_email": user_email,
+            "session_id": batch.session_id,
+        }
+        for event in batch.events
+    ]
+    try:
+        get_feedback_buffer().add(events)
+    except BufferFull:
+        raise HTTPException(status_code=503, detail="Feedback is backed up, retry later", headers={"Retry-After": "30"})
+    return {"accepted": len(events)}
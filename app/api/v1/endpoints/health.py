@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from pymongo.errors import PyMongoError
+
+from app.core.config import settings
+from app.core.security import require_admin
+from app.models.database import db
+from app.models.schemas import UserInDB
+from app.services.loop_monitor import get_loop_monitor
+from app.services.product_service import catalog_loaded
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+
+@router.get("/live")
+async def live():
+    """The worker's event loop is running (it answered this request)."""
+    return {"status": "ok", "loop_lag_ms": round(get_loop_monitor().lag() * 1000, 1)}
+
+
+@router.get("/ready")
+async def ready():
+    """
+    Whether this worker should get traffic: 503 while the search catalog is loading, when its
+    event loop lagged more than READY_MAX_LOOP_LAG_SECONDS over the last seconds or Mongo
+    does not answer a ping in time, so the load balancer sheds overloaded workers.
+    """
+    monitor = get_loop_monitor()
+    loop_lag = monitor.lag()
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(db.command("ping"), timeout=settings.READY_MONGO_TIMEOUT_SECONDS)
+        mongo_ms = round((time.perf_counter() - started) * 1000, 1)
+    except (PyMongoError, asyncio.TimeoutError):
+        mongo_ms = None
+    checks = {
+        "loop": loop_lag <= settings.READY_MAX_LOOP_LAG_SECONDS,
+        "mongo": mongo_ms is not None,
+        "catalog": catalog_loaded(),
+    }
+    ok = all(checks.values())
+    return JSONResponse(status_code=200 if ok else 503, content={
+        "status": "ok" if ok else "unavailable",
+        "checks": checks,
+        "loop_lag_ms": round(loop_lag * 1000, 1),
+        "loop_lag_p99_ms": round(monitor.percentile(0.99) * 1000, 1),
+        "mongo_ping_ms": mongo_ms,
+        "slow_callbacks": len(monitor.slow_callbacks),
+    })
+
+
+@router.get("/slow-callbacks")
+async def slow_callbacks(current_user: UserInDB = Depends(require_admin)):
+    """Recent event loop stalls of this worker, with the stack of the blocking code."""
+    return {"threshold_ms": get_loop_monitor().slow_threshold * 1000, "stalls": get_loop_monitor().recent_slow_callbacks()}
@@ -0,0 +1,86 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, Response
+
+from app.core.security import require_admin
+from app.models.schemas import UserInDB
+from app.services.image_service import MAX_ORIGINAL_BYTES, VARIANTS, FetchFailed, get_image_store, image_path
+
+router = APIRouter(prefix="/api/v1/images", tags=["images"])
+
+DIGEST_PATTERN = "^[0-9a-f]{64}$"
+# Proxied URLs could start serving another image, cached variants of stored images cannot
+PROXY_CACHE_CONTROL = "public, max-age=604800"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def check_variant(variant: str):
+    if variant not in VARIANTS:
+        raise HTTPException(status_code=404, detail=f"Unknown variant, expected one of {', '.join(VARIANTS)}")
+
+
+async def render_variant(digest: str, variant: str) -> bytes:
+    """Variant bytes (raises LookupError for an unknown image)."""
+    try:
+        return await get_image_store().variant(digest, variant)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def fetch_image(url: str) -> str:
+    try:
+        return await get_image_store().fetch(url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FetchFailed as e:
+        raise HTTPException(status_code=502, detail=f"Could not fetch image: {str(e)}")
+
+
+def variant_response(data: bytes, digest: str, variant: str, cache_control: str) -> Response:
+    return Response(data, media_type="image/webp", headers={
+        "Cache-Control": cache_control,
+        "ETag": f'"{digest[:32]}-{variant}"',
+    })
+
+
+@router.get("/proxy/{variant}")
+async def proxy_image(variant: str, url: str = Query(..., description="Original image URL")):
+    """A resized variant of a remote product image; the original is downloaded only once."""
+    check_variant(variant)
+    digest = await fetch_image(url)
+    try:
+        data = await render_variant(digest, variant)
+    except LookupError:
+        # The downloaded original was evicted before the variant was rendered: download it again
+        digest = await fetch_image(url)
+        try:
+            data = await render_variant(digest, variant)
+        except LookupError:
+            raise HTTPException(status_code=502, detail="Could not fetch image: evicted from the cache")
+    return variant_response(data, digest, variant, PROXY_CACHE_CONTROL)
+
+
+@router.get("/{digest}/{variant}")
+async def stored_image(variant: str, digest: str = Path(..., pattern=DIGEST_PATTERN)):
+    """A resized variant of a stored image; the URL changes with the content, so it is cached forever."""
+    check_variant(variant)
+    try:
+        data = await render_variant(digest, variant)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return variant_response(data, digest, variant, IMMUTABLE_CACHE_CONTROL)
+
+
+@router.post("", status_code=201)
+async def upload_image(request: Request, current_user: UserInDB = Depends(require_admin)):
+    """Store an original image sent as the raw request body; returns the path to use as product image."""
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > MAX_ORIGINAL_BYTES:
+            raise HTTPException(status_code=413, detail="Image is too large")
+    try:
+        digest = await asyncio.to_thread(get_image_store().put_bytes, bytes(body))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"digest": digest, "path": image_path(digest), "variants": list(VARIANTS)}
@@ -0,0 +1,180 @@
+import asyncio
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+
+from app.core.config import settings
+from app.core.security import get_token_email, require_admin
+from app.models.schemas import UserInDB
+from app.services.catalog.governorates import GOVERNORATES, UNKNOWN_GOVERNORATE, governorate_id
+from app.services.catalog.store import SORT_KEYS
+from app.services.ingestion import FEED_FORMATS, get_ingest_job, start_ingest_job
+from app.services.product_service import ProductService, get_catalog, get_search_indexes
+from app.services.trending_service import get_trending_tracker
+from app.utils.etag import REVALIDATE, etag_matches, not_modified, set_etag
+from app.utils.streaming import ndjson_response
+
+router = APIRouter(prefix="/api/v1/products", tags=["products"])
+
+SEARCH_FORMATS = ("json", "ndjson")
+# Uploaded feeds are written to disk from a thread, this much at a time
+INGEST_WRITE_BYTES = 1024 * 1024
+
+
+@router.get("/search")
+async def search_products(
+    request: Request,
+    response: Response,
+    q: Optional[str] = Query(None),
+    sort: str = Query("relevance"),
+    vendor: Optional[List[str]] = Query(None),
+    governorate: Optional[List[str]] = Query(None),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    is_new: Optional[bool] = Query(None),
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    facets: bool = Query(False, description="Include vendor, governorate, price and rating counts"),
+    near: Optional[str] = Query(None, description="Governorate to rank from, defaults to the user's address"),
+    max_distance_km: Optional[float] = Query(None, gt=0),
+    collapse: bool = Query(True, description="Show near-duplicate listings of a vendor once"),
+    format: str = Query("json", description="json for a page, ndjson to stream every result"),
+):
+    """
+    Search the product catalog with filters, sort order and pagination.
+    Logged-in users get products near their stored governorate ranked first.
+
+    Anonymous results carry the catalog revision as ETag: while no product changed, a
+    matching If-None-Match gets a 304 without running the search.
+
+    With ``format=ndjson`` every result (pagination and facets are ignored) is streamed as
+    one JSON product per line, gzip or brotli compressed when the client accepts it.
+    """
+    if sort not in SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort key, expected one of {', '.join(SORT_KEYS)}")
+    if format not in SEARCH_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format, expected one of {', '.join(SEARCH_FORMATS)}")
+
+    user_email = await get_token_email(request)
+    indexes = get_search_indexes()
+    # Personalized results also depend on the user's address and feedback
+    etag = None if user_email else indexes.etag
+    if etag and etag_matches(request, etag):
+        return not_modified(etag)
+
+    product_service = ProductService(indexes)
+    if format == "ndjson":
+        batches = product_service.stream_search(
+            q=q,
+            sort=sort,
+            vendors=vendor,
+            governorates=governorate,
+            min_price=min_price,
+            max_price=max_price,
+            is_new=is_new,
+            min_rating=min_rating,
+            near=near,
+            max_distance_km=max_distance_km,
+            user_email=user_email,
+            collapse=collapse,
+        )
+        return ndjson_response(request, batches, {"ETag": etag, "Cache-Control": REVALIDATE} if etag else None)
+
+    result = await product_service.search(
+        q=q,
+        sort=sort,
+        vendors=vendor,
+        governorates=governorate,
+        min_price=min_price,
+        max_price=max_price,
+        is_new=is_new,
+        min_rating=min_rating,
+        page=page,
+        page_size=page_size,
+        facets=facets,
+        near=near,
+        max_distance_km=max_distance_km,
+        user_email=user_email,
+        collapse=collapse,
+    )
+    if etag:
+        set_etag(response, etag)
+    return result
+
+
+@router.get("/stats")
+async def catalog_stats():
+    """Memory used by the in-memory catalog, in total and per product."""
+    return {"catalog": get_catalog().memory_usage()}
+
+
+@router.get("/trending")
+async def trending_products(
+    governorate: Optional[str] = Query(None, description="Products of this governorate only"),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """Products with the most views, clicks and favorites lately (decayed over an hour half-life)."""
+    gid = governorate_id(governorate)
+    if governorate and gid == UNKNOWN_GOVERNORATE:
+        raise HTTPException(status_code=400, detail="Unknown governorate")
+    trending = get_trending_tracker().top(gid, limit)
+    items = await ProductService().get_products_by_ids([product_id for product_id, _ in trending])
+    scores = dict(trending)
+    for item in items:
+        item["trendingScore"] = round(scores[item["_id"]], 3)
+    return {"items": items, "governorate": GOVERNORATES[gid] if governorate else None}
+
+
+@router.get("/{product_id}/similar")
+async def similar_products(product_id: str, limit: int = Query(10, ge=1, le=20)):
+    """Precomputed similar products, most similar first (empty until the neighbour job has run)."""
+    if not ObjectId.is_valid(product_id):
+        raise HTTPException(status_code=400, detail="Invalid product id")
+    product_service = ProductService()
+    return {"items": await product_service.get_similar_products(product_id, limit)}
+
+
+@router.post("/ingest", status_code=202)
+async def ingest_products(
+    request: Request,
+    format: str = Query(..., description="Feed format: jsonl or csv"),
+    ordered: bool = Query(False, description="Stop each batch at its first failing write"),
+    current_user: UserInDB = Depends(require_admin),
+):
+    """
+    Upload a vendor product feed as the raw request body and ingest it in the background.
+    The body is streamed to disk, so feeds of any size are accepted.
+    """
+    if format not in FEED_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format, expected one of {', '.join(FEED_FORMATS)}")
+
+    ingest_dir = Path(settings.INGEST_DIR)
+    ingest_dir.mkdir(parents=True, exist_ok=True)
+    path = ingest_dir / f"{uuid.uuid4().hex}.{format}"
+    f = await asyncio.to_thread(open, path, "wb")
+    try:
+        pending = bytearray()
+        async for chunk in request.stream():
+            pending += chunk
+            if len(pending) >= INGEST_WRITE_BYTES:
+                await asyncio.to_thread(f.write, pending)
+                pending = bytearray()
+        await asyncio.to_thread(f.write, pending)
+    finally:
+        await asyncio.to_thread(f.close)
+
+    job_id = start_ingest_job(path, format, ordered=ordered, workers=settings.INGEST_WORKERS)
+    return {"job_id": job_id, "status": "running"}
+
+
+@router.get("/ingest/{job_id}")
+async def ingest_status(job_id: str, current_user: UserInDB = Depends(require_admin)):
+    """Progress, throughput and rejected lines of an ingestion job."""
+    job = await get_ingest_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job
@@ -1,8 +1,11 @@
 # app/api/v1/router.py
 from fastapi import APIRouter
 from app.api.v1.endpoints.authentication.auth import router as auth_router
-from app.api.v1.endpoints.authentication.auth_mobil import router as auth_router_mobil
-# from app.api.v1.endpoints.products import router as products_router
+from app.api.v1.endpoints.products import router as products_router
+from app.api.v1.endpoints.favorites import router as favorites_router
+from app.api.v1.endpoints.feedback import router as feedback_router
+from app.api.v1.endpoints.images import router as images_router
+from app.api.v1.endpoints.admin import router as admin_router
 
 # Create a main router for version 1 of the API
 router = APIRouter(prefix="/api/v1")
@@ -10,6 +13,14 @@ router = APIRouter(prefix="/api/v1")
 # Include all endpoint routers
 router.include_router(auth_router)
 
-#router.include_router(auth_router_mobil)
+# The mobile auth router (endpoints/authentication/auth_mobil.py) is disabled and not imported
 
-#router.include_router(products_router)
\ No newline at end of file
+router.include_router(products_router)
+
+router.include_router(favorites_router)
+
+router.include_router(feedback_router)
+
+router.include_router(images_router)
+
+router.include_router(admin_router)
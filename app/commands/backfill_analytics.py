@@ -0,0 +1,41 @@
+import sys
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Add the root directory to the system path
+root_dir = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(root_dir))
+
+# Load environment variables from .env file
+load_dotenv(dotenv_path=root_dir / '.env')
+
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime
+from app.services.analytics_service import ROLLUP_PERIODS, AnalyticsService
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def backfill(periods, since):
+    """Rebuild the signup counters of the hourly and daily rollups from the users collection.
+    Safe to run on a live system: live login counters of existing rollups are kept.
+    """
+    service = AnalyticsService()
+    await service.ensure_indexes()
+    for period in periods:
+        started = time.perf_counter()
+        await service.backfill_signups(period, since)
+        logger.info(f"{period} signup rollups backfilled in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill signup rollups from the users collection")
+    parser.add_argument("--period", choices=list(ROLLUP_PERIODS), action="append",
+                        help="Rollup period to backfill, repeatable (default: all)")
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None,
+                        help="Only count users who signed up from this date (ISO format)")
+    args = parser.parse_args()
+    asyncio.run(backfill(args.period or list(ROLLUP_PERIODS), args.since))
@@ -0,0 +1,52 @@
+import sys
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Add the root directory to the system path
+root_dir = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(root_dir))
+
+# Load environment variables from .env file
+load_dotenv(dotenv_path=root_dir / '.env')
+
+import argparse
+import asyncio
+import logging
+import time
+from app.core.config import settings
+from app.models.database import db
+from app.services.catalog.snapshot import write_snapshot
+from app.services.catalog.store import CatalogBuilder, INDEX_PROJECTION
+from app.services.catalog.updater import capture_checkpoint
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def build_snapshot(output: Path, keep: int):
+    """Build the search indexes from the products collection and publish them as a new snapshot.
+    Running workers pick the snapshot up on their next poll, without a restart.
+    """
+    started = time.perf_counter()
+    # Workers replay the changes made from here on once they load the snapshot
+    checkpoint = await capture_checkpoint(db.products)
+    builder = CatalogBuilder()
+    async for doc in db.products.find({}, INDEX_PROJECTION):
+        builder.add(doc)
+    store = builder.build()
+    store.checkpoint = checkpoint
+    snapshot_dir = write_snapshot(store, output, keep=keep)
+
+    usage = store.memory_usage()
+    logger.info(
+        f"Snapshot {snapshot_dir.name} written: {usage['products']} products, "
+        f"{usage['total_bytes'] / 1e6:.1f} MB ({usage['bytes_per_product']} bytes/product) "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a memory-mappable product search snapshot")
+    parser.add_argument("--output", type=Path, default=root_dir / settings.SEARCH_SNAPSHOT_DIR)
+    parser.add_argument("--keep", type=int, default=3, help="Number of snapshots to keep on disk")
+    args = parser.parse_args()
+    asyncio.run(build_snapshot(args.output, args.keep))
@@ -0,0 +1,82 @@
+import sys
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Add the root directory to the system path
+root_dir = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(root_dir))
+
+# Load environment variables from .env file
+load_dotenv(dotenv_path=root_dir / '.env')
+
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ReplaceOne
+from app.models.database import db
+from app.services.catalog.similarity import (
+    BLOCK_COLS, BLOCK_ROWS, EMBEDDING_DIM, SIMILAR_K, similar_rows, text_embeddings,
+)
+from app.services.catalog.store import CatalogBuilder, INDEX_PROJECTION
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def neighbour_documents(catalog, rows, neighbours, scores, built_at):
+    """One ``product_similar`` replacement per product of the block."""
+    requests = []
+    for row, row_neighbours, row_scores in zip(rows, neighbours, scores):
+        found = row_neighbours >= 0
+        requests.append(ReplaceOne({"_id": ObjectId(catalog.ids[row].decode())}, {
+            "neighbors": [ObjectId(pid.decode()) for pid in catalog.ids[row_neighbours[found]]],
+            "scores": [round(float(s), 4) for s in row_scores[found]],
+            "built_at": built_at,
+        }, upsert=True))
+    return requests
+
+async def build_similar_products(k: int, dim: int, block_rows: int, block_cols: int):
+    """Compute the top-k similar products of every product and store them in ``product_similar``.
+    Products that no longer exist lose their neighbour list once the run completes.
+    """
+    started = time.perf_counter()
+    built_at = datetime.utcnow()
+    builder = CatalogBuilder()
+    async for doc in db.products.find({}, INDEX_PROJECTION):
+        builder.add(doc)
+    catalog = builder.build()
+    embeddings = text_embeddings(catalog.text_index, dim)
+    logger.info(f"{len(catalog)} products embedded in {time.perf_counter() - started:.1f}s")
+
+    blocks = similar_rows(catalog, embeddings, k, block_rows, block_cols)
+    done = 0
+    pending = None
+    while True:
+        # The next block is computed while the previous one is being written
+        block = await asyncio.to_thread(next, blocks, None)
+        if pending is not None:
+            await pending
+        if block is None:
+            break
+        requests = neighbour_documents(catalog, *block, built_at)
+        pending = asyncio.ensure_future(db.product_similar.bulk_write(requests, ordered=False))
+        done += len(requests)
+        logger.info(f"{done}/{len(catalog)} products ({done / (time.perf_counter() - started):.0f}/s)")
+
+    removed = await db.product_similar.delete_many({"built_at": {"$lt": built_at}})
+    logger.info(
+        f"Similar products of {done} products written ({removed.deleted_count} stale lists removed) "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the similar products shown next to each product")
+    parser.add_argument("--k", type=int, default=SIMILAR_K, help="Neighbours stored per product")
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM, help="Width of the text embeddings")
+    parser.add_argument("--block-rows", type=int, default=BLOCK_ROWS)
+    parser.add_argument("--block-cols", type=int, default=BLOCK_COLS)
+    args = parser.parse_args()
+    asyncio.run(build_similar_products(args.k, args.dim, args.block_rows, args.block_cols))
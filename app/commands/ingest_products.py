@@ -0,0 +1,45 @@
+import sys
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Add the root directory to the system path
+root_dir = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(root_dir))
+
+# Load environment variables from .env file
+load_dotenv(dotenv_path=root_dir / '.env')
+
+import argparse
+import asyncio
+import logging
+from app.services.ingestion import CHUNK_SIZE, FEED_FORMATS, IngestReport, ingest_feed
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def log_progress(report: IngestReport):
+    progress = report.as_dict()
+    logger.info(
+        f"{progress['lines']} lines ({progress['lines_per_second']}/s): {progress['inserted']} inserted, "
+        f"{progress['updated']} updated, {progress['unchanged']} unchanged, {progress['rejected']} rejected"
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upsert a JSONL/CSV vendor product feed into the products collection")
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--format", choices=FEED_FORMATS, help="Defaults to the file extension")
+    parser.add_argument("--ordered", action="store_true", help="Stop each batch at its first failing write")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, help="Parsing processes, defaults to the number of CPUs")
+    parser.add_argument("--rejects", type=Path, help="Write rejected lines and their errors to this JSONL file")
+    parser.add_argument("--images", type=Path,
+                        help="Directory of the image files referenced by the feed, defaults to the feed's directory")
+    args = parser.parse_args()
+
+    report = asyncio.run(ingest_feed(
+        args.path, args.format, ordered=args.ordered, chunk_size=args.chunk_size,
+        workers=args.workers, rejects_path=args.rejects, on_progress=log_progress,
+        image_root=args.images or args.path.parent,
+    ))
+    log_progress(report)
@@ -0,0 +1,127 @@
+import sys
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Add the root directory to the system path
+root_dir = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(root_dir))
+
+# Load environment variables from .env file
+load_dotenv(dotenv_path=root_dir / '.env')
+
+import argparse
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import time
+import urllib.error
+import urllib.request
+from typing import List, NamedTuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cold boot of a worker, from process start to its first response
+DEFAULT_BUDGET_MS = 3000
+
+
+class ImportTime(NamedTuple):
+    module: str
+    depth: int
+    self_us: int
+    cumulative_us: int
+
+
+def import_times(module: str = "app.main") -> List[ImportTime]:
+    """Import ``module`` in a fresh interpreter with ``-X importtime`` and parse its report."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=root_dir, capture_output=True, text=True, env={**os.environ, "PYTHONPATH": str(root_dir)},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        times.append(ImportTime(name.strip(), depth, int(self_us), int(cumulative_us)))
+    return times
+
+
+def import_report(top: int):
+    times = import_times()
+    total = next(t.cumulative_us for t in times if t.module == "app.main")
+    print(f"import app.main: {total / 1000:.0f} ms, {len(times)} modules")
+    print(f"\nSlowest imports of the app (cumulative), top {top}:")
+    ours = sorted((t for t in times if t.module.startswith("app.")), key=lambda t: -t.cumulative_us)
+    for t in ours[:top]:
+        print(f"  {t.cumulative_us / 1000:8.1f} ms  {t.module}")
+    print(f"\nSlowest third-party packages (cumulative, imported by the app), top {top}:")
+    packages = {}
+    for t in times:
+        package = t.module.split(".")[0]
+        if package != "app" and t.module == package:
+            packages[package] = max(packages.get(package, 0), t.cumulative_us)
+    for package, us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {us / 1000:8.1f} ms  {package}")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def boot_time(timeout: float) -> float:
+    """Seconds from starting a uvicorn worker to its first successful /health/live response."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/health/live"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=root_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"Worker exited with code {process.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError, TimeoutError):
+                time.sleep(0.01)
+        raise TimeoutError(f"No response within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def boot_benchmark(runs: int, timeout: float) -> float:
+    samples = [boot_time(timeout) for _ in range(runs)]
+    median = statistics.median(samples)
+    print(f"Cold boot to first response over {runs} runs: median {median * 1000:.0f} ms, "
+          f"min {min(samples) * 1000:.0f} ms, max {max(samples) * 1000:.0f} ms")
+    return median
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report import times and benchmark worker cold boot")
+    parser.add_argument("--top", type=int, default=15, help="Number of modules listed per section")
+    parser.add_argument("--runs", type=int, default=5, help="Number of cold boots to time, 0 to skip")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for a worker to answer")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="Exit with an error when the median boot is slower")
+    args = parser.parse_args()
+    import_report(args.top)
+    if args.runs:
+        print()
+        median = boot_benchmark(args.runs, args.timeout)
+        if median * 1000 > args.budget_ms:
+            print(f"Over the startup budget of {args.budget_ms:.0f} ms")
+            sys.exit(1)
@@ -1,10 +1,5 @@
 # app/core/config.py
 from pydantic_settings import BaseSettings
-import logging
-
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger(__name__)
 
 class Settings(BaseSettings):
     MONGODB_URL: str
@@ -27,6 +22,32 @@ class Settings(BaseSettings):
     FRONTEND_CALLBACK_URI: str
     ENVIRONMENT: str = "development"
     REFRESH_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
+    SEARCH_SNAPSHOT_DIR: str = "data/search_snapshots"
+    SEARCH_SNAPSHOT_POLL_SECONDS: float = 5.0
+    SEARCH_UPDATE_BATCH_SIZE: int = 500
+    SEARCH_UPDATE_BATCH_SECONDS: float = 1.0
+    SEARCH_UPDATE_POLL_SECONDS: float = 2.0
+    INGEST_DIR: str = "data/ingest"
+    INGEST_WORKERS: int = 2
+    INGEST_JOB_RETENTION_DAYS: int = 7
+    FEEDBACK_SPILL_DIR: str = "data/feedback_spill"
+    FEEDBACK_FLUSH_SIZE: int = 1000
+    FEEDBACK_FLUSH_SECONDS: float = 2.0
+    FEEDBACK_MAX_BUFFER: int = 50_000
+    TRENDING_POLL_SECONDS: float = 5.0
+    IMAGE_CACHE_DIR: str = "data/images"
+    IMAGE_CACHE_MAX_BYTES: int = 2 * 1024 ** 3
+    IMAGE_PROXY_HOSTS: str = "images.unsplash.com"  # comma separated
+    WRITE_BEHIND_MAX_PENDING: int = 10_000
+    WRITE_BEHIND_FLUSH_SECONDS: float = 0.5
+    TOKEN_REVOCATION_CAPACITY: int = 100_000
+    TOKEN_REVOCATION_SYNC_SECONDS: float = 2.0
+    LOOP_MONITOR_INTERVAL: float = 0.05
+    SLOW_CALLBACK_SECONDS: float = 0.1
+    READY_MAX_LOOP_LAG_SECONDS: float = 0.5
+    READY_MONGO_TIMEOUT_SECONDS: float = 1.0
+    LOGIN_HANDOFF: bool = True  # False: redirect with the full user JSON in ?user=
+    LOGIN_HANDOFF_DIR: str = "data/login_handoff"  # shared by the workers of a host, preferably on a tmpfs
 
     class Config:
         env_file = ".env"
@@ -1,11 +1,14 @@
+import uuid
 from datetime import datetime, timedelta
 from jose import jwt
 from app.core.config import settings
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
 from app.models.database import db
 from app.models.schemas import UserInDB
+from app.services.token_revocation import get_token_revocations
+from typing import Optional
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -13,7 +16,8 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(minutes=15)):
     to_encode = data.copy()
     expire = datetime.utcnow() + expires_delta
-    to_encode.update({"exp": expire})
+    # jti identifies the token for revocation
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.ACCESS_SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
@@ -29,17 +33,54 @@ def create_refresh_token(data: dict, expires_delta: timedelta = timedelta(days=7
 def decode_access_token(token: str):
     return jwt.decode(token, settings.ACCESS_SECRET_KEY, algorithms=[settings.ALGORITHM])
 
+async def verify_access_token(token: str) -> dict:
+    """
+    Decode an access token and reject revoked ones (raises JWTError).
+    Tokens issued before jti were added cannot be revoked and expire normally.
+    """
+    payload = decode_access_token(token)
+    jti = payload.get("jti")
+    if jti and await get_token_revocations().is_revoked(jti):
+        raise JWTError("Token has been revoked")
+    return payload
+
+async def revoke_access_token(token: Optional[str]):
+    """Revoke an access token until it expires; invalid or expired tokens are ignored."""
+    if not token:
+        return
+    try:
+        payload = decode_access_token(token)
+    except JWTError:
+        return
+    if payload.get("jti"):
+        await get_token_revocations().revoke(payload["jti"], datetime.utcfromtimestamp(payload["exp"]))
+
 # Function to decode a refresh token
 def decode_refresh_token(token: str):
     return jwt.decode(token, settings.REFRESH_SECRET_KEY, algorithms=[settings.REFRESH_ALGORITHM])
 
+async def get_token_email(request: Request) -> Optional[str]:
+    """
+    Return the email of the caller from the access_token cookie or the Bearer header.
+    Anonymous callers and invalid tokens give None, for endpoints where login is optional.
+    """
+    token = request.cookies.get("access_token")
+    authorization = request.headers.get("authorization", "")
+    if not token and authorization.startswith("Bearer "):
+        token = authorization.split(" ")[1]
+    if not token:
+        return None
+    try:
+        return (await verify_access_token(token)).get("sub")
+    except JWTError:
+        return None
+
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
     """
     Extract the current user from the access token.
     """
     try:
-        # Decode the token directly without importing decode_access_token
-        payload = jwt.decode(token, settings.ACCESS_SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = await verify_access_token(token)
         email = payload.get("sub")
         if email is None:
             raise HTTPException(status_code=401, detail="Invalid token")
@@ -52,4 +93,21 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
         user["roles"] = [str(role_id) for role_id in user.get("roles", [])]
         return UserInDB(**user)
     except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Invalid token")
+async def require_admin(current_user: UserInDB = Depends(get_current_user)) -> UserInDB:
+    """
+    Dependency for admin-only routes: the user must hold the "admin" role.
+    """
+    admin_role = await db.roles.find_one({"name": "admin"})
+    if not admin_role or str(admin_role["_id"]) not in [str(role_id) for role_id in current_user.roles]:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    return current_user
+
+async def require_token_email(request: Request) -> str:
+    """
+    Dependency returning the caller's email (cookie or Bearer token) without loading the user.
+    """
+    email = await get_token_email(request)
+    if not email:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return email
@@ -4,7 +4,21 @@ from fastapi.middleware.cors import CORSMiddleware
 from urllib.parse import urlparse
 from app.core.config import settings
 from app.api.v1.endpoints.authentication.auth import router as auth_router
-from app.api.v1.endpoints.authentication.auth_mobil import router as auth_router_mobil
+from app.api.v1.endpoints.products import router as products_router
+from app.api.v1.endpoints.favorites import router as favorites_router
+from app.api.v1.endpoints.feedback import router as feedback_router
+from app.api.v1.endpoints.images import router as images_router
+from app.api.v1.endpoints.health import router as health_router
+from app.api.v1.endpoints.admin import router as admin_router
+from app.services.product_service import catalog_loaded, load_catalog_snapshot, start_index_updater
+from app.services.feedback_service import get_feedback_buffer
+from app.services.ingestion import stop_ingest_jobs
+from app.services.write_behind import get_write_behind
+from app.services.token_revocation import get_token_revocations
+from app.services.trending_service import get_trending_feed
+from app.services.loop_monitor import get_loop_monitor
+from app.services.user_directory_service import UserDirectoryService
+from app.services.analytics_service import AnalyticsService
 
 from app.middleware.error_handlers import global_error_handler
 
@@ -15,14 +29,12 @@ from slowapi.middleware import SlowAPIMiddleware
 from slowapi.errors import RateLimitExceeded
 from fastapi.responses import JSONResponse
 
-import logging
+import asyncio
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger(__name__)
+# Logging is configured once, by app.utils.logger
+from app.utils.logger import logger
 
 app = FastAPI()
-print("app created")
 # Initialize the rate limiter
 limiter = Limiter(key_func=get_remote_address)
 app.state.limiter = limiter
@@ -74,7 +86,98 @@ app.add_middleware(
 app.middleware("http")(global_error_handler)
 # Inclure les routes
 app.include_router(auth_router)
-#app.include_router(auth_router_mobil)
+app.include_router(products_router)
+app.include_router(favorites_router)
+app.include_router(feedback_router)
+app.include_router(images_router)
+app.include_router(health_router)
+app.include_router(admin_router)
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    app.state.loop_monitor = asyncio.create_task(get_loop_monitor().run())
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    app.state.loop_monitor.cancel()
+
+async def load_product_catalog(retry_seconds: float = 10.0):
+    while True:
+        try:
+            if not catalog_loaded():
+                watcher = await load_catalog_snapshot()
+                if watcher:
+                    app.state.snapshot_watcher = asyncio.create_task(watcher.run())
+            updater = await start_index_updater()
+            app.state.index_updater = asyncio.create_task(updater.run())
+            return
+        except Exception as e:
+            # Keep serving auth routes with an empty catalog while Mongo is not reachable yet
+            logger.error(f"Failed to load product catalog, retrying in {retry_seconds:g}s: {str(e)}")
+            await asyncio.sleep(retry_seconds)
+
+@app.on_event("startup")
+async def start_catalog_loader():
+    # Loaded in the background so the worker answers as soon as it is up; /health/ready
+    # keeps it out of the load balancer until the catalog is in place
+    app.state.catalog_loader = asyncio.create_task(load_product_catalog())
+
+async def create_admin_indexes():
+    try:
+        await UserDirectoryService().ensure_indexes()
+        await AnalyticsService().ensure_indexes()
+    except Exception as e:
+        logger.error(f"Failed to create admin indexes: {str(e)}")
+
+@app.on_event("startup")
+async def start_admin_index_creation():
+    app.state.admin_indexes = asyncio.create_task(create_admin_indexes())
+
+@app.on_event("startup")
+async def start_feedback_writer():
+    app.state.feedback_writer = asyncio.create_task(get_feedback_buffer().run())
+
+@app.on_event("shutdown")
+async def stop_feedback_writer():
+    app.state.feedback_writer.cancel()
+    await get_feedback_buffer().close()
+
+@app.on_event("startup")
+async def start_background_writes():
+    app.state.background_writes = asyncio.create_task(get_write_behind().run())
+
+@app.on_event("startup")
+async def start_token_revocation_sync():
+    app.state.token_revocations = asyncio.create_task(get_token_revocations().run())
+
+@app.on_event("shutdown")
+async def stop_token_revocation_sync():
+    app.state.token_revocations.cancel()
+
+@app.on_event("startup")
+async def start_trending_feed():
+    app.state.trending_feed = asyncio.create_task(get_trending_feed().run())
+
+@app.on_event("shutdown")
+async def stop_trending_feed():
+    app.state.trending_feed.cancel()
+
+@app.on_event("shutdown")
+async def stop_ingestion_jobs():
+    # Before the background writes are drained: the jobs queue their final status there
+    await stop_ingest_jobs()
+
+@app.on_event("shutdown")
+async def stop_background_writes():
+    app.state.background_writes.cancel()
+    await get_write_behind().close()
+
+@app.on_event("shutdown")
+async def stop_catalog_tasks():
+    for name in ("catalog_loader", "snapshot_watcher", "index_updater"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
 
 @app.get("/")
 async def root():
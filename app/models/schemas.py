@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field, ConfigDict
 from pydantic_core import core_schema
 from bson import ObjectId
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Literal
 from datetime import datetime
 
 class PyObjectId(ObjectId):
@@ -33,6 +33,7 @@ class UserInDB(UserBase):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
     refresh_token: Optional[str] = None  # Add refresh_token field
     strategy: str  # Add strategy field
+    signup_provider: Optional[str] = None  # Provider of the first login (strategy is the latest one)
     created_at: datetime  # Add created_at field
     updated_at: datetime  # Add updated_at field
     first_register: datetime  # Add first_register field
@@ -47,6 +48,7 @@ class UserInDB(UserBase):
     timezone: Optional[str] = None  # Add timezone field
     hasStore: bool = False  # Add hasStore field with default value
     storeId: Optional[PyObjectId] = None  # Add storeId field
+    revision: int = 0  # Incremented by every write, used for ETags
 
     model_config = ConfigDict(
         populate_by_name=True,
@@ -70,4 +72,55 @@ class UserUpdate(BaseModel):
             "postal_code": "",
         },
     )
-    timezone: Optional[str] = Field(None, title="Timezone")
\ No newline at end of file
+    timezone: Optional[str] = Field(None, title="Timezone")
+
+class ProductBase(BaseModel):
+    name: str
+    price: str  # Display price, e.g. "23.50 TND"
+    numericPrice: float
+    vendor: str
+    image: str
+    images: List[str] = Field(default_factory=list)
+    link: str
+    isNew: bool = False
+    address: str
+    phone: str
+    description: Optional[str] = None
+    rating: Optional[float] = Field(None, ge=0, le=5)
+    specs: Dict[str, str] = Field(default_factory=dict)
+
+class ProductInDB(ProductBase):
+    id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    location: Optional[dict] = None  # {"governorate", "lat", "lon"} resolved from address at ingest
+    created_at: datetime
+    updated_at: datetime
+
+    model_config = ConfigDict(
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        json_encoders={PyObjectId: str},
+    )
+
+class FavoritesUpdate(BaseModel):
+    product_ids: List[str] = Field(default_factory=list, max_length=500)
+
+class FavoritesMerge(FavoritesUpdate):
+    # Guest favorites stored by product name in localStorage (front/utils/favorites.ts)
+    names: List[str] = Field(default_factory=list, max_length=500)
+
+class UserRolesBulkUpdate(BaseModel):
+    user_ids: List[str] = Field(..., min_length=1, max_length=10_000)
+    add: List[str] = Field(default_factory=list)  # Role names
+    remove: List[str] = Field(default_factory=list)
+
+class FeedbackEventIn(BaseModel):
+    type: Literal["like", "unlike", "dislike", "undislike", "favorite", "unfavorite", "click", "view"]
+    product_id: Optional[str] = None
+    # The front end identifies products by name until it receives ids from the search API
+    product_name: Optional[str] = None
+    query: Optional[str] = None  # Search query the product was shown for
+    ts: Optional[datetime] = None  # Client time of the event
+
+class FeedbackBatch(BaseModel):
+    session_id: Optional[str] = None
+    events: List[FeedbackEventIn] = Field(..., min_length=1, max_length=200)
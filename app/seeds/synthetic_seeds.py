@@ -0,0 +1,361 @@
+import sys
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Add the root directory to the system path
+root_dir = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(root_dir))
+
+# Load environment variables from .env file
+load_dotenv(dotenv_path=root_dir / '.env')
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from bson import ObjectId
+from app.services.catalog.geo import CITIES, GOVERNORATE_COORDS
+from app.services.catalog.governorates import GOVERNORATES
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Every generated document is a pure function of (seed, kind, index): chunks can be generated
+# by any process in any order and the dataset is still the same for a given seed.
+USERS, STORES, PRODUCTS = 1, 2, 3
+CHUNK_SIZE = 5000
+EPOCH = datetime(2023, 1, 1)
+SPAN_DAYS = 1000
+
+FIRST_NAMES = (
+    "Mohamed", "Ahmed", "Ali", "Youssef", "Amine", "Omar", "Karim", "Sami", "Walid", "Hamza",
+    "Mehdi", "Bilel", "Aymen", "Skander", "Fares", "Nour", "Fatma", "Amira", "Salma", "Mariem",
+    "Ines", "Yasmine", "Rim", "Sarra", "Emna", "Olfa", "Hela", "Asma", "Khadija", "Leila",
+)
+LAST_NAMES = (
+    "Ben Ali", "Trabelsi", "Gharbi", "Jaziri", "Mejri", "Hammami", "Ayari", "Bouazizi", "Chaabane",
+    "Dridi", "Ferchichi", "Jebali", "Khelifi", "Mansouri", "Nasri", "Riahi", "Saidi", "Slimani",
+    "Tlili", "Zouari", "Ben Salah", "Ben Youssef", "Haddad", "Karoui", "Masmoudi", "Sfaxi",
+)
+STREETS = (
+    "Rue de la Liberté", "Avenue Habib Bourguiba", "Rue du Marché", "Zone Artisanale", "Médina",
+    "Route de Sfax", "Centre Ville", "Zone Industrielle", "Rue des Jardins", "Souk",
+    "Avenue de France", "Rue Ibn Khaldoun", "Cité El Khadra", "Rue de Marseille",
+)
+STORE_WORDS = (
+    "Artisan", "Maison", "Atelier", "Souk", "Dar", "Bio", "Tech", "Oasis", "Jasmin", "Médina",
+    "Olive", "Berber", "Kairouan", "Carthage", "Sahel", "Djerba", "Sud", "Nord", "Market", "Home",
+)
+STORE_SUFFIXES = ("Crafts", "Store", "Shop", "Boutique", "& Co.", "Market", "Design", "Heritage", "Foods", "Lights")
+
+# (product nouns, adjectives, price range in TND, specs)
+PRODUCT_FAMILIES = (
+    (("Huile d'Olive", "Olives", "Tapenade"), ("Premium", "Bio", "Extra Vierge", "Fruitée"), (8, 60),
+     {"Origine": ("Tunisie", "Sfax", "Zarzis"), "Capacité": ("250ml", "500ml", "1L")}),
+    (("Sac", "Portefeuille", "Ceinture", "Babouche"), ("en Cuir", "Fait Main", "Brodé", "Traditionnel"), (25, 300),
+     {"Matériau": ("Cuir", "Daim", "Cuir tressé"), "Couleur": ("Marron", "Noir", "Camel")}),
+    (("Plat", "Vase", "Set de Poterie", "Tajine", "Tasse", "Mug"), ("Céramique", "Peint", "de Nabeul", "Émaillé"), (10, 180),
+     {"Matériau": ("Céramique", "Terre cuite"), "Dimension": ("15 cm", "25 cm", "35 cm")}),
+    (("Montre", "Écouteurs", "Chargeur", "Enceinte", "Smartphone"), ("Intelligente", "Sans Fil", "Pro", "Connectée"), (30, 2500),
+     {"Batterie": ("1 jour", "3 jours", "7 jours"), "Garantie": ("6 mois", "1 an", "2 ans")}),
+    (("Épices", "Harissa", "Dattes Deglet Nour", "Miel", "Thé Vert", "Couscous"), ("Bio", "Artisanal", "du Sud", "Traditionnel"), (4, 80),
+     {"Poids": ("250g", "500g", "1kg"), "Origine": ("Kebili", "Tozeur", "Cap Bon")}),
+    (("Bracelet", "Bague", "Collier", "Boucles d'Oreilles", "Khomsa"), ("Argent", "Or", "Berbère", "Ornée"), (20, 900),
+     {"Métal": ("Argent 925", "Or 18k", "Laiton"), "Poids": ("5g", "12g", "25g")}),
+    (("Tapis", "Mergoum", "Klim", "Coussin", "Couverture"), ("de Kairouan", "Berbère", "Tissé Main", "en Laine"), (40, 1500),
+     {"Dimension": ("60x90 cm", "120x180 cm", "200x300 cm"), "Matériau": ("Laine", "Coton")}),
+    (("Chemise", "T-shirt", "Jebba", "Chèche", "Robe", "Chéchia"), ("Lin", "Coton Bio", "Brodée", "Traditionnelle"), (15, 450),
+     {"Taille": ("S", "M", "L", "XL"), "Matière": ("Lin", "Coton", "Soie")}),
+    (("Bougie", "Savon", "Parfum", "Eau de Fleur d'Oranger"), ("Parfumée", "au Jasmin", "Lavande", "Artisanale"), (5, 200),
+     {"Volume": ("50ml", "100ml", "250ml"), "Parfum": ("Jasmin", "Néroli", "Vanille")}),
+    (("Panier", "Plateau", "Lampe", "Chapeau"), ("Osier", "Bois d'Olivier", "Artisanal", "Paille"), (10, 250),
+     {"Matériau": ("Osier", "Bois d'olivier", "Alfa"), "Dimension": ("Petit", "Moyen", "Grand")}),
+)
+
+# Rough population weights, so most users and stores are around Tunis and the Sahel
+GOVERNORATE_WEIGHTS = {
+    "Tunis": 10, "Sfax": 9, "Sousse": 7, "Nabeul": 7, "Ariana": 6, "Ben Arous": 6, "Monastir": 5,
+    "Kairouan": 5, "Bizerte": 5, "Médenine": 4, "Mahdia": 4,
+}
+_GOVERNORATE_CUM = []
+for _name in GOVERNORATES:
+    _GOVERNORATE_CUM.append((_GOVERNORATE_CUM[-1] if _GOVERNORATE_CUM else 0) + GOVERNORATE_WEIGHTS.get(_name, 2))
+_CITIES_BY_GOVERNORATE: Dict[str, List[str]] = {}
+for _city, (_governorate, _, _) in CITIES.items():
+    _CITIES_BY_GOVERNORATE.setdefault(_governorate, []).append(_city.title())
+
+
+def object_id(kind: int, index: int, created_at: datetime) -> ObjectId:
+    """Deterministic ObjectId: creation timestamp, then the document kind and index."""
+    return ObjectId(int(created_at.timestamp()).to_bytes(4, "big") + bytes([kind]) + index.to_bytes(7, "big"))
+
+
+def _rng(seed: int, kind: int, index: int) -> random.Random:
+    return random.Random(seed * 1_000_003 + kind * 1_000_000_007 + index)
+
+
+def _slug(text: str) -> str:
+    ascii_text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return "-".join("".join(c if c.isalnum() else " " for c in ascii_text).split())
+
+
+def _governorate(rng: random.Random) -> str:
+    return rng.choices(GOVERNORATES, cum_weights=_GOVERNORATE_CUM)[0]
+
+
+def _created_at(rng: random.Random) -> datetime:
+    return EPOCH + timedelta(seconds=rng.randrange(SPAN_DAYS * 86400))
+
+
+def _phone(rng: random.Random) -> str:
+    return f"+216 {rng.choice((2, 5, 9, 7))}{rng.randrange(10)} {rng.randrange(1000):03d} {rng.randrange(1000):03d}"
+
+
+def store_name(seed: int, index: int) -> str:
+    rng = _rng(seed, STORES, index)
+    return f"{rng.choice(STORE_WORDS)} {rng.choice(STORE_SUFFIXES)} {index}"
+
+
+def generate_store(seed: int, index: int, owner_id: ObjectId) -> dict:
+    rng = _rng(seed, STORES, index)
+    governorate = _governorate(rng)
+    created_at = _created_at(rng)
+    return {
+        "_id": object_id(STORES, index, created_at),
+        "name": store_name(seed, index),
+        "owner_id": owner_id,
+        "address": f"{rng.choice(STREETS)}, {rng.choice(_CITIES_BY_GOVERNORATE.get(governorate, [governorate]))}",
+        "phone": _phone(rng),
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+
+
+def generate_user(seed: int, index: int, roles: Dict[str, ObjectId], stores: int) -> dict:
+    """User ``index``; the first ``stores`` users are vendors owning store ``index``."""
+    rng = _rng(seed, USERS, index)
+    first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    email = f"{_slug(first_name).lower()}.{_slug(last_name).lower()}.{index}@example.tn"
+    created_at = _created_at(rng)
+    last_register = created_at + timedelta(seconds=rng.randrange(86400 * 200))
+    strategy = rng.choices(("google", "facebook"), weights=(7, 3))[0]
+    linked_accounts = [{"provider": strategy, "accountId": str(rng.getrandbits(64))}]
+    if rng.random() < 0.1:
+        other = "facebook" if strategy == "google" else "google"
+        linked_accounts.append({"provider": other, "accountId": str(rng.getrandbits(64))})
+    governorate = _governorate(rng)
+    is_vendor = index < stores
+    user = {
+        "_id": object_id(USERS, index, created_at),
+        "email": email,
+        "name": f"{first_name} {last_name}",
+        "firstName": first_name,
+        "lastName": last_name,
+        "picture": None,
+        "roles": [roles["vendor" if is_vendor else "client"]],
+        "status": "active" if rng.random() < 0.97 else "inactive",
+        "strategy": strategy,
+        "signup_provider": strategy,
+        "created_at": created_at,
+        "updated_at": last_register,
+        "first_register": created_at,
+        "last_register": last_register,
+        "linked_accounts": linked_accounts,
+        "address": {
+            "gouvernorat": governorate,
+            "delegation": rng.choice(_CITIES_BY_GOVERNORATE.get(governorate, [governorate])),
+            "street": f"{rng.randrange(1, 200)} {rng.choice(STREETS)}",
+            "postal_code": f"{rng.randrange(1000, 9999)}",
+        } if rng.random() < 0.8 else None,
+        "phone_one": _phone(rng) if rng.random() < 0.6 else None,
+        "phone_two": None,
+        "phone_three": None,
+        "verified": rng.random() < 0.7,
+        "timezone": "Africa/Tunis",
+        "hasStore": is_vendor,
+        "storeId": None,
+    }
+    if is_vendor:
+        store = generate_store(seed, index, user["_id"])
+        user["storeId"] = store["_id"]
+    return user
+
+
+def generate_product(seed: int, index: int, stores: int) -> dict:
+    rng = _rng(seed, PRODUCTS, index)
+    nouns, adjectives, (low, high), specs = rng.choice(PRODUCT_FAMILIES)
+    name = f"{rng.choice(nouns)} {rng.choice(adjectives)}"
+    if rng.random() < 0.3:
+        name += f" {rng.choice(STORE_WORDS)}"
+    # Log-uniform prices: many cheap products, a long tail of expensive ones
+    price = round(low * (high / low) ** rng.random(), 2)
+    # Store popularity is skewed too: a few stores own most products
+    store_index = min(int(stores * rng.random() ** 2), stores - 1)
+    store = _rng(seed, STORES, store_index)
+    vendor = store_name(seed, store_index)
+    store_governorate = _governorate(store)
+    address = f"{rng.choice(STREETS)}, {rng.choice(_CITIES_BY_GOVERNORATE.get(store_governorate, [store_governorate]))}"
+    created_at = _created_at(rng)
+    rating = round(min(5.0, max(1.0, rng.gauss(4.1, 0.6))), 1) if rng.random() < 0.7 else None
+    image = f"https://placehold.co/800x600?text={_slug(name)}"
+    return {
+        "_id": object_id(PRODUCTS, index, created_at),
+        "name": name,
+        "price": f"{price:.2f} TND",
+        "numericPrice": price,
+        "vendor": vendor,
+        "image": image,
+        "images": [image] * rng.randrange(1, 4),
+        "link": f"https://touskie.tn/store/{_slug(vendor)}/p/{index}",
+        "isNew": created_at > EPOCH + timedelta(days=SPAN_DAYS - 60),
+        "address": address,
+        "phone": _phone(rng),
+        "description": f"{name} proposé par {vendor}. Livraison partout en Tunisie.",
+        "rating": rating,
+        "specs": {key: rng.choice(values) for key, values in specs.items()},
+        "location": {
+            "governorate": store_governorate,
+            "lat": float(GOVERNORATE_COORDS[GOVERNORATES.index(store_governorate)][0]),
+            "lon": float(GOVERNORATE_COORDS[GOVERNORATES.index(store_governorate)][1]),
+        },
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+
+
+def generate_chunk(kind: int, seed: int, start: int, stop: int, stores: int,
+                   roles: Optional[Dict[str, ObjectId]] = None) -> Tuple[List[dict], List[dict]]:
+    """Documents ``start..stop`` of ``kind`` (runs in a worker process); users also return their stores."""
+    if kind == PRODUCTS:
+        return [generate_product(seed, i, stores) for i in range(start, stop)], []
+    users = [generate_user(seed, i, roles, stores) for i in range(start, stop)]
+    created_stores = [generate_store(seed, i, user["_id"]) for i, user in enumerate(users, start) if user["hasStore"]]
+    return users, created_stores
+
+
+def chunk_ranges(count: int, chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[int, int]]:
+    for start in range(0, count, chunk_size):
+        yield start, min(start + chunk_size, count)
+
+
+async def _generate(kind: int, seed: int, count: int, stores: int, workers: int,
+                    roles: Optional[Dict[str, ObjectId]] = None):
+    """Yield generated chunks in order, with up to ``2 * workers`` chunks being generated ahead."""
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        ranges = chunk_ranges(count)
+        pending = []
+        for start, stop in ranges:
+            pending.append(loop.run_in_executor(pool, generate_chunk, kind, seed, start, stop, stores, roles))
+            if len(pending) >= 2 * workers:
+                yield await pending.pop(0)
+        for future in pending:
+            yield await future
+
+
+async def seed_mongo(seed: int, users: int, stores: int, products: int, workers: int, writers: int):
+    """Insert the dataset with ``writers`` concurrent unordered insert_many calls."""
+    from app.models.database import db
+
+    roles = {role["name"]: role["_id"] async for role in db.roles.find({"name": {"$in": ["vendor", "client"]}})}
+    if len(roles) < 2:
+        logger.error("Roles not found. Please run the structure_seeds.py first.")
+        return
+
+    semaphore = asyncio.Semaphore(writers)
+    inserts = set()
+    failures: List[BaseException] = []
+
+    async def insert(collection, docs: List[dict]):
+        try:
+            await collection.insert_many(docs, ordered=False)
+        finally:
+            semaphore.release()
+
+    def finished(task: asyncio.Task):
+        inserts.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            failures.append(task.exception())
+
+    async def drain():
+        """Wait for the running inserts and raise the first failure of any insert so far."""
+        await asyncio.gather(*inserts, return_exceptions=True)
+        if failures:
+            logger.error(f"{len(failures)} insert_many calls failed")
+            raise failures[0]
+
+    async def schedule(collection, docs: List[dict]):
+        # Generation waits for a free writer, so at most ``writers`` chunks are held in memory
+        await semaphore.acquire()
+        if failures:
+            semaphore.release()
+            await drain()
+        task = asyncio.create_task(insert(collection, docs))
+        inserts.add(task)
+        task.add_done_callback(finished)
+
+    started = time.perf_counter()
+    async for user_docs, store_docs in _generate(USERS, seed, users, stores, workers, roles):
+        await schedule(db.users, user_docs)
+        if store_docs:
+            await schedule(db.stores, store_docs)
+    await drain()
+    logger.info(f"{users} users and {stores} stores inserted in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    inserted = 0
+    async for product_docs, _ in _generate(PRODUCTS, seed, products, stores, workers):
+        await schedule(db.products, product_docs)
+        inserted += len(product_docs)
+        if inserted % (CHUNK_SIZE * 20) == 0:
+            logger.info(f"{inserted} products ({inserted / (time.perf_counter() - started):.0f}/s)")
+    await drain()
+    logger.info(f"{products} products inserted in {time.perf_counter() - started:.1f}s")
+
+
+async def seed_snapshot(seed: int, stores: int, products: int, workers: int, output: Path):
+    """Build the in-memory search catalog straight from generated products and publish it as a snapshot."""
+    from app.services.catalog.snapshot import write_snapshot
+    from app.services.catalog.store import CatalogBuilder
+
+    started = time.perf_counter()
+    builder = CatalogBuilder()
+    async for product_docs, _ in _generate(PRODUCTS, seed, products, stores, workers):
+        for doc in product_docs:
+            builder.add(doc)
+    store = builder.build()
+    snapshot_dir = write_snapshot(store, output)
+    usage = store.memory_usage()
+    logger.info(
+        f"Snapshot {snapshot_dir.name} written: {usage['products']} products, "
+        f"{usage['total_bytes'] / 1e6:.1f} MB in {time.perf_counter() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    from app.core.config import settings
+
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic dataset (users, stores, products)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--stores", type=int, default=2_000, help="The first STORES users are vendors")
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=4, help="Generating processes")
+    parser.add_argument("--writers", type=int, default=4, help="Concurrent insert_many calls")
+    parser.add_argument("--target", choices=("mongo", "snapshot"), default="mongo",
+                        help="Insert into Mongo, or build an in-memory search snapshot without Mongo")
+    parser.add_argument("--output", type=Path, default=root_dir / settings.SEARCH_SNAPSHOT_DIR)
+    args = parser.parse_args()
+    if not 1 <= args.stores <= args.users:
+        parser.error("--stores must be between 1 and --users")
+
+    if args.target == "mongo":
+        asyncio.run(seed_mongo(args.seed, args.users, args.stores, args.products, args.workers, args.writers))
+    else:
+        asyncio.run(seed_snapshot(args.seed, args.stores, args.products, args.workers, args.output))
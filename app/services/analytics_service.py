@@ -0,0 +1,134 @@
+# app/services/analytics_service.py
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from fastapi import HTTPException
+from pymongo import ASCENDING
+
+from app.models.database import db
+from app.services.write_behind import get_write_behind
+from app.utils.logger import logger
+
+# Rollup periods -> strftime format of the bucket id, as understood by $dateToString too
+ROLLUP_PERIODS = {"hour": "%Y-%m-%dT%H", "day": "%Y-%m-%d"}
+PERIOD_LENGTHS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+# Active user markers are kept this long after the end of their bucket
+ACTIVE_MARKER_GRACE = timedelta(hours=1)
+MAX_ROLLUPS = 2000
+
+
+def bucket_start(at: datetime, period: str) -> datetime:
+    if period == "hour":
+        return at.replace(minute=0, second=0, microsecond=0)
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def rollup_id(period: str, start: datetime) -> str:
+    return f"{period}:{start.strftime(ROLLUP_PERIODS[period])}"
+
+
+def _rollup_update(period: str, start: datetime, increments: dict) -> dict:
+    return {"$inc": increments, "$setOnInsert": {"period": period, "start": start}}
+
+
+def _count_active_user(period: str, start: datetime):
+    _id = rollup_id(period, start)
+    update = _rollup_update(period, start, {"active_users": 1})
+    if not get_write_behind().submit("analytics_rollups", "_id", _id, update, upsert=True):
+        logger.warning("Active user not counted, background writer closed", extra={"rollup": _id})
+
+
+async def record_login(strategy: str, signup: bool, user_id: str):
+    """
+    Count one login in the current hourly and daily rollups of ``db.analytics_rollups``:
+    ``signups.<strategy>`` for a new user, else ``returning_logins.<strategy>``.
+
+    ``active_users`` counts each user once per bucket: the login upserts a marker keyed by
+    (bucket, user) in ``db.analytics_active``, and only the upsert that creates it increments
+    the counter. Everything goes through the background writer, which sums the logins of a
+    flush into one update per bucket and merges the markers of a user logging in again.
+    """
+    now = datetime.utcnow()
+    for period in ROLLUP_PERIODS:
+        start = bucket_start(now, period)
+        _id = rollup_id(period, start)
+        update = _rollup_update(period, start, {f"{'signups' if signup else 'returning_logins'}.{strategy}": 1})
+        if not get_write_behind().submit("analytics_rollups", "_id", _id, update, upsert=True):
+            await db.analytics_rollups.update_one({"_id": _id}, update, upsert=True)
+
+        marker = {"$setOnInsert": {"expires_at": start + PERIOD_LENGTHS[period] + ACTIVE_MARKER_GRACE}}
+        if not get_write_behind().submit("analytics_active", "_id", f"{_id}:{user_id}", marker, upsert=True,
+                                         on_inserted=lambda period=period, start=start: _count_active_user(period, start)):
+            result = await db.analytics_active.update_one({"_id": f"{_id}:{user_id}"}, marker, upsert=True)
+            if result.upserted_id is not None:
+                await db.analytics_rollups.update_one(
+                    {"_id": _id}, _rollup_update(period, start, {"active_users": 1}), upsert=True)
+
+
+def signup_backfill_pipeline(period: str, since: Optional[datetime] = None) -> List[dict]:
+    """
+    Aggregation counting the signups of every ``period`` bucket by provider from the users
+    collection and merging them into the rollups. The signups of a bucket are replaced, so
+    running it again is harmless; the other counters of existing rollups are kept.
+
+    The provider is ``signup_provider``, else the first linked account for users created
+    before it was stored: ``strategy`` is the provider of the latest login.
+
+    ``since`` is moved back to the start of its bucket: the bucket it falls in is replaced
+    too, and must count all of its signups.
+    """
+    signed_up = {"$ifNull": ["$created_at", "$first_register"]}
+    provider = {"$ifNull": ["$signup_provider", {"$arrayElemAt": ["$linked_accounts.provider", 0]}, "unknown"]}
+    pipeline = []
+    if since:
+        pipeline.append({"$match": {"$expr": {"$gte": [signed_up, bucket_start(since, period)]}}})
+    pipeline += [
+        {"$group": {
+            "_id": {"start": {"$dateTrunc": {"date": signed_up, "unit": period}}, "strategy": provider},
+            "count": {"$sum": 1},
+        }},
+        {"$match": {"_id.start": {"$ne": None}}},
+        {"$group": {"_id": "$_id.start", "signups": {"$push": {"k": "$_id.strategy", "v": "$count"}}}},
+        {"$project": {
+            "_id": {"$concat": [f"{period}:", {"$dateToString": {"date": "$_id", "format": ROLLUP_PERIODS[period]}}]},
+            "period": period,
+            "start": "$_id",
+            "signups": {"$arrayToObject": "$signups"},
+        }},
+        {"$merge": {"into": "analytics_rollups", "on": "_id", "whenMatched": "merge", "whenNotMatched": "insert"}},
+    ]
+    return pipeline
+
+
+class AnalyticsService:
+    """
+    Materialized signup and login rollups, one document per hour and per day.
+
+    Live counters come from ``record_login``. Only signups can be rebuilt for the past
+    (``backfill_signups``): user documents keep their latest login, not every login.
+    """
+
+    async def ensure_indexes(self):
+        await db.analytics_rollups.create_index([("period", ASCENDING), ("start", ASCENDING)])
+        await db.analytics_active.create_index("expires_at", expireAfterSeconds=0)
+
+    async def backfill_signups(self, period: str, since: Optional[datetime] = None):
+        await db.users.aggregate(signup_backfill_pipeline(period, since), allowDiskUse=True).to_list(length=None)
+        logger.info("Signup rollups backfilled", extra={"period": period, "since": since})
+
+    async def get_rollups(self, period: str, since: Optional[datetime] = None,
+                          until: Optional[datetime] = None) -> List[dict]:
+        """Rollups of ``period`` starting in [since, until), oldest first (default: the last 30 days)."""
+        if period not in ROLLUP_PERIODS:
+            raise HTTPException(status_code=400, detail=f"Invalid period, expected one of {', '.join(ROLLUP_PERIODS)}")
+        until = until or datetime.utcnow()
+        since = since or until - timedelta(days=30)
+        docs = await db.analytics_rollups.find(
+            {"period": period, "start": {"$gte": since, "$lt": until}}
+        ).sort("start", ASCENDING).limit(MAX_ROLLUPS).to_list(length=None)
+        for doc in docs:
+            doc.setdefault("signups", {})
+            doc.setdefault("returning_logins", {})
+            doc.setdefault("active_users", 0)
+            doc["logins"] = sum(doc["signups"].values()) + sum(doc["returning_logins"].values())
+        return docs
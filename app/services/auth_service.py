@@ -1,9 +1,27 @@
 from datetime import datetime
+from typing import Optional
 from app.models.database import db
 from app.models.schemas import UserInDB, UserUpdate
 from bson import ObjectId
 from app.core.config import settings
 from app.core.security import create_refresh_token
+from app.services.analytics_service import record_login
+from app.services.write_behind import get_write_behind
+from app.utils.etag import RevisionCache
+
+# Current ETag of the users recently read by this worker, by email
+_user_etags = RevisionCache()
+
+
+def get_user_etags() -> RevisionCache:
+    return _user_etags
+
+
+def user_etag(user_id, revision: int, updated_at: Optional[datetime]) -> str:
+    # updated_at covers documents written before revisions were counted
+    stamp = int(updated_at.timestamp() * 1000) if updated_at else 0
+    return f'"{user_id}.{revision}.{stamp}"'
+
 
 class AuthService:
     async def get_or_create_user(self, user_info: dict) -> UserInDB:
@@ -16,55 +34,55 @@ class AuthService:
         
         if user:
             user["_id"] = str(user["_id"])  # Convertir ObjectId → string
-            # Update the refresh token if the user logs in again
+            # The refresh token is checked by /refresh: store it before the login completes
             new_refresh_token = create_refresh_token({"sub": user_info["email"]})
             await self.update_refresh_token(user_info["email"], new_refresh_token)
             user["refresh_token"] = new_refresh_token
-            user["strategy"] = strategy  # Update strategy
-            user["updated_at"] = datetime.utcnow()  # Update updated_at
-            user["last_register"] = datetime.utcnow()  # Update last_register
-            user["picture"] = user_info.get("picture", {}).get("data", {}).get("url") if strategy == "facebook" else user_info.get("picture")  # Update picture
-            
-            # Ensure first_register is set
-            if "first_register" not in user:
-                user["first_register"] = datetime.utcnow()
-            
-            # Ensure roles is set
-            if "roles" not in user:
-                user["roles"] = []
-            else:
-                user["roles"] = [str(role_id) for role_id in user["roles"]]  # Convert roles to list of strings
-            
-            # Ensure additional fields are set
-            additional_fields = {
-                "address": user.get("address", None),
-                "phone_one": user.get("phone_one", None),
-                "phone_two": user.get("phone_two", None),
-                "phone_three": user.get("phone_three", None),
-                "verified": user.get("verified", False),
-                "timezone": user.get("timezone", None),
-                "hasStore": user.get("hasStore", False),
-                "storeId": user.get("storeId", None)
+
+            now = datetime.utcnow()
+            changes = {
+                "strategy": strategy,
+                "updated_at": now,
+                "last_register": now,
+                "picture": user_info.get("picture", {}).get("data", {}).get("url") if strategy == "facebook" else user_info.get("picture"),
+            }
+            # Ensure first_register, roles and additional fields are set
+            defaults = {
+                "first_register": now,
+                "roles": [],
+                "address": None,
+                "phone_one": None,
+                "phone_two": None,
+                "phone_three": None,
+                "verified": False,
+                "timezone": None,
+                "hasStore": False,
+                "storeId": None,
             }
-            user.update(additional_fields)
-            
+            changes.update({field: value for field, value in defaults.items() if field not in user})
+            if "signup_provider" not in user:
+                # Users created before it was stored signed up with their first linked account
+                changes["signup_provider"] = (user.get("linked_accounts") or [{"provider": strategy}])[0]["provider"]
+            user.update(changes)
+            user["roles"] = [str(role_id) for role_id in user["roles"]]  # Convert roles to list of strings
+
             # Link accounts if necessary
             if strategy == "google" and not user.get("google_sub"):
                 user["google_sub"] = user_id
             elif strategy == "facebook" and not user.get("facebook_sub"):
                 user["facebook_sub"] = user_id
-            
-            # Update linked accounts
-            if "linked_accounts" not in user:
-                user["linked_accounts"] = []
-            existing_account = next((account for account in user["linked_accounts"] if account["provider"] == strategy and account["accountId"] == user_id), None)
-            if not existing_account:
-                user["linked_accounts"].append({"provider": strategy, "accountId": user_id})
-            
-            # Remove _id, google_sub, facebook_sub, and etat from the update data to avoid modifying the immutable field and unnecessary fields
-            user_data_to_update = {k: v for k, v in user.items() if k not in ["_id", "google_sub", "facebook_sub", "etat"]}
-            
-            await db.users.update_one({"email": user_info["email"]}, {"$set": user_data_to_update})
+            account = {"provider": strategy, "accountId": user_id}
+            user.setdefault("linked_accounts", [])
+            if account not in user["linked_accounts"]:
+                user["linked_accounts"].append(account)
+
+            # Nothing below is needed to authenticate: leave it to the background writer
+            email = user_info["email"]
+            update = {"$set": changes, "$addToSet": {"linked_accounts": {"$each": [account]}}, "$inc": {"revision": 1}}
+            if not get_write_behind().submit("users", "email", email, update, on_written=lambda: _user_etags.invalidate(email)):
+                await db.users.update_one({"email": email}, update)
+                _user_etags.invalidate(email)
+            await record_login(strategy, signup=False, user_id=user["_id"])
             return UserInDB(**user)
         
         # Determine the role of the user
@@ -86,6 +104,7 @@ class AuthService:
             "status": "active",  # Add status field with default value
             "refresh_token": create_refresh_token({"sub": email}),  # Generate refresh token
             "strategy": strategy,  # Add strategy field
+            "signup_provider": strategy,  # Unlike strategy, never updated by later logins
             "created_at": datetime.utcnow(),  # Add created_at
             "updated_at": datetime.utcnow(),  # Add updated_at
             "first_register": datetime.utcnow(),  # Add first_register
@@ -98,11 +117,13 @@ class AuthService:
             "verified": False,  # Add verified field with default value
             "timezone": user_info.get("timezone"),  # Add timezone field
             "hasStore": False,  # Add hasStore field with default value
-            "storeId": None  # Add storeId field
+            "storeId": None,  # Add storeId field
+            "revision": 0
         }
         
         # Insérer dans MongoDB
         result = await db.users.insert_one(new_user_data)
+        await record_login(strategy, signup=True, user_id=str(result.inserted_id))
         new_user = await db.users.find_one({"_id": result.inserted_id})
         new_user["_id"] = str(new_user["_id"])  # Convertir pour Pydantic
         new_user["roles"] = [str(role_id) for role_id in new_user["roles"]]  # Convert roles to list of strings
@@ -117,8 +138,18 @@ class AuthService:
             return UserInDB(**user)
         return None
 
+    async def get_user_etag(self, email: str) -> Optional[str]:
+        """ETag of a user's current document, read without the document itself."""
+        user = await db.users.find_one({"email": email}, {"revision": 1, "updated_at": 1})
+        if not user:
+            return None
+        etag = user_etag(user["_id"], user.get("revision", 0), user.get("updated_at"))
+        _user_etags.put(email, etag)
+        return etag
+
     async def update_refresh_token(self, email: str, refresh_token: str):
-        await db.users.update_one({"email": email}, {"$set": {"refresh_token": refresh_token}})
+        await db.users.update_one({"email": email}, {"$set": {"refresh_token": refresh_token}, "$inc": {"revision": 1}})
+        _user_etags.invalidate(email)
 
     async def update_user_profile(self, email: str, user_update: UserUpdate) -> UserInDB:
         """
@@ -128,7 +159,8 @@ class AuthService:
         update_data["updated_at"] = datetime.utcnow()
 
         # Update the user in the database
-        result = await db.users.update_one({"email": email}, {"$set": update_data})
+        result = await db.users.update_one({"email": email}, {"$set": update_data, "$inc": {"revision": 1}})
+        _user_etags.invalidate(email)
         if result.modified_count == 0:
             raise ValueError("Failed to update user profile")
 
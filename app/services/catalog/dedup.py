@@ -0,0 +1,109 @@
+# app/services/catalog/dedup.py
+import zlib
+from typing import List, Sequence
+
+import numpy as np
+
+from app.services.catalog.text_index import tokenize
+
+# MinHash signature length, split into LSH bands of BAND_ROWS values
+NUM_PERM = 64
+BAND_ROWS = 2
+# Products of the same vendor whose name token sets have at least this Jaccard similarity
+# are near-duplicates ("Panier Osier Traditionnel" / "Panier Fruits Osier": 2 of 4 tokens)
+DUPLICATE_THRESHOLD = 0.5
+
+_MERSENNE = (1 << 61) - 1
+_rng = np.random.default_rng(0x5EED)  # fixed, so signatures are the same in every process
+_A = _rng.integers(1, 1 << 31, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 31, NUM_PERM, dtype=np.uint64)
+
+
+def minhash_signatures(names: Sequence[str]) -> np.ndarray:
+    """
+    ``len(names) x NUM_PERM`` MinHash signatures of the name token sets (uint64).
+
+    Each permutation is a universal hash ``(a * h + b) mod p`` of the token's crc32, applied to
+    all tokens at once and reduced per document with ``minimum.reduceat``. Names without any
+    token get a signature of all-max values and never match anything.
+    """
+    doc_ids: List[int] = []
+    hashes: List[int] = []
+    for doc_id, name in enumerate(names):
+        for token in set(tokenize(name)):
+            doc_ids.append(doc_id)
+            hashes.append(zlib.crc32(token.encode("utf-8")))
+    signatures = np.full((len(names), NUM_PERM), np.iinfo(np.uint64).max, dtype=np.uint64)
+    if not hashes:
+        return signatures
+    doc_ids = np.array(doc_ids, dtype=np.int64)
+    hashes = np.array(hashes, dtype=np.uint64)
+    starts = np.flatnonzero(np.r_[True, doc_ids[1:] != doc_ids[:-1]])  # doc ids are already sorted
+    docs = doc_ids[starts]
+    for i in range(NUM_PERM):
+        values = (_A[i] * hashes + _B[i]) % np.uint64(_MERSENNE)
+        signatures[docs, i] = np.minimum.reduceat(values, starts)
+    return signatures
+
+
+def _band_keys(signatures: np.ndarray, vendor_id: np.ndarray, band: int) -> np.ndarray:
+    """One uint64 key per document for ``band``, mixed with the vendor so buckets never span vendors."""
+    keys = vendor_id.astype(np.uint64)
+    with np.errstate(over="ignore"):
+        for column in range(band * BAND_ROWS, (band + 1) * BAND_ROWS):
+            keys = keys * np.uint64(0x100000001B3) ^ signatures[:, column]
+    return keys
+
+
+def duplicate_clusters(names: Sequence[str], vendor_id: np.ndarray,
+                       threshold: float = DUPLICATE_THRESHOLD) -> np.ndarray:
+    """
+    Cluster id of every product: the smallest row of its near-duplicate group (its own row
+    for unique products).
+
+    Candidate pairs come from LSH: documents sharing every value of a band (and the vendor)
+    fall in the same bucket and are paired with the bucket's first document, which takes one
+    sort per band instead of comparing all pairs. Candidates are kept when their estimated
+    Jaccard similarity (the fraction of equal signature values) reaches ``threshold``, and
+    kept pairs are merged into groups with vectorized label propagation.
+    """
+    n = len(names)
+    labels = np.arange(n, dtype=np.int32)
+    if n < 2:
+        return labels
+    signatures = minhash_signatures(names)
+    has_tokens = signatures[:, 0] != np.iinfo(np.uint64).max
+
+    left, right = [], []
+    for band in range(NUM_PERM // BAND_ROWS):
+        keys = _band_keys(signatures, vendor_id, band)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        firsts = np.repeat(order[starts], np.diff(np.r_[starts, n]))
+        pair = (firsts != order) & has_tokens[order]
+        left.append(firsts[pair])
+        right.append(order[pair])
+    left = np.concatenate(left)
+    right = np.concatenate(right)
+    if not len(left):
+        return labels
+
+    pairs = np.unique(left.astype(np.int64) * n + right)  # the same pair comes from several bands
+    left, right = pairs // n, pairs % n
+    # Verify in slices: the comparison is pairs x NUM_PERM
+    keep = np.concatenate([
+        (signatures[left[i:i + 65536]] == signatures[right[i:i + 65536]]).mean(axis=1) >= threshold
+        for i in range(0, len(left), 65536)
+    ])
+    left, right = left[keep], right[keep]
+
+    while True:
+        smallest = np.minimum(labels[left], labels[right])
+        updated = labels.copy()
+        np.minimum.at(updated, left, smallest)
+        np.minimum.at(updated, right, smallest)
+        updated = updated[updated]  # pointer jumping
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
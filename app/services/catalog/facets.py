@@ -0,0 +1,48 @@
+# app/services/catalog/facets.py
+from typing import List, Optional
+
+import numpy as np
+
+from app.services.catalog.governorates import GOVERNORATES
+from app.services.catalog.store import CatalogStore, PRICE_BUCKET_EDGES, RATING_BANDS
+
+
+def _counts(codes: np.ndarray, size: int, offset: int = 0) -> np.ndarray:
+    """Count integer codes in [-offset, size - offset) with a single bincount."""
+    return np.bincount(codes.astype(np.int32) + offset, minlength=size + offset)
+
+
+def _top(labels: List[str], counts: np.ndarray, limit: Optional[int]) -> List[dict]:
+    nonzero = np.flatnonzero(counts)
+    order = nonzero[np.argsort(-counts[nonzero], kind="stable")][:limit]
+    return [{"value": labels[i], "count": int(counts[i])} for i in order]
+
+
+def compute_facets(catalog: CatalogStore, mask: np.ndarray, vendor_limit: Optional[int] = 20) -> dict:
+    """
+    Count the rows selected by ``mask`` per vendor, governorate, price bucket and rating band.
+
+    Every facet is a bincount over an integer-coded column restricted to the matching rows,
+    so the cost is linear in the result set, like the search itself.
+    """
+    rows = np.flatnonzero(mask)
+
+    vendors = _counts(catalog.take("vendor_id", rows), len(catalog.vendors))
+    governorates = _counts(catalog.take("governorate_id", rows), len(GOVERNORATES), offset=1)[1:]
+    prices = _counts(catalog.take("price_bucket", rows), len(PRICE_BUCKET_EDGES) + 1)
+    ratings = _counts(catalog.take("rating_band", rows), RATING_BANDS, offset=1)
+
+    edges = (0.0,) + PRICE_BUCKET_EDGES + (None,)
+    return {
+        "vendors": _top(catalog.vendors.values, vendors, vendor_limit),
+        "governorates": _top(list(GOVERNORATES), governorates, None),
+        "price": [
+            {"min": edges[i], "max": edges[i + 1], "count": int(count)}
+            for i, count in enumerate(prices)
+        ],
+        "rating": [
+            {"min": band, "max": band + 1, "count": int(ratings[band + 1])}
+            for band in range(RATING_BANDS)
+        ],
+        "unrated": int(ratings[0]),
+    }
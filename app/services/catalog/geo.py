@@ -0,0 +1,93 @@
+# app/services/catalog/geo.py
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.services.catalog.governorates import GOVERNORATES, UNKNOWN_GOVERNORATE, fold, governorate_id
+
+# Chef-lieu coordinates (lat, lon) of each governorate, same order as GOVERNORATES
+GOVERNORATE_COORDS = np.array([
+    (36.8065, 10.1815), (36.8625, 10.1956), (36.7531, 10.2189), (36.8101, 10.0956),
+    (36.4561, 10.7376), (36.4029, 10.1429), (37.2744, 9.8739), (36.7256, 9.1817),
+    (36.5011, 8.7802), (36.1822, 8.7148), (36.0849, 9.3708), (35.8256, 10.6084),
+    (35.7643, 10.8113), (35.5047, 11.0622), (35.6781, 10.0963), (35.1676, 8.8365),
+    (35.0382, 9.4849), (34.7406, 10.7603), (33.7044, 8.9690), (33.9197, 8.1335),
+    (34.4250, 8.7842), (33.8815, 10.0982), (33.3549, 10.5055), (32.9297, 10.4518),
+], dtype=np.float64)
+
+# Towns that appear in addresses without their governorate
+CITIES: Dict[str, Tuple[str, float, float]] = {
+    "djerba": ("Médenine", 33.8756, 10.8575),
+    "houmt souk": ("Médenine", 33.8756, 10.8575),
+    "zarzis": ("Médenine", 33.5036, 11.1122),
+    "hammamet": ("Nabeul", 36.4000, 10.6167),
+    "kelibia": ("Nabeul", 36.8475, 11.0939),
+    "la marsa": ("Tunis", 36.8782, 10.3247),
+    "carthage": ("Tunis", 36.8528, 10.3233),
+    "sidi bou said": ("Tunis", 36.8687, 10.3416),
+    "port el kantaoui": ("Sousse", 35.8919, 10.5950),
+    "kef": ("Le Kef", 36.1822, 8.7148),
+    "tabarka": ("Jendouba", 36.9544, 8.7580),
+    "el jem": ("Mahdia", 35.2967, 10.7128),
+    "douz": ("Kébili", 33.4667, 9.0203),
+    "nefta": ("Tozeur", 33.8731, 7.8778),
+    "matmata": ("Gabes", 33.5443, 9.9674),
+    "metlaoui": ("Gafsa", 34.3214, 8.4014),
+}
+
+EARTH_RADIUS_KM = 6371.0
+# Proximity boost halves every PROXIMITY_HALF_LIFE_KM
+PROXIMITY_HALF_LIFE_KM = 100.0
+
+
+def _haversine_matrix(coords: np.ndarray) -> np.ndarray:
+    lat = np.radians(coords[:, 0])[:, None]
+    lon = np.radians(coords[:, 1])[:, None]
+    a = np.sin((lat - lat.T) / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin((lon - lon.T) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def _with_unknown_column(table: np.ndarray, fill: float) -> np.ndarray:
+    # Column 0 is the unknown governorate, so a catalog column can be used as ``gid + 1``
+    return np.hstack([np.full((len(table), 1), fill), table]).astype(np.float32)
+
+
+# Governorate-to-governorate distances (km) and proximity boosts, indexed [user_gid, product_gid + 1]
+DISTANCE_KM = _with_unknown_column(_haversine_matrix(GOVERNORATE_COORDS), np.inf)
+PROXIMITY = _with_unknown_column(0.5 ** (_haversine_matrix(GOVERNORATE_COORDS) / PROXIMITY_HALF_LIFE_KM), 0.0)
+
+
+def locate(address: Optional[str]) -> Optional[dict]:
+    """Resolve an address like "Route de Sfax, Sousse" to its governorate and coordinates.
+
+    Segments are tried from the last one (usually the city), first as a governorate
+    name then as a known town, so "Souk El Attarine, Djerba" resolves to Médenine.
+    """
+    if not address:
+        return None
+    for segment in reversed(address.split(",")):
+        gid = governorate_id(segment)
+        if gid != UNKNOWN_GOVERNORATE:
+            lat, lon = GOVERNORATE_COORDS[gid]
+            return {"governorate": GOVERNORATES[gid], "lat": float(lat), "lon": float(lon)}
+        city = CITIES.get(fold(segment))
+        if city:
+            name, lat, lon = city
+            return {"governorate": name, "lat": lat, "lon": lon}
+    return None
+
+
+def location_governorate_id(doc: dict) -> int:
+    """Governorate id of a product, using its stored ``location`` when it was resolved at ingest."""
+    location = doc.get("location") or locate(doc.get("address"))
+    return governorate_id(location["governorate"]) if location else UNKNOWN_GOVERNORATE
+
+
+def distances_from(user_gid: int, governorate_ids: np.ndarray) -> np.ndarray:
+    """Distance in km from a governorate to each catalog row (inf when unknown)."""
+    return DISTANCE_KM[user_gid][governorate_ids.astype(np.int32) + 1]
+
+
+def proximity_from(user_gid: int, governorate_ids: np.ndarray) -> np.ndarray:
+    """Proximity weight in [0, 1] from a governorate to each catalog row (0 when unknown)."""
+    return PROXIMITY[user_gid][governorate_ids.astype(np.int32) + 1]
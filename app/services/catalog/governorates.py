@@ -0,0 +1,30 @@
+# app/services/catalog/governorates.py
+import unicodedata
+from typing import Optional
+
+# Same list and order as front/data/governorates.ts - the position is the governorate id
+GOVERNORATES = (
+    "Tunis", "Ariana", "Ben Arous", "Manouba", "Nabeul", "Zaghouan",
+    "Bizerte", "Beja", "Jendouba", "Le Kef", "Siliana", "Sousse",
+    "Monastir", "Mahdia", "Kairouan", "Kasserine", "Sidi Bouzid", "Sfax",
+    "Kébili", "Tozeur", "Gafsa", "Gabes", "Médenine", "Tataouine",
+)
+
+UNKNOWN_GOVERNORATE = -1
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip accents so "Kébili", "kebili" and "KEBILI" compare equal."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower().strip()
+
+
+_GOVERNORATE_IDS = {fold(name): gid for gid, name in enumerate(GOVERNORATES)}
+
+
+def governorate_id(name: Optional[str]) -> int:
+    """Return the governorate id for a name (accent/case insensitive), or -1."""
+    if not name:
+        return UNKNOWN_GOVERNORATE
+    return _GOVERNORATE_IDS.get(fold(name), UNKNOWN_GOVERNORATE)
+
@@ -0,0 +1,76 @@
+# app/services/catalog/preferences.py
+import zlib
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from app.services.catalog.geo import location_governorate_id
+from app.services.catalog.governorates import GOVERNORATES, fold
+from app.services.catalog.store import PRICE_BUCKET_EDGES, RATING_BANDS, CatalogStore
+
+# A user preference vector has one weight per product feature value. Every product has exactly
+# one value per feature, so its affinity is the sum of five weights: no product matrix needed.
+VENDOR_BUCKETS = 256  # vendors are hashed, so the vector size does not grow with the catalog
+PRICE_OFFSET = VENDOR_BUCKETS
+RATING_OFFSET = PRICE_OFFSET + len(PRICE_BUCKET_EDGES) + 1
+GOVERNORATE_OFFSET = RATING_OFFSET + RATING_BANDS + 1  # + 1 for unrated
+NEW_INDEX = GOVERNORATE_OFFSET + len(GOVERNORATES) + 1  # + 1 for unknown
+PREFERENCE_DIM = NEW_INDEX + 1
+
+# Signed strength of each feedback event type
+EVENT_WEIGHTS = {
+    "like": 1.0, "unlike": -1.0,
+    "dislike": -1.0, "undislike": 1.0,
+    "favorite": 2.0, "unfavorite": -2.0,
+    "click": 0.25, "view": 0.0,
+}
+
+# Scores of the reranked products are multiplied by 1 +/- PERSONALIZATION_WEIGHT at most
+PERSONALIZATION_WEIGHT = 0.3
+# Affinity at which the boost reaches ~76% of its maximum (tanh(1))
+AFFINITY_SCALE = 5.0
+
+
+def vendor_bucket(vendor: str) -> int:
+    # crc32, unlike hash(), is the same in every worker process
+    return zlib.crc32(fold(vendor).encode("utf-8")) % VENDOR_BUCKETS
+
+
+def vendor_buckets(vendors: Iterable[str]) -> np.ndarray:
+    """Bucket of every vendor id of a catalog."""
+    return np.array([vendor_bucket(v) for v in vendors], dtype=np.int32)
+
+
+def document_features(doc: dict) -> List[int]:
+    """Feature indices of a product document (used when applying feedback)."""
+    rating = doc.get("rating")
+    band = -1 if rating is None else min(int(rating), RATING_BANDS - 1)
+    features = [
+        vendor_bucket(doc.get("vendor") or ""),
+        PRICE_OFFSET + int(np.searchsorted(PRICE_BUCKET_EDGES, float(doc.get("numericPrice") or 0.0), side="right")),
+        RATING_OFFSET + band + 1,
+        GOVERNORATE_OFFSET + location_governorate_id(doc) + 1,
+    ]
+    if doc.get("isNew"):
+        features.append(NEW_INDEX)
+    return features
+
+
+def affinities(catalog: CatalogStore, buckets: np.ndarray, preferences: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Dot product of ``preferences`` with the (one-hot) feature vectors of ``rows``."""
+    # int8 columns are widened first: the offsets do not fit in them
+    return (
+        preferences[buckets[catalog.take("vendor_id", rows)]]
+        + preferences[PRICE_OFFSET + catalog.take("price_bucket", rows).astype(np.intp)]
+        + preferences[RATING_OFFSET + 1 + catalog.take("rating_band", rows).astype(np.intp)]
+        + preferences[GOVERNORATE_OFFSET + 1 + catalog.take("governorate_id", rows).astype(np.intp)]
+        + preferences[NEW_INDEX] * catalog.take("is_new", rows)
+    )
+
+
+def personal_boost(catalog: CatalogStore, buckets: np.ndarray, preferences: Optional[np.ndarray],
+                   rows: np.ndarray) -> np.ndarray:
+    """Score multipliers in [1 - w, 1 + w] for ``rows`` (all ones without preferences)."""
+    if preferences is None:
+        return np.ones(len(rows), dtype=np.float32)
+    return 1 + PERSONALIZATION_WEIGHT * np.tanh(affinities(catalog, buckets, preferences, rows) / AFFINITY_SCALE)
@@ -0,0 +1,126 @@
+# app/services/catalog/query_parser.py
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.services.catalog.geo import CITIES
+from app.services.catalog.governorates import GOVERNORATES, fold
+from app.services.catalog.text_index import STOPWORDS
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+_NUMBER = r"(\d+(?:[.,]\d+)?)"
+_CURRENCY = r"(?:\s*(?:tnd|dt|dinars?)\b)?"
+_BETWEEN_RE = re.compile(
+    rf"\b(?:entre|de|from|between)\s+{_NUMBER}{_CURRENCY}\s+(?:et|a|and|to)\s+{_NUMBER}{_CURRENCY}"
+    rf"|{_NUMBER}{_CURRENCY}\s*-\s*{_NUMBER}{_CURRENCY}"
+)
+_MAX_RE = re.compile(
+    rf"(?:\b(?:moins de|moins que|max|maximum|jusqu'?a|sous|under|less than|below)\s*|<=?\s*){_NUMBER}{_CURRENCY}"
+)
+_MIN_RE = re.compile(
+    rf"(?:\b(?:plus de|au moins|min|minimum|a partir de|over|more than|above)\s*|>=?\s*){_NUMBER}{_CURRENCY}"
+)
+
+NEW_WORDS = frozenset({
+    "nouveau", "nouvel", "nouvelle", "nouveaux", "nouvelles", "neuf", "neuve",
+    "nouveaute", "nouveautes", "new",
+})
+
+# Longest vendor / place name, in words, looked up in the query
+MAX_NAME_WORDS = 4
+
+
+def _key(name: str) -> str:
+    return " ".join(_WORD_RE.findall(fold(name)))
+
+
+def _number(text: str) -> float:
+    return float(text.replace(",", "."))
+
+
+class ParsedQuery:
+    """Structured constraints extracted from a free-text chat query."""
+
+    def __init__(self, text: str = "", min_price: Optional[float] = None, max_price: Optional[float] = None,
+                 is_new: Optional[bool] = None, vendors: Optional[List[str]] = None,
+                 governorates: Optional[List[str]] = None):
+        self.text = text
+        self.min_price = min_price
+        self.max_price = max_price
+        self.is_new = is_new
+        self.vendors = vendors or []
+        self.governorates = governorates or []
+
+    def as_dict(self) -> dict:
+        return {
+            "text": self.text,
+            "min_price": self.min_price,
+            "max_price": self.max_price,
+            "is_new": self.is_new,
+            "vendors": self.vendors,
+            "governorates": self.governorates,
+        }
+
+
+class QueryParser:
+    """
+    Extracts price ranges, "new" intent, vendor and governorate mentions from queries
+    such as "montre nouvelle entre 200 et 400 dinars" or "sac en cuir moins de 100 TND".
+
+    Vendor and place names are looked up as word n-grams in a dict built once per catalog,
+    so parsing cost depends on the query length only.
+    """
+
+    def __init__(self, vendors: Iterable[str]):
+        self.names: Dict[str, Tuple[str, str]] = {}
+        for vendor in vendors:
+            if _key(vendor):
+                self.names[_key(vendor)] = ("vendor", vendor)
+        for city, (governorate, _, _) in CITIES.items():
+            self.names[city] = ("governorate", governorate)
+        for governorate in GOVERNORATES:
+            self.names[_key(governorate)] = ("governorate", governorate)
+
+    def parse(self, query: Optional[str]) -> ParsedQuery:
+        parsed = ParsedQuery()
+        if not query:
+            return parsed
+        text = fold(query)
+
+        match = _BETWEEN_RE.search(text)
+        if match:
+            low, high = [_number(g) for g in match.groups() if g is not None]
+            parsed.min_price, parsed.max_price = min(low, high), max(low, high)
+            text = text[:match.start()] + " " + text[match.end():]
+        else:
+            match = _MAX_RE.search(text)
+            if match:
+                parsed.max_price = _number(match.group(1))
+                text = text[:match.start()] + " " + text[match.end():]
+            match = _MIN_RE.search(text)
+            if match:
+                parsed.min_price = _number(match.group(1))
+                text = text[:match.start()] + " " + text[match.end():]
+
+        words = _WORD_RE.findall(text)
+        remaining = []
+        i = 0
+        while i < len(words):
+            for n in range(min(MAX_NAME_WORDS, len(words) - i), 0, -1):
+                found = self.names.get(" ".join(words[i:i + n]))
+                if found:
+                    kind, name = found
+                    target = parsed.vendors if kind == "vendor" else parsed.governorates
+                    if name not in target:
+                        target.append(name)
+                    i += n
+                    break
+            else:
+                if words[i] in NEW_WORDS:
+                    parsed.is_new = True
+                elif words[i] not in STOPWORDS:
+                    remaining.append(words[i])
+                i += 1
+
+        parsed.text = " ".join(remaining)
+        return parsed
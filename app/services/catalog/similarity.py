@@ -0,0 +1,97 @@
+# app/services/catalog/similarity.py
+import zlib
+from typing import Iterator, Tuple
+
+import numpy as np
+
+from app.services.catalog.store import CatalogStore
+from app.services.catalog.text_index import TextIndex
+
+# Width of the hashed TF-IDF embeddings (4 bytes per dimension and product)
+EMBEDDING_DIM = 256
+# Neighbours stored per product
+SIMILAR_K = 20
+
+# Bonuses added to the text cosine similarity for shared attributes
+VENDOR_WEIGHT = 0.10
+PRICE_BUCKET_WEIGHT = 0.05
+GOVERNORATE_WEIGHT = 0.02
+
+# One block of similarities is BLOCK_ROWS x BLOCK_COLS float32 (32 MB)
+BLOCK_ROWS = 1024
+BLOCK_COLS = 8192
+
+
+def text_embeddings(index: TextIndex, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """
+    L2-normalized TF-IDF vectors of every document, feature-hashed down to ``dim`` columns.
+
+    Each term is hashed to a column and a sign (crc32, so embeddings are reproducible across
+    runs), which approximates the cosine of the full sparse vectors without a vocabulary-wide
+    matrix. Built in one pass over the postings of the inverted index.
+    """
+    n_docs = len(index.doc_lengths)
+    embeddings = np.zeros((n_docs, dim), dtype=np.float32)
+    if not n_docs or not len(index.doc_ids):
+        return embeddings
+    hashes = np.array([zlib.crc32(term.encode("utf-8")) for term in index.terms()], dtype=np.int64)
+    column = hashes % dim
+    sign = np.where((hashes // dim) & 1, -1.0, 1.0).astype(np.float32)
+
+    df = np.diff(index.indptr)
+    idf = np.log1p(n_docs / df).astype(np.float32)
+    terms = np.repeat(np.arange(len(df)), df)
+    weights = (1 + np.log(index.term_freqs.astype(np.float32))) * idf[terms] * sign[terms]
+    np.add.at(embeddings, (index.doc_ids, column[terms]), weights)
+
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+    return embeddings
+
+
+def _top_k(scores: np.ndarray, columns: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Unordered top ``k`` of every row of ``scores``, with the matching entries of ``columns``."""
+    if scores.shape[1] > k:
+        top = np.argpartition(scores, -k, axis=1)[:, -k:]
+        scores = np.take_along_axis(scores, top, axis=1)
+        columns = np.take_along_axis(columns, top, axis=1)
+    return scores, columns
+
+
+def similar_rows(catalog: CatalogStore, embeddings: np.ndarray, k: int = SIMILAR_K,
+                 block_rows: int = BLOCK_ROWS, block_cols: int = BLOCK_COLS
+                 ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Yield ``(rows, neighbours, scores)`` for consecutive blocks of live catalog rows.
+
+    The score of a pair is the cosine of their embeddings plus bonuses for the same vendor,
+    price bucket and governorate; pairs whose texts are unrelated (cosine <= 0) are never neighbours.
+    Similarities are computed one ``block_rows x block_cols`` matrix product at a time and
+    merged into a running top ``k`` per row, so memory does not depend on the catalog size.
+    ``neighbours`` is ``len(rows) x k`` row numbers sorted by decreasing score, padded with -1.
+    """
+    live = np.flatnonzero(catalog.alive).astype(np.int32)
+    for start in range(0, len(live), block_rows):
+        rows = live[start:start + block_rows]
+        queries = embeddings[rows]
+        best_scores = np.full((len(rows), 0), -np.inf, dtype=np.float32)
+        best = np.empty((len(rows), 0), dtype=np.int32)
+        for col_start in range(0, len(live), block_cols):
+            cols = live[col_start:col_start + block_cols]
+            scores = queries @ embeddings[cols].T
+            related = scores > 0
+            scores += VENDOR_WEIGHT * (catalog.vendor_id[rows, None] == catalog.vendor_id[None, cols])
+            scores += PRICE_BUCKET_WEIGHT * (catalog.price_bucket[rows, None] == catalog.price_bucket[None, cols])
+            scores += GOVERNORATE_WEIGHT * (catalog.governorate_id[rows, None] == catalog.governorate_id[None, cols])
+            scores[~related | (rows[:, None] == cols[None, :])] = -np.inf
+            block_scores, block = _top_k(scores, np.broadcast_to(cols, scores.shape), k)
+            best_scores, best = _top_k(np.hstack([best_scores, block_scores]), np.hstack([best, block]), k)
+
+        if best.shape[1] < k:
+            pad = k - best.shape[1]
+            best_scores = np.pad(best_scores, ((0, 0), (0, pad)), constant_values=-np.inf)
+            best = np.pad(best, ((0, 0), (0, pad)), constant_values=-1)
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best = np.where(np.isfinite(best_scores), np.take_along_axis(best, order, axis=1), -1)
+        yield rows, best, best_scores
@@ -0,0 +1,179 @@
+# app/services/catalog/snapshot.py
+#
+# On-disk layout of the search snapshots:
+#
+#   <root>/CURRENT              name of the snapshot workers must serve
+#   <root>/<version>/meta.json  vendors, vocabulary, counts and the change checkpoint
+#   <root>/<version>/*.npy      one file per array, memory-mapped read-only by every worker
+#
+# A snapshot directory is complete before its name is written to CURRENT, and CURRENT is
+# replaced with an atomic rename, so a worker never sees a half written snapshot.
+import asyncio
+import json
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
+
+from app.services.catalog.store import CatalogStore, StringPool
+from app.services.catalog.text_index import TextIndex
+from app.utils.logger import logger
+
+
+CURRENT_FILE = "CURRENT"
+META_FILE = "meta.json"
+SNAPSHOT_FORMAT = 1
+
+
+def _fsync_dir(path: Path):
+    if os.name == "posix":  # directories cannot be opened for fsync on Windows
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _save_array(path: Path, array: np.ndarray):
+    with open(path, "wb") as f:
+        np.save(f, np.ascontiguousarray(array))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _encode_checkpoint(checkpoint: Optional[dict]) -> Optional[dict]:
+    if checkpoint is None:
+        return None
+    encoded = dict(checkpoint)
+    if encoded.get("updated_at") is not None:
+        encoded["updated_at"] = encoded["updated_at"].isoformat()
+    return encoded
+
+
+def _decode_checkpoint(checkpoint: Optional[dict]) -> Optional[dict]:
+    if checkpoint is None:
+        return None
+    decoded = dict(checkpoint)
+    if decoded.get("updated_at") is not None:
+        decoded["updated_at"] = datetime.fromisoformat(decoded["updated_at"])
+    return decoded
+
+
+def write_snapshot(store: CatalogStore, root: Path, keep: int = 3) -> Path:
+    """Write ``store`` as a new snapshot under ``root``, publish it and prune old ones."""
+    store = store.compacted()
+    root.mkdir(parents=True, exist_ok=True)
+    version = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    tmp_dir = root / f".tmp-{version}"
+    tmp_dir.mkdir()
+
+    for name, array in store.arrays().items():
+        _save_array(tmp_dir / f"catalog.{name}.npy", array)
+    for name, array in store.text_index.arrays().items():
+        _save_array(tmp_dir / f"text.{name}.npy", array)
+
+    meta = {
+        "format": SNAPSHOT_FORMAT,
+        "version": version,
+        "products": len(store),
+        "vendors": store.vendors.values,
+        "terms": store.text_index.terms(),
+        "checkpoint": _encode_checkpoint(store.checkpoint),
+    }
+    with open(tmp_dir / META_FILE, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    _fsync_dir(tmp_dir)
+
+    snapshot_dir = root / version
+    os.replace(tmp_dir, snapshot_dir)
+    publish_snapshot(root, version)
+    prune_snapshots(root, keep)
+    return snapshot_dir
+
+
+def publish_snapshot(root: Path, version: str):
+    """Atomically point CURRENT at ``version``."""
+    tmp_file = root / f".{CURRENT_FILE}.{os.getpid()}"
+    tmp_file.write_text(version, encoding="utf-8")
+    os.replace(tmp_file, root / CURRENT_FILE)
+    _fsync_dir(root)
+
+
+def current_version(root: Path) -> Optional[str]:
+    try:
+        return (root / CURRENT_FILE).read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def prune_snapshots(root: Path, keep: int):
+    """Delete all but the ``keep`` most recent snapshots (never the current one)."""
+    current = current_version(root)
+    versions = sorted(p for p in root.iterdir() if p.is_dir() and not p.name.startswith("."))
+    for path in versions[:-keep] if keep else versions:
+        if path.name != current:
+            # Workers still mapping an old snapshot keep their pages until they swap
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def read_snapshot(snapshot_dir: Path) -> CatalogStore:
+    """Open a snapshot with every array memory-mapped read-only (shared page cache across workers)."""
+    with open(snapshot_dir / META_FILE, encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format {meta.get('format')} in {snapshot_dir}")
+
+    catalog_arrays, text_arrays = {}, {}
+    for path in snapshot_dir.glob("*.npy"):
+        kind, name, _ = path.name.split(".")
+        target = catalog_arrays if kind == "catalog" else text_arrays
+        target[name] = np.load(path, mmap_mode="r")
+
+    text_index = TextIndex.from_arrays(meta["terms"], text_arrays)
+    store = CatalogStore.from_arrays(catalog_arrays, StringPool(meta["vendors"]), text_index)
+    store.checkpoint = _decode_checkpoint(meta.get("checkpoint"))
+    store.version = meta["version"]
+    return store
+
+
+def read_current_snapshot(root: Path) -> Optional[CatalogStore]:
+    version = current_version(root)
+    return read_snapshot(root / version) if version else None
+
+
+class SnapshotWatcher:
+    """
+    Polls CURRENT and hands every newly published snapshot to ``on_snapshot``.
+
+    Opening the snapshot runs in a thread, so the event loop keeps serving requests
+    with the previous catalog until the new one is ready to be swapped in.
+    """
+
+    def __init__(self, root: Path, on_snapshot: Callable[[CatalogStore], Awaitable[None]],
+                 interval: float = 5.0, version: Optional[str] = None):
+        self.root = root
+        self.on_snapshot = on_snapshot
+        self.interval = interval
+        self.version = version
+
+    async def check(self):
+        version = current_version(self.root)
+        if not version or version == self.version:
+            return
+        store = await asyncio.to_thread(read_snapshot, self.root / version)
+        await self.on_snapshot(store)
+        self.version = version
+        logger.info("Search snapshot loaded", extra={"version": version, "products": len(store)})
+
+    async def run(self):
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Failed to load search snapshot: {str(e)}")
+            await asyncio.sleep(self.interval)
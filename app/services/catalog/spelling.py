@@ -0,0 +1,155 @@
+# app/services/catalog/spelling.py
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.services.catalog.text_index import TextIndex
+
+MAX_EDIT_DISTANCE = 2
+# Only the first PREFIX_LENGTH characters are used for deletes (SymSpell prefix trick)
+PREFIX_LENGTH = 7
+# Shorter tokens ("sac", "lin", numbers) are too ambiguous to correct
+MIN_WORD_LENGTH = 4
+
+# Derja (Tunisian Arabic) transliterations mapped to the French words of the catalog
+TRANSLITERATIONS = {
+    "zit": "huile",
+    "zitoun": "olive",
+    "zitouna": "olive",
+    "kosksi": "couscous",
+    "kousksi": "couscous",
+    "kaskas": "couscoussiere",
+    "keskes": "couscoussiere",
+    "fakhar": "poterie",
+    "mergoum": "tapis",
+    "klim": "tapis",
+    "chem3a": "bougie",
+    "chamaa": "bougie",
+    "yasmin": "jasmin",
+    "yasmine": "jasmin",
+    "mechmoum": "jasmin",
+    "tmar": "dattes",
+    "fadha": "argent",
+    "fodha": "argent",
+    "magana": "montre",
+    "saboun": "savon",
+    "kahwa": "cafe",
+    "9ahwa": "cafe",
+    "tey": "the",
+}
+
+
+def _deletes(word: str, max_distance: int) -> Set[str]:
+    """All strings obtained by deleting up to ``max_distance`` characters from ``word``."""
+    results = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier if len(w) > 1 for i in range(len(w))}
+        results |= frontier
+    return results
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Optimal string alignment distance (Damerau-Levenshtein with adjacent transpositions).
+
+    Returns ``max_distance + 1`` as soon as the distance is known to exceed ``max_distance``.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2: Optional[List[int]] = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SpellCorrector:
+    """
+    Symmetric-delete (SymSpell) corrector over the catalog vocabulary.
+
+    Every vocabulary word is indexed under its deletes at build time; a query word only
+    generates its own deletes and looks them up, so a correction is a few dict lookups
+    plus edit distances on a handful of candidates. Ties are broken by document frequency.
+    """
+
+    def __init__(self, frequencies: Dict[str, int], max_distance: int = MAX_EDIT_DISTANCE):
+        self.frequencies = frequencies
+        self.max_distance = max_distance
+        self.deletes: Dict[str, List[str]] = {}
+        for word in frequencies:
+            self._index(word)
+
+    def _index(self, word: str):
+        if len(word) < MIN_WORD_LENGTH:
+            return
+        for delete in _deletes(word[:PREFIX_LENGTH], self.max_distance):
+            self.deletes.setdefault(delete, []).append(word)
+
+    @classmethod
+    def from_index(cls, text_index: TextIndex) -> "SpellCorrector":
+        document_frequencies = np.diff(text_index.indptr)
+        return cls({term: int(document_frequencies[tid]) for term, tid in text_index.vocabulary.items()})
+
+    def add(self, frequencies: Dict[str, int]) -> "SpellCorrector":
+        """
+        Return a corrector that also knows the words of ``frequencies`` (added to existing counts).
+
+        The deletes index is shared with ``self`` and only extended for new words, so it must
+        not be used with a vocabulary that shrinks (deleted products keep their words until
+        the next full build, which is harmless: a correction to them just finds nothing).
+        """
+        corrector = SpellCorrector.__new__(SpellCorrector)
+        corrector.max_distance = self.max_distance
+        corrector.frequencies = dict(self.frequencies)
+        corrector.deletes = self.deletes
+        for word, count in frequencies.items():
+            if word not in corrector.frequencies:
+                corrector._index(word)
+            corrector.frequencies[word] = corrector.frequencies.get(word, 0) + count
+        return corrector
+
+    def lookup(self, word: str) -> Optional[str]:
+        """Best vocabulary word for ``word``, or None when nothing is close enough."""
+        if word in self.frequencies:
+            return word
+        if word in TRANSLITERATIONS:
+            return TRANSLITERATIONS[word]
+        if len(word) < MIN_WORD_LENGTH or word.isdigit():
+            return None
+
+        best: Optional[Tuple[int, int, str]] = None
+        seen: Set[str] = set()
+        for delete in _deletes(word[:PREFIX_LENGTH], self.max_distance):
+            for candidate in self.deletes.get(delete, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                frequency = self.frequencies.get(candidate)
+                if frequency is None:  # added by a newer corrector sharing this deletes index
+                    continue
+                distance = edit_distance(word, candidate, self.max_distance)
+                if distance > self.max_distance:
+                    continue
+                key = (distance, -frequency, candidate)
+                if best is None or key < best:
+                    best = key
+        return best[2] if best else None
+
+    def correct(self, tokens: Iterable[str]) -> Tuple[List[str], Dict[str, str]]:
+        """Return the corrected tokens and the applied ``{typo: correction}`` pairs."""
+        corrected = []
+        corrections = {}
+        for token in tokens:
+            replacement = self.lookup(token) or token
+            if replacement != token:
+                corrections[token] = replacement
+            corrected.append(replacement)
+        return corrected, corrections
@@ -0,0 +1,505 @@
+# app/services/catalog/store.py
+import copy
+import sys
+from array import array
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.catalog.dedup import duplicate_clusters
+from app.services.catalog.geo import location_governorate_id
+from app.services.catalog.text_index import TextIndex, product_text
+
+# Same values as SortKey in front/types/index.ts
+SORT_KEYS = ("relevance", "price-asc", "price-desc", "newest")
+
+# Price histogram edges in TND (last bucket is open ended) and rating bands 0-1 ... 4-5
+PRICE_BUCKET_EDGES = (25.0, 50.0, 100.0, 200.0, 500.0)
+RATING_BANDS = 5
+
+# Changed rows kept in the delta segment before it is folded into the base arrays
+DELTA_FOLD_ROWS = 20_000
+
+# Fields needed to build the in-memory catalog (the rest is hydrated from Mongo per page)
+INDEX_PROJECTION = {
+    "name": 1, "numericPrice": 1, "rating": 1, "isNew": 1, "vendor": 1,
+    "address": 1, "location": 1, "description": 1, "specs": 1, "created_at": 1,
+}
+
+
+def newest_key(is_new: np.ndarray, created_ts: np.ndarray) -> np.ndarray:
+    """Single int64 key ordering new products first, then most recent first."""
+    return (~is_new).astype(np.int64) * (1 << 40) - created_ts
+
+
+class StringPool:
+    """Interns repeated strings (vendor names...) into dense integer ids."""
+
+    def __init__(self, values: Iterable[str] = ()):
+        self.values: List[str] = []
+        self._ids: Dict[str, int] = {}
+        for value in values:
+            self.intern(value)
+
+    def intern(self, value: str) -> int:
+        idx = self._ids.get(value)
+        if idx is None:
+            idx = len(self.values)
+            value = sys.intern(value)
+            self.values.append(value)
+            self._ids[value] = idx
+        return idx
+
+    def get(self, value: str) -> int:
+        return self._ids.get(value, -1)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(sys.getsizeof(v) for v in self.values)
+
+
+def _clustered(cluster_id: np.ndarray) -> np.ndarray:
+    """Rows whose cluster has other rows (the only ones collapsing has to look at)."""
+    return np.bincount(cluster_id, minlength=len(cluster_id))[cluster_id] > 1
+
+
+def _id_keys(product_ids: Iterable[str]) -> np.ndarray:
+    return np.array([str(pid).encode("ascii") for pid in product_ids], dtype="S24")
+
+
+class CatalogBuilder:
+    """Accumulates product documents into compact typed arrays, one document at a time."""
+
+    def __init__(self, vendors: Optional[StringPool] = None):
+        self.ids: List[bytes] = []
+        self.price = array("f")
+        self.rating = array("f")
+        self.is_new = array("b")
+        self.vendor_id = array("i")
+        self.governorate_id = array("b")
+        self.created_ts = array("q")
+        self.texts: List[str] = []
+        self.names: List[str] = []
+        self.vendors = vendors if vendors is not None else StringPool()
+
+    def add(self, doc: dict):
+        rating = doc.get("rating")
+        created_at = doc.get("created_at")
+        self.ids.append(str(doc["_id"]).encode("ascii"))
+        self.price.append(float(doc.get("numericPrice") or 0.0))
+        self.rating.append(float(rating) if rating is not None else float("nan"))
+        self.is_new.append(bool(doc.get("isNew")))
+        self.vendor_id.append(self.vendors.intern(doc.get("vendor") or ""))
+        self.governorate_id.append(location_governorate_id(doc))
+        self.created_ts.append(int(created_at.timestamp()) if isinstance(created_at, datetime) else 0)
+        self.texts.append(product_text(doc))
+        self.names.append(doc.get("name") or "")
+
+    def build(self) -> "CatalogStore":
+        vendor_id = np.frombuffer(self.vendor_id, dtype=np.int32).copy()
+        return CatalogStore(
+            ids=np.array(self.ids, dtype="S24"),
+            price=np.frombuffer(self.price, dtype=np.float32).copy(),
+            rating=np.frombuffer(self.rating, dtype=np.float32).copy(),
+            is_new=np.frombuffer(self.is_new, dtype=np.int8).astype(bool),
+            vendor_id=vendor_id,
+            governorate_id=np.frombuffer(self.governorate_id, dtype=np.int8).copy(),
+            created_ts=np.frombuffer(self.created_ts, dtype=np.int64).copy(),
+            vendors=self.vendors,
+            text_index=TextIndex.build(self.texts),
+            cluster_id=duplicate_clusters(self.names, vendor_id),
+        )
+
+
+class CatalogStore:
+    """Columnar, read-only view of the product catalog.
+
+    One numpy array per filterable field, row ``i`` being the i-th product.
+    Each sort order has a presorted permutation, so filter + sort + paginate is a
+    boolean mask applied along the permutation followed by a slice.
+
+    Stores are never modified in place: ``apply_changes`` returns a new store sharing the
+    base arrays (memory-mapped from a snapshot, usually), where updated and deleted rows are
+    tombstoned in a copy of ``alive`` and new versions go to a small ``delta`` store. Delta
+    rows are numbered after the base rows, and every method taking or returning rows covers
+    both segments; read their columns with ``take`` and ``column``, as the attributes only
+    hold the base rows. The delta is folded into the base arrays by ``compacted`` once it
+    reaches DELTA_FOLD_ROWS rows or when a snapshot is written, and tombstoned rows are
+    dropped at the next full build or snapshot.
+
+    ``cluster_id`` groups near-duplicate listings (see dedup.py) so search can show one
+    product per group. Groups are computed by full builds; rows added by ``apply_changes``
+    are only grouped with the other rows of their segment until the next build.
+    """
+
+    def __init__(self, ids: np.ndarray, price: np.ndarray, rating: np.ndarray, is_new: np.ndarray,
+                 vendor_id: np.ndarray, governorate_id: np.ndarray, created_ts: np.ndarray,
+                 vendors: StringPool, text_index: TextIndex,
+                 permutations: Optional[Dict[str, np.ndarray]] = None, alive: Optional[np.ndarray] = None,
+                 cluster_id: Optional[np.ndarray] = None):
+        self.ids = ids
+        self.price = price
+        self.rating = rating
+        self.is_new = is_new
+        self.vendor_id = vendor_id
+        self.governorate_id = governorate_id
+        self.created_ts = created_ts
+        self.alive = alive if alive is not None else np.ones(len(ids), dtype=bool)
+        self.delta: Optional[CatalogStore] = None
+        self.cluster_id = cluster_id if cluster_id is not None else np.arange(len(ids), dtype=np.int32)
+        self.clustered = _clustered(self.cluster_id)
+        self.vendors = vendors
+        self.text_index = text_index
+        # Change stream / polling position the store is up to date with (see updater.py)
+        self.checkpoint: Optional[dict] = None
+        # Snapshot the store was read from, None when built from a scan of the collection
+        self.version: Optional[str] = None
+        self.price_bucket = np.searchsorted(PRICE_BUCKET_EDGES, price, side="right").astype(np.int8)
+        # -1 for unrated products, 0..4 otherwise (a 5.0 rating falls in the 4-5 band)
+        self.rating_band = np.where(
+            np.isnan(rating), -1, np.minimum(np.nan_to_num(rating), RATING_BANDS - 1)
+        ).astype(np.int8)
+        self.permutations = permutations or self._build_permutations()
+        self.sorted_price = price[self.permutations["price-asc"]]
+        self._id_order = np.argsort(ids, kind="stable").astype(np.int32)
+
+    @classmethod
+    def from_documents(cls, docs: Iterable[dict]) -> "CatalogStore":
+        builder = CatalogBuilder()
+        for doc in docs:
+            builder.add(doc)
+        return builder.build()
+
+    @classmethod
+    def empty(cls) -> "CatalogStore":
+        return CatalogBuilder().build()
+
+    def __len__(self) -> int:
+        return len(self.ids) + (len(self.delta) if self.delta is not None else 0)
+
+    def _build_permutations(self) -> Dict[str, np.ndarray]:
+        n = len(self.ids)
+        return {
+            "relevance": np.arange(n, dtype=np.int32),
+            "price-asc": np.argsort(self.price, kind="stable").astype(np.int32),
+            "price-desc": np.argsort(-self.price, kind="stable").astype(np.int32),
+            # new products first, most recent first among them
+            "newest": np.argsort(newest_key(self.is_new, self.created_ts), kind="stable").astype(np.int32),
+        }
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        return {
+            "ids": self.ids,
+            "price": self.price,
+            "rating": self.rating,
+            "is_new": self.is_new,
+            "vendor_id": self.vendor_id,
+            "governorate_id": self.governorate_id,
+            "created_ts": self.created_ts,
+            "alive": self.alive,
+            "cluster_id": self.cluster_id,
+            "price_bucket": self.price_bucket,
+            "rating_band": self.rating_band,
+        }
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Every array of the store, derived ones included, keyed by a file-safe name."""
+        arrays = dict(self.columns())
+        arrays["sorted_price"] = self.sorted_price
+        arrays["id_order"] = self._id_order
+        for key, permutation in self.permutations.items():
+            arrays[f"permutation_{key}"] = permutation
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], vendors: StringPool, text_index: TextIndex) -> "CatalogStore":
+        """Rebuild a store from ``arrays()`` (e.g. memory-mapped from a snapshot) without recomputing anything."""
+        store = cls.__new__(cls)
+        for name in ("ids", "price", "rating", "is_new", "vendor_id", "governorate_id", "created_ts",
+                     "price_bucket", "rating_band", "sorted_price"):
+            setattr(store, name, arrays[name])
+        store.alive = arrays["alive"] if "alive" in arrays else np.ones(len(store.ids), dtype=bool)
+        # Snapshots written before deduplication have no clusters: every row stands alone
+        store.cluster_id = arrays["cluster_id"] if "cluster_id" in arrays else np.arange(len(store.ids), dtype=np.int32)
+        store.clustered = _clustered(store.cluster_id)
+        store.checkpoint = None
+        store.version = None
+        store.delta = None
+        store._id_order = arrays["id_order"]
+        store.permutations = {key: arrays[f"permutation_{key}"] for key in SORT_KEYS}
+        store.vendors = vendors
+        store.text_index = text_index
+        return store
+
+    def _segment_rows(self, keys: np.ndarray) -> np.ndarray:
+        if not len(keys) or not len(self.ids):
+            return np.empty(0, dtype=np.int32)
+        # An updated product has tombstoned versions before its live one: take the last match
+        pos = np.searchsorted(self.ids, keys, side="right", sorter=self._id_order) - 1
+        rows = self._id_order[np.maximum(pos, 0)]
+        return rows[(pos >= 0) & (self.ids[rows] == keys) & self.alive[rows]]
+
+    def rows_for_ids(self, product_ids: Iterable[str]) -> np.ndarray:
+        """Binary search product ids in the sorted id column; unknown and deleted ids are dropped."""
+        keys = _id_keys(product_ids)
+        rows = self._segment_rows(keys)
+        if self.delta is not None:
+            rows = np.concatenate([rows, self.delta._segment_rows(keys) + len(self.ids)]).astype(np.int32)
+        return rows
+
+    def take(self, name: str, rows: np.ndarray) -> np.ndarray:
+        """Values of column ``name`` for ``rows`` of either segment."""
+        values = getattr(self, name)
+        if self.delta is None:
+            return values[rows]
+        n = len(self.ids)
+        in_delta = rows >= n
+        out = np.empty(len(rows), dtype=values.dtype)
+        out[~in_delta] = values[rows[~in_delta]]
+        delta_values = getattr(self.delta, name)[rows[in_delta] - n]
+        out[in_delta] = delta_values + n if name == "cluster_id" else delta_values
+        return out
+
+    def column(self, name: str) -> np.ndarray:
+        """Column ``name`` over every row (a copy when there is a delta)."""
+        values = getattr(self, name)
+        if self.delta is None:
+            return values
+        delta_values = getattr(self.delta, name)
+        return np.concatenate([values, delta_values + len(self.ids) if name == "cluster_id" else delta_values])
+
+    def _sort_values(self, sort_key: str, rows: np.ndarray) -> np.ndarray:
+        """Keys of ``rows`` (base rows of this store) in the ``sort_key`` order."""
+        if sort_key == "newest":
+            return newest_key(self.is_new[rows], self.created_ts[rows])
+        return -self.price[rows] if sort_key == "price-desc" else self.price[rows]
+
+    def _concat(self, added: "CatalogStore", alive: np.ndarray) -> "CatalogStore":
+        """
+        Single-segment store with the rows of ``added`` after the rows of this store, whose
+        liveness is ``alive``. New rows are merged into each presorted permutation with a
+        binary search instead of a re-sort, and their postings are spliced into the text index.
+        """
+        n = len(self.ids)
+        arrays = {
+            name: np.concatenate([column, getattr(added, name)])
+            for name, column in self.columns().items() if name not in ("alive", "cluster_id")
+        }
+        arrays["alive"] = np.concatenate([alive, added.alive])
+        arrays["cluster_id"] = np.concatenate([self.cluster_id, added.cluster_id + n])
+
+        new_rows = np.arange(n, n + len(added), dtype=np.int32)
+
+        def insert_sorted(permutation: np.ndarray, sorted_keys: np.ndarray, new_keys: np.ndarray) -> np.ndarray:
+            # Equal keys go after existing rows, like the stable sort of a full build
+            order = np.argsort(new_keys, kind="stable")
+            positions = np.searchsorted(sorted_keys, new_keys[order], side="right")
+            return np.insert(permutation, positions, new_rows[order])
+
+        arrays["permutation_relevance"] = np.arange(n + len(added), dtype=np.int32)
+        for key in ("price-asc", "price-desc", "newest"):
+            permutation = self.permutations[key]
+            arrays[f"permutation_{key}"] = insert_sorted(
+                permutation, self._sort_values(key, permutation),
+                added._sort_values(key, np.arange(len(added.ids))))
+        arrays["sorted_price"] = arrays["price"][arrays["permutation_price-asc"]]
+        arrays["id_order"] = insert_sorted(self._id_order, self.ids[self._id_order], added.ids)
+
+        return CatalogStore.from_arrays(arrays, added.vendors, self.text_index.merge(added.text_index, n))
+
+    def apply_changes(self, upserts: List[dict], deleted_ids: List[str]) -> "CatalogStore":
+        """
+        Return a new store with ``upserts`` (full product documents) and ``deleted_ids`` applied.
+
+        The base arrays are shared with this store: a batch costs a copy of the ``alive``
+        mask plus a rebuild of the (small) delta segment, and memory-mapped snapshot pages
+        stay shared between workers until the delta has to be folded in.
+        """
+        keys = _id_keys([*deleted_ids, *(str(doc["_id"]) for doc in upserts)])
+        builder = CatalogBuilder(StringPool(self.vendors.values))
+        for doc in upserts:
+            builder.add(doc)
+        added = builder.build()
+
+        alive = np.array(self.alive, dtype=bool)
+        alive[self._segment_rows(keys)] = False
+        delta = self.delta
+        if delta is not None:
+            delta_alive = np.array(delta.alive, dtype=bool)
+            delta_alive[delta._segment_rows(keys)] = False
+            delta = delta._concat(added, delta_alive)
+        elif len(added):
+            delta = added
+
+        store = copy.copy(self)
+        store.alive, store.delta, store.vendors, store.checkpoint = alive, delta, builder.vendors, None
+        if delta is not None and len(delta) >= DELTA_FOLD_ROWS:
+            return store.compacted()
+        return store
+
+    def compacted(self) -> "CatalogStore":
+        """This store as a single segment, with the delta folded into the base arrays."""
+        if self.delta is None:
+            return self
+        store = self._concat(self.delta, self.alive)
+        store.checkpoint, store.version = self.checkpoint, self.version
+        return store
+
+    def price_range(self, min_price: Optional[float] = None, max_price: Optional[float] = None) -> np.ndarray:
+        """Base rows with min_price <= price <= max_price, by binary search over the price-sorted column."""
+        lo = 0 if min_price is None else np.searchsorted(self.sorted_price, min_price, side="left")
+        hi = len(self.sorted_price) if max_price is None else np.searchsorted(self.sorted_price, max_price, side="right")
+        return self.permutations["price-asc"][lo:hi]
+
+    def mask(self, vendors: Optional[List[str]] = None, governorates: Optional[List[int]] = None,
+             min_price: Optional[float] = None, max_price: Optional[float] = None,
+             is_new: Optional[bool] = None, min_rating: Optional[float] = None) -> np.ndarray:
+        """Boolean row mask for the given filters (None means no constraint).
+
+        A price constraint is resolved first with a range lookup, and the other
+        filters are then only evaluated on the rows inside that price range.
+        """
+        filters = dict(vendors=vendors, governorates=governorates, min_price=min_price, max_price=max_price,
+                       is_new=is_new, min_rating=min_rating)
+        mask = self._segment_mask(**filters)
+        if self.delta is None:
+            return mask
+        return np.concatenate([mask, self.delta._segment_mask(**filters)])
+
+    def _segment_mask(self, vendors: Optional[List[str]], governorates: Optional[List[int]],
+                      min_price: Optional[float], max_price: Optional[float],
+                      is_new: Optional[bool], min_rating: Optional[float]) -> np.ndarray:
+        rows = None
+        if min_price is not None or max_price is not None:
+            rows = self.price_range(min_price, max_price)
+
+        def column(values: np.ndarray) -> np.ndarray:
+            return values if rows is None else values[rows]
+
+        keep = np.array(column(self.alive), dtype=bool)
+        if vendors:
+            keep &= np.isin(column(self.vendor_id), [self.vendors.get(v) for v in vendors])
+        if governorates:
+            keep &= np.isin(column(self.governorate_id), governorates)
+        if is_new is not None:
+            keep &= column(self.is_new) == is_new
+        if min_rating is not None:
+            keep &= column(self.rating) >= min_rating  # NaN (no rating) never matches
+        if rows is None:
+            return keep
+
+        mask = np.zeros(len(self.ids), dtype=bool)
+        mask[rows[keep]] = True
+        return mask
+
+    def score(self, tokens: List[str], candidates: Optional[np.ndarray] = None) -> np.ndarray:
+        """BM25 score of every row (see ``TextIndex.score``), with statistics over both segments."""
+        if self.delta is None:
+            return self.text_index.score(tokens, candidates)
+        n = len(self.ids)
+        corpus = (self.text_index, self.delta.text_index)
+        return np.concatenate([
+            self.text_index.score(tokens, None if candidates is None else candidates[:n], corpus),
+            self.delta.text_index.score(tokens, None if candidates is None else candidates[n:], corpus),
+        ])
+
+    def _sorted_rows(self, mask: np.ndarray, sort_key: str) -> np.ndarray:
+        """Rows selected by ``mask`` in the ``sort_key`` order, delta rows merged into base rows."""
+        n = len(self.ids)
+        permutation = self.permutations[sort_key]
+        rows = permutation[mask[:n][permutation]]
+        if self.delta is None:
+            return rows
+        permutation = self.delta.permutations[sort_key]
+        delta_rows = permutation[mask[n:][permutation]]
+        if sort_key == "relevance":
+            return np.concatenate([rows, delta_rows + n])
+        # Equal keys: base rows first, as in the permutations of the folded store
+        positions = np.searchsorted(self._sort_values(sort_key, rows),
+                                    self.delta._sort_values(sort_key, delta_rows), side="right")
+        return np.insert(rows, positions, delta_rows + n)
+
+    def select(self, mask: np.ndarray, sort_key: str = "relevance", offset: int = 0, limit: int = 20,
+               scores: Optional[np.ndarray] = None,
+               rerank: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+               rerank_depth: int = 0, collapse: bool = False) -> Tuple[np.ndarray, int]:
+        """Return the rows of the requested page and the total number of matching rows.
+
+        With text ``scores`` and the relevance order, rows are ranked by score
+        (catalog order breaks ties) using a partial sort of the first page only.
+
+        In the relevance order, ``rerank`` maps the first ``rerank_depth`` rows to score
+        multipliers, so a re-ranking never touches more rows than that.
+
+        With ``collapse``, only the best ranked row of each near-duplicate cluster is kept
+        (and counted in the total).
+        """
+        if sort_key != "relevance":
+            rerank = None
+        if scores is not None and sort_key == "relevance":
+            candidates = np.flatnonzero(mask)
+            if collapse:
+                candidates = candidates[self.collapse_duplicates(candidates, scores[candidates])]
+            total = len(candidates)
+            k = min(max(offset + limit, rerank_depth if rerank else 0), total)
+            if k == 0:
+                return candidates[:0], total
+            candidate_scores = scores[candidates]
+            if k < total:
+                top = np.argpartition(-candidate_scores, k - 1)[:k]
+                candidates, candidate_scores = candidates[top], candidate_scores[top]
+            if rerank:
+                candidate_scores = candidate_scores * rerank(candidates)
+            order = np.lexsort((candidates, -candidate_scores))
+            return candidates[order][offset:offset + limit], total
+
+        rows = self._sorted_rows(mask, sort_key)
+        if collapse:
+            rows = rows[self.collapse_duplicates(rows)]
+        if rerank and offset < rerank_depth:
+            # Without scores every row weighs the same: order the head by multiplier alone
+            head = rows[:rerank_depth]
+            rows = np.concatenate([head[np.argsort(-rerank(head), kind="stable")], rows[rerank_depth:]])
+        return rows[offset:offset + limit], len(rows)
+
+    def collapse_duplicates(self, rows: np.ndarray, priority: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Mask over ``rows`` keeping one row per near-duplicate cluster: the first one in ``rows``
+        order, or the one with the highest ``priority``. Rows without duplicates are kept as is.
+        """
+        keep = ~self.take("clustered", rows)
+        duplicates = np.flatnonzero(~keep)
+        if len(duplicates):
+            if priority is not None:
+                duplicates = duplicates[np.argsort(-priority[duplicates], kind="stable")]
+            _, first = np.unique(self.take("cluster_id", rows[duplicates]), return_index=True)
+            keep[duplicates[first]] = True
+        return keep
+
+    def memory_usage(self) -> dict:
+        """Bytes used by the columns, sort permutations, interned strings and text index."""
+        columns = {name: int(arr.nbytes) for name, arr in self.columns().items()}
+        permutations = int(
+            sum(p.nbytes for p in self.permutations.values()) + self._id_order.nbytes + self.sorted_price.nbytes
+        )
+        strings = self.vendors.nbytes
+        text_index = int(self.text_index.nbytes)
+        delta = self.delta.memory_usage()["total_bytes"] - strings if self.delta is not None else 0
+        total = sum(columns.values()) + permutations + strings + text_index + delta
+        return {
+            "products": len(self),
+            "delta_products": len(self.delta) if self.delta is not None else 0,
+            # Rows hidden when near-duplicates are collapsed
+            "duplicates": int(self.clustered.sum() - len(np.unique(self.cluster_id[self.clustered]))),
+            "columns": columns,
+            "permutations": permutations,
+            "strings": strings,
+            "text_index": text_index,
+            "delta": delta,
+            "total_bytes": total,
+            "bytes_per_product": round(total / len(self), 1) if len(self) else 0.0,
+        }
@@ -0,0 +1,182 @@
+# app/services/catalog/text_index.py
+import re
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from app.services.catalog.governorates import fold
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Mots vides français/anglais ignorés à l'indexation et dans les requêtes
+STOPWORDS = frozenset({
+    "a", "au", "aux", "d", "de", "des", "du", "en", "et", "l", "la", "le", "les",
+    "pour", "un", "une", "avec", "sur", "and", "for", "of", "with",  # not "the": folded "thé"
+})
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split text into accent-folded lowercase tokens, without stopwords."""
+    if not text:
+        return []
+    return [t for t in _TOKEN_RE.findall(fold(text)) if t not in STOPWORDS]
+
+
+def product_text(doc: dict) -> str:
+    """Concatenate the searchable fields of a product document."""
+    specs = doc.get("specs") or {}
+    parts = [doc.get("name"), doc.get("vendor"), doc.get("description"), *specs.values()]
+    return " ".join(p for p in parts if p)
+
+
+class TextIndex:
+    """Inverted index over product text, stored as CSR numpy arrays.
+
+    Postings of term ``t`` are ``doc_ids[indptr[t]:indptr[t + 1]]`` with matching
+    ``term_freqs``. Scoring is BM25, accumulated with vectorized numpy operations.
+    """
+
+    def __init__(self, vocabulary: Dict[str, int], indptr: np.ndarray, doc_ids: np.ndarray,
+                 term_freqs: np.ndarray, doc_lengths: np.ndarray):
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.avg_doc_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> "TextIndex":
+        vocabulary: Dict[str, int] = {}
+        term_ids = array("i")
+        doc_ids = array("i")
+        term_freqs = array("H")
+        doc_lengths = array("H")
+
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths.append(min(len(tokens), 0xFFFF))
+            for term, tf in Counter(tokens).items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc_id)
+                term_freqs.append(min(tf, 0xFFFF))
+
+        terms = np.frombuffer(term_ids, dtype=np.int32)
+        order = np.argsort(terms, kind="stable")  # keeps doc ids sorted inside each posting list
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(vocabulary)), out=indptr[1:])
+        return cls(
+            vocabulary,
+            indptr,
+            np.frombuffer(doc_ids, dtype=np.int32)[order],
+            np.frombuffer(term_freqs, dtype=np.uint16)[order],
+            np.frombuffer(doc_lengths, dtype=np.uint16).copy(),
+        )
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "indptr": self.indptr,
+            "doc_ids": self.doc_ids,
+            "term_freqs": self.term_freqs,
+            "doc_lengths": self.doc_lengths,
+        }
+
+    def terms(self) -> List[str]:
+        """Vocabulary ordered by term id."""
+        terms = [""] * len(self.vocabulary)
+        for term, term_id in self.vocabulary.items():
+            terms[term_id] = term
+        return terms
+
+    @classmethod
+    def from_arrays(cls, terms: List[str], arrays: Dict[str, np.ndarray]) -> "TextIndex":
+        return cls({term: term_id for term_id, term in enumerate(terms)}, **arrays)
+
+    def merge(self, other: "TextIndex", doc_offset: int) -> "TextIndex":
+        """
+        Return a new index with the documents of ``other`` appended (their ids shifted by ``doc_offset``).
+
+        Appended doc ids are larger than existing ones, so each new posting is inserted at the
+        end of its term's block and posting lists stay sorted without re-sorting them.
+        """
+        vocabulary = dict(self.vocabulary)
+        for term in other.terms():
+            vocabulary.setdefault(term, len(vocabulary))
+        other_terms = np.repeat(
+            np.array([vocabulary[term] for term in other.terms()], dtype=np.int64),
+            np.diff(other.indptr),
+        )
+        order = np.argsort(other_terms, kind="stable")
+        other_terms = other_terms[order]
+
+        block_ends = np.full(len(vocabulary), self.indptr[-1], dtype=np.int64)
+        block_ends[:len(self.vocabulary)] = self.indptr[1:]
+        positions = block_ends[other_terms]
+
+        counts = np.bincount(other_terms, minlength=len(vocabulary))
+        counts[:len(self.vocabulary)] += np.diff(self.indptr)
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return TextIndex(
+            vocabulary,
+            indptr,
+            np.insert(self.doc_ids, positions, other.doc_ids[order] + doc_offset),
+            np.insert(self.term_freqs, positions, other.term_freqs[order]),
+            np.concatenate([self.doc_lengths, other.doc_lengths]),
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.indptr.nbytes + self.doc_ids.nbytes + self.term_freqs.nbytes + self.doc_lengths.nbytes
+
+    def document_frequency(self, term: str) -> int:
+        term_id = self.vocabulary.get(term)
+        return 0 if term_id is None else int(self.indptr[term_id + 1] - self.indptr[term_id])
+
+    def postings(self, term: str) -> np.ndarray:
+        term_id = self.vocabulary.get(term)
+        if term_id is None:
+            return self.doc_ids[:0]
+        return self.doc_ids[self.indptr[term_id]:self.indptr[term_id + 1]]
+
+    def score(self, tokens: List[str], candidates: Optional[np.ndarray] = None,
+              corpus: Sequence["TextIndex"] = ()) -> np.ndarray:
+        """Return a dense BM25 score per document; 0 means no query term matched.
+
+        When a boolean ``candidates`` mask is given, postings outside of it are dropped
+        before any scoring work, and those documents keep a score of 0.
+
+        Document frequencies and lengths are taken over the ``corpus`` indexes when given
+        (this one included), so the segments of a catalog score as one index.
+        """
+        n_docs = len(self.doc_lengths)
+        scores = np.zeros(n_docs, dtype=np.float32)
+        if not n_docs:
+            return scores
+        corpus_docs, avg_doc_length = n_docs, self.avg_doc_length
+        if corpus:
+            corpus_docs = sum(len(index.doc_lengths) for index in corpus)
+            avg_doc_length = sum(index.avg_doc_length * len(index.doc_lengths) for index in corpus) / corpus_docs
+        for term in set(tokens):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.term_freqs[start:end]
+            df = sum(index.document_frequency(term) for index in corpus) if corpus else end - start
+            if candidates is not None:
+                keep = candidates[docs]
+                docs, tf = docs[keep], tf[keep]
+            tf = tf.astype(np.float32)
+            idf = np.log1p((corpus_docs - df + 0.5) / (df + 0.5))
+            norm = K1 * (1 - B + B * self.doc_lengths[docs] / avg_doc_length)
+            # doc ids are unique within a posting list, so fancy-index += is safe
+            scores[docs] += idf * tf * (K1 + 1) / (tf + norm)
+        return scores
@@ -0,0 +1,165 @@
+# app/services/catalog/updater.py
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.services.catalog.store import INDEX_PROJECTION
+from app.utils.logger import logger
+
+# Change streams are not available on standalone servers ("The $changeStream stage is only
+# supported on replica sets") - fall back to polling on updated_at
+CHANGE_STREAM_UNSUPPORTED = 40573
+# Writers' clocks may lag ours: polling restarts this far before a scan started
+CLOCK_SKEW = timedelta(seconds=5)
+
+UPDATE_PROJECTION = {**INDEX_PROJECTION, "updated_at": 1}
+
+# {product_id: full document, or None when the product was deleted}
+Changes = Dict[str, Optional[dict]]
+
+
+async def capture_checkpoint(collection: AsyncIOMotorCollection) -> dict:
+    """
+    Position to resume from for an index built from a scan that starts now.
+
+    Changes made during the scan are replayed afterwards; applying them twice is harmless
+    because every change is an upsert or a delete by product id.
+    """
+    checkpoint = {"resume_token": None, "updated_at": datetime.utcnow() - CLOCK_SKEW, "last_id": None}
+    try:
+        async with collection.watch() as stream:
+            checkpoint["resume_token"] = stream.resume_token
+    except OperationFailure as e:
+        if e.code != CHANGE_STREAM_UNSUPPORTED:
+            raise
+    return checkpoint
+
+
+class IndexUpdater:
+    """
+    Keeps the in-memory search indexes in sync with the products collection.
+
+    Tails the collection's change stream (or polls ``updated_at`` when the server is not a
+    replica set), coalesces changes per product and hands them to ``apply`` in batches of
+    at most ``batch_size`` changes or ``batch_seconds`` seconds, with the checkpoint the
+    batch brings the index to (the resume token of its last change / its last polled
+    document). ``self.checkpoint`` only moves forward once a batch has been applied.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, apply: Callable[[Changes, dict], Awaitable[None]],
+                 reload: Callable[[], Awaitable[dict]], checkpoint: dict, batch_size: int = 500,
+                 batch_seconds: float = 1.0, poll_seconds: float = 2.0):
+        self.collection = collection
+        self.apply = apply
+        self.reload = reload
+        self.checkpoint = dict(checkpoint)
+        self.batch_size = batch_size
+        self.batch_seconds = batch_seconds
+        self.poll_seconds = poll_seconds
+        self.use_change_stream = checkpoint.get("resume_token") is not None
+        self._reset: Optional[dict] = None
+
+    def reset(self, checkpoint: dict):
+        """Restart from ``checkpoint`` (e.g. after a newer snapshot was swapped in)."""
+        self._reset = dict(checkpoint)
+
+    def _take_reset(self) -> bool:
+        if self._reset is None:
+            return False
+        self.checkpoint, self._reset = self._reset, None
+        self.use_change_stream = self.checkpoint.get("resume_token") is not None
+        return True
+
+    async def run(self):
+        # Keeps polling cheap if the server is (or becomes) a standalone
+        await self.collection.create_index([("updated_at", 1), ("_id", 1)])
+        while True:
+            try:
+                self._take_reset()
+                if self.use_change_stream:
+                    await self._tail()
+                else:
+                    await self._poll()
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_UNSUPPORTED:
+                    logger.warning("Change streams unavailable, polling products on updated_at")
+                    self.use_change_stream = False
+                else:
+                    logger.error(f"Search index update failed: {str(e)}")
+                    await asyncio.sleep(self.poll_seconds)
+            except PyMongoError as e:
+                logger.error(f"Search index update failed: {str(e)}")
+                await asyncio.sleep(self.poll_seconds)
+
+    async def _flush(self, changes: Changes, checkpoint: dict):
+        started = time.perf_counter()
+        await self.apply(changes, checkpoint)
+        logger.info("Search index updated", extra={
+            "changes": len(changes), "ms": round((time.perf_counter() - started) * 1000, 1),
+        })
+
+    async def _tail(self):
+        pending: Changes = {}
+        last_token = self.checkpoint.get("resume_token")
+        deadline = time.monotonic() + self.batch_seconds
+        async with self.collection.watch(
+            full_document="updateLookup",
+            resume_after=self.checkpoint.get("resume_token"),
+            max_await_time_ms=int(self.batch_seconds * 1000),
+        ) as stream:
+            while stream.alive:
+                if self._reset is not None:
+                    return
+                change = await stream.try_next()
+                if change is not None:
+                    # An event's id is its resume token, the same for every worker following the stream
+                    last_token = change["_id"]
+                    operation = change["operationType"]
+                    if operation in ("insert", "update", "replace"):
+                        # fullDocument is None if the product was deleted before the lookup
+                        pending[str(change["documentKey"]["_id"])] = change.get("fullDocument")
+                    elif operation == "delete":
+                        pending[str(change["documentKey"]["_id"])] = None
+                    elif operation in ("drop", "rename", "dropDatabase", "invalidate"):
+                        # The stream cannot be resumed past these: rebuild from a fresh scan
+                        logger.warning(f"Products collection {operation}, rebuilding the search index")
+                        self.reset(await self.reload())
+                        return
+
+                if pending and (len(pending) >= self.batch_size or time.monotonic() >= deadline):
+                    await self._flush(pending, {**self.checkpoint, "resume_token": last_token})
+                    pending = {}
+                if not pending:
+                    # Nothing buffered: everything up to this token is in the index
+                    deadline = time.monotonic() + self.batch_seconds
+                    self.checkpoint["resume_token"] = stream.resume_token
+
+    async def _poll(self):
+        """Fetch documents changed after the checkpoint, ordered by (updated_at, _id).
+
+        Deletions are not visible to polling; they are dropped at the next snapshot build.
+        """
+        while self._reset is None:
+            updated_at, last_id = self.checkpoint["updated_at"], self.checkpoint.get("last_id")
+            if last_id is None:
+                query = {"updated_at": {"$gte": updated_at}}
+            else:
+                query = {"$or": [
+                    {"updated_at": {"$gt": updated_at}},
+                    {"updated_at": updated_at, "_id": {"$gt": ObjectId(last_id)}},
+                ]}
+            docs = await self.collection.find(query, UPDATE_PROJECTION).sort(
+                [("updated_at", 1), ("_id", 1)]
+            ).limit(self.batch_size).to_list(length=None)
+
+            if docs:
+                checkpoint = {**self.checkpoint, "updated_at": docs[-1]["updated_at"], "last_id": str(docs[-1]["_id"])}
+                await self._flush({str(doc["_id"]): doc for doc in docs}, checkpoint)
+                self.checkpoint = checkpoint
+            if len(docs) < self.batch_size:
+                await asyncio.sleep(self.poll_seconds)
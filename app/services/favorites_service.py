@@ -0,0 +1,62 @@
+from typing import List
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+from pymongo import ReturnDocument
+
+from app.models.database import db
+from app.services.product_service import ProductService
+
+
+def to_object_ids(product_ids: List[str]) -> List[ObjectId]:
+    invalid = [pid for pid in product_ids if not ObjectId.is_valid(pid)]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid product id: {invalid[0]}")
+    return [ObjectId(pid) for pid in dict.fromkeys(product_ids)]
+
+
+class FavoritesService:
+    """
+    Favorites are stored as an array of product ids on the user document, oldest first,
+    so every bulk operation is a single update and the list a single projected read.
+    """
+
+    async def get_favorite_ids(self, email: str) -> List[str]:
+        user = await db.users.find_one({"email": email}, {"favorites": 1})
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        # Most recently added first
+        return [str(pid) for pid in reversed(user.get("favorites", []))]
+
+    async def add_favorites(self, email: str, product_ids: List[str]) -> List[str]:
+        return await self._update(email, {"$addToSet": {"favorites": {"$each": to_object_ids(product_ids)}}})
+
+    async def remove_favorites(self, email: str, product_ids: List[str]) -> List[str]:
+        return await self._update(email, {"$pull": {"favorites": {"$in": to_object_ids(product_ids)}}})
+
+    async def merge_guest_favorites(self, email: str, product_ids: List[str], names: List[str]) -> List[str]:
+        """
+        Merge a guest list in one update. Guest favorites saved by older front-end versions are
+        product names: they are resolved to ids with a single query, unknown names are dropped.
+        """
+        ids = to_object_ids(product_ids)
+        if names:
+            docs = await db.products.find({"name": {"$in": names}}, {"name": 1}).to_list(length=None)
+            first_by_name = {}
+            for doc in docs:
+                first_by_name.setdefault(doc["name"], doc["_id"])
+            ids += [first_by_name[name] for name in names if name in first_by_name]
+        return await self._update(email, {"$addToSet": {"favorites": {"$each": list(dict.fromkeys(ids))}}})
+
+    async def get_favorite_products(self, email: str) -> List[dict]:
+        """Full product records of all favorites, fetched with one query."""
+        return await ProductService().get_products_by_ids(await self.get_favorite_ids(email))
+
+    async def _update(self, email: str, update: dict) -> List[str]:
+        user = await db.users.find_one_and_update(
+            {"email": email}, update, projection={"favorites": 1}, return_document=ReturnDocument.AFTER
+        )
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return [str(pid) for pid in reversed(user.get("favorites", []))]
@@ -0,0 +1,313 @@
+# app/services/feedback_service.py
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Deque, Iterable, List, Optional
+
+from bson import ObjectId
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from app.core.config import settings
+from app.models.database import db
+from app.services.personalization_service import find_event_products, update_preferences
+from app.utils.logger import logger
+
+FEEDBACK_EVENT_TYPES = ("like", "unlike", "dislike", "undislike", "favorite", "unfavorite", "click", "view")
+DUPLICATE_KEY = 11000
+
+
+class BufferFull(Exception):
+    """Raised when neither memory nor the spill file can take more events (caller should retry later)."""
+
+
+def _encode(event: dict) -> str:
+    return json.dumps({
+        **event,
+        "_id": str(event["_id"]),
+        "ts": event["ts"].isoformat(),
+        "received_at": event["received_at"].isoformat(),
+    }, ensure_ascii=False)
+
+
+def _decode(line: str) -> dict:
+    event = json.loads(line)
+    event["_id"] = ObjectId(event["_id"])
+    event["ts"] = datetime.fromisoformat(event["ts"])
+    event["received_at"] = datetime.fromisoformat(event["received_at"])
+    return event
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class FeedbackBuffer:
+    """
+    Write-behind buffer for UI feedback events.
+
+    Requests only append to an in-memory deque; a background task writes it to
+    ``db.feedback_events`` with one unordered ``bulk_write`` per ``flush_size`` events or
+    every ``flush_seconds``. When a write fails or takes longer than ``write_timeout``, the
+    batch is appended to a spill file instead, and spilled events are replayed once Mongo
+    keeps up again. Past ``max_buffer`` events in memory new events are handed to the
+    background task to be spilled (up to another ``max_buffer`` events waiting), and past
+    ``max_spill_bytes`` on disk ``add`` raises BufferFull. Requests never touch the spill
+    file: it is written from a thread, and fsynced before it is rotated for replay.
+
+    Events get their ``_id`` when they are received, so a batch written twice (a timed out
+    write that actually succeeded, then its replay) only hits duplicate key errors.
+
+    ``on_written`` is called with every batch once it is stored (e.g. to update the users'
+    preference vectors).
+
+    Spill files: ``spill-<pid>.jsonl`` is the file a worker is appending to; it is renamed to
+    ``pending-<pid>-<n>.jsonl`` before replay, and any worker can claim a pending file (or the
+    active file of a dead worker) by renaming it, so each file is replayed once.
+    """
+
+    def __init__(self, spill_dir: Path, flush_size: int = 1000, flush_seconds: float = 2.0,
+                 max_buffer: int = 50_000, max_spill_bytes: int = 512 * 1024 * 1024, write_timeout: float = 5.0,
+                 on_written: Optional[Callable[[List[dict]], Awaitable[None]]] = None):
+        self.spill_dir = spill_dir
+        self.on_written = on_written
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        self.max_buffer = max_buffer
+        self.max_spill_bytes = max_spill_bytes
+        self.write_timeout = write_timeout
+        self.events: Deque[dict] = deque()
+        self._overflow: List[dict] = []
+        self._flush_needed = asyncio.Event()
+        self._spill_file = None
+        self._spill_lock = threading.Lock()
+        self._spill_bytes = 0
+        self._pending_seq = 0
+        self._closed = False
+        self._indexed = False
+
+    # -- request side ------------------------------------------------------------------
+
+    def add(self, events: List[dict]):
+        """Queue events without touching Mongo; spills to disk when memory is full."""
+        if self._closed:
+            raise BufferFull("Feedback buffer is closed")
+        for event in events:
+            event.setdefault("_id", ObjectId())
+        room = self.max_buffer - len(self.events)
+        if len(events) > room:
+            if self._spill_bytes >= self.max_spill_bytes:
+                raise BufferFull("Feedback spill file is full")
+            if len(self._overflow) + len(events) - room > self.max_buffer:
+                raise BufferFull("Feedback spill is falling behind")
+            self._overflow.extend(events[room:])
+            self._flush_needed.set()
+        self.events.extend(events[:room])
+        if len(self.events) >= self.flush_size:
+            self._flush_needed.set()
+
+    # -- spill files -------------------------------------------------------------------
+
+    @property
+    def _active_path(self) -> Path:
+        return self.spill_dir / f"spill-{os.getpid()}.jsonl"
+
+    async def _spill(self, events: List[dict]):
+        await asyncio.to_thread(self._spill_lines, (_encode(event) + "\n" for event in events))
+
+    async def _spill_overflow(self):
+        """Spill the events ``add`` could not keep in memory."""
+        while self._overflow:
+            events, self._overflow = self._overflow, []
+            try:
+                await self._spill(events)
+            except OSError:
+                self._overflow[:0] = events
+                raise
+
+    # Both run in worker threads; the lock covers a write still running when the writer task
+    # is cancelled on shutdown
+    def _spill_lines(self, lines: Iterable[str]):
+        with self._spill_lock:
+            if self._spill_file is None:
+                self.spill_dir.mkdir(parents=True, exist_ok=True)
+                self._spill_file = open(self._active_path, "a", encoding="utf-8")
+            for line in lines:
+                self._spill_file.write(line)
+                self._spill_bytes += len(line)
+            self._spill_file.flush()
+
+    def _rotate_spill(self):
+        """Close the active spill file, once on disk, so it can be replayed."""
+        with self._spill_lock:
+            if self._spill_file is None:
+                return
+            os.fsync(self._spill_file.fileno())
+            self._spill_file.close()
+            self._spill_file = None
+            self._pending_seq += 1
+            os.replace(self._active_path, self.spill_dir / f"pending-{os.getpid()}-{self._pending_seq}.jsonl")
+            self._spill_bytes = 0
+
+    def _claim_spill_file(self) -> Optional[Path]:
+        if not self.spill_dir.exists():
+            return None
+        for path in sorted(self.spill_dir.glob("*.jsonl")):
+            kind, owner = path.name.split("-")[:2]
+            if kind in ("spill", "claimed"):
+                # Files still owned by a live worker (ourselves included) are not claimable
+                pid = int(owner.split(".")[0])
+                if pid == os.getpid() or _pid_alive(pid):
+                    continue
+            elif kind != "pending":
+                continue
+            name = path.name.split("-", 2)[2] if kind == "claimed" else path.name
+            claimed = self.spill_dir / f"claimed-{os.getpid()}-{name}"
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue  # claimed by another worker first
+            return claimed
+        return None
+
+    # -- background writer -------------------------------------------------------------
+
+    async def _write(self, events: List[dict]) -> bool:
+        try:
+            await asyncio.wait_for(
+                db.feedback_events.bulk_write([InsertOne(dict(event)) for event in events], ordered=False),
+                timeout=self.write_timeout,
+            )
+        except BulkWriteError as e:
+            if not all(error["code"] == DUPLICATE_KEY for error in e.details["writeErrors"]):
+                logger.warning(f"Feedback write failed, spilling {len(events)} events: {str(e)}")
+                return False
+            # Otherwise the failed events were already written by an earlier attempt
+        except (PyMongoError, asyncio.TimeoutError) as e:
+            logger.warning(f"Feedback write failed, spilling {len(events)} events: {str(e)}")
+            return False
+        if self.on_written:
+            try:
+                await self.on_written(events)
+            except Exception as e:
+                logger.error(f"Feedback post-processing failed: {str(e)}")
+        return True
+
+    async def flush(self) -> bool:
+        """Write the buffered events; returns False if they had to be spilled."""
+        ok = True
+        while self.events:
+            batch = [self.events.popleft() for _ in range(min(self.flush_size, len(self.events)))]
+            if not await self._write(batch):
+                # Already accepted: spill regardless of max_spill_bytes
+                await self._spill(batch)
+                ok = False
+                break
+        return ok
+
+    async def replay_spilled(self):
+        """Replay spill files one batch at a time while writes keep succeeding."""
+        await asyncio.to_thread(self._rotate_spill)
+        while True:
+            path = await asyncio.to_thread(self._claim_spill_file)
+            if path is None:
+                return
+            replayed = 0
+            with open(path, encoding="utf-8") as f:
+                lines = []
+                for line in f:
+                    lines.append(line)
+                    if len(lines) >= self.flush_size:
+                        # Fresh events go first, a long replay must not hold them in memory
+                        if len(self.events) >= self.flush_size and not await self.flush():
+                            await asyncio.to_thread(self._spill_lines, itertools.chain(lines, f))
+                            path.unlink()
+                            return
+                        if not await self._write([_decode(line) for line in lines]):
+                            # Mongo is slow again: move what is left back to our spill file
+                            await asyncio.to_thread(self._spill_lines, itertools.chain(lines, f))
+                            path.unlink()
+                            return
+                        replayed += len(lines)
+                        lines = []
+                if lines and not await self._write([_decode(line) for line in lines]):
+                    await asyncio.to_thread(self._spill_lines, lines)
+                    path.unlink()
+                    return
+                replayed += len(lines)
+            path.unlink()
+            logger.info("Spilled feedback events replayed", extra={"events": replayed, "file": path.name})
+
+    async def ensure_indexes(self):
+        await db.feedback_events.create_index([("product_id", 1), ("ts", -1)])
+        await db.feedback_events.create_index([("user_email", 1), ("ts", -1)])
+        self._indexed = True
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_needed.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_needed.clear()
+            if not self._indexed:
+                try:
+                    await self.ensure_indexes()
+                except PyMongoError as e:
+                    logger.warning(f"Feedback index creation failed, retrying: {str(e)}")
+            started = time.perf_counter()
+            count = len(self.events)
+            try:
+                flushed = await self.flush()
+                await self._spill_overflow()
+                if flushed:
+                    await self.replay_spilled()
+            except OSError as e:
+                logger.error(f"Feedback spill file error: {str(e)}")
+            if count:
+                logger.debug("Feedback events flushed", extra={
+                    "events": count, "ms": round((time.perf_counter() - started) * 1000, 1),
+                })
+
+    async def close(self):
+        """Flush what is left on shutdown; anything that cannot be written stays in the spill file."""
+        self._closed = True
+        if not await self.flush():
+            await self._spill(list(self.events))
+            self.events.clear()
+        await self._spill_overflow()
+        await asyncio.to_thread(self._rotate_spill)
+
+
+async def process_written_events(events: List[dict]):
+    """Update preference vectors from one product lookup per batch (trending counters are fed
+    from the collection by TrendingFeed, with the events of every worker)."""
+    await update_preferences(events, await find_event_products(events))
+
+
+_buffer: Optional[FeedbackBuffer] = None
+
+
+def get_feedback_buffer() -> FeedbackBuffer:
+    global _buffer
+    if _buffer is None:
+        _buffer = FeedbackBuffer(
+            Path(settings.FEEDBACK_SPILL_DIR),
+            flush_size=settings.FEEDBACK_FLUSH_SIZE,
+            flush_seconds=settings.FEEDBACK_FLUSH_SECONDS,
+            max_buffer=settings.FEEDBACK_MAX_BUFFER,
+            on_written=process_written_events,
+        )
+    return _buffer
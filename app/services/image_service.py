@@ -0,0 +1,284 @@
+# app/services/image_service.py
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+from app.core.config import settings
+from app.utils.logger import logger
+
+# Variants rendered for the front-end components, at 2x their CSS size for high-DPI screens:
+# name -> (width, height, crop to fill the box like object-cover, else fit inside it)
+VARIANTS: Dict[str, Tuple[int, int, bool]] = {
+    "thumb": (160, 160, True),   # ChatInterface cards, 80x80
+    "card": (640, 400, True),    # SuggestionsPanel and SearchModal tiles, 320x200
+    "modal": (840, 600, True),   # ProductModal carousel, 420x300
+    "zoom": (1200, 900, False),  # ProductModal zoom, object-contain
+}
+WEBP_QUALITY = 80
+MAX_ORIGINAL_BYTES = 15 * 1024 * 1024
+# Product photos are a few megapixels; a small file declaring more would expand to gigabytes
+MAX_IMAGE_PIXELS = 40_000_000
+FETCH_TIMEOUT_SECONDS = 10.0
+MAX_REDIRECTS = 5
+
+# Product images stored in the cache are referenced as IMAGE_PATH_PREFIX + digest
+IMAGE_PATH_PREFIX = "/api/v1/images/"
+
+
+class FetchFailed(Exception):
+    """Raised when a remote image cannot be downloaded."""
+
+
+def image_path(digest: str) -> str:
+    return IMAGE_PATH_PREFIX + digest
+
+
+def is_remote(image: str) -> bool:
+    return image.startswith(("http://", "https://"))
+
+
+def _decode(data: bytes):
+    """Decode an image (raises ValueError past MAX_IMAGE_PIXELS, before decoding its pixels)."""
+    from PIL import Image  # Pillow is only loaded by the processes that handle images
+
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    try:
+        image = Image.open(io.BytesIO(data))
+    except Image.DecompressionBombError:
+        raise ValueError("Image has too many pixels")
+    if image.width * image.height > MAX_IMAGE_PIXELS:
+        raise ValueError("Image has too many pixels")
+    image.load()
+    return image
+
+
+def _render(data: bytes, variant: str) -> bytes:
+    from PIL import ImageOps
+
+    width, height, crop = VARIANTS[variant]
+    image = ImageOps.exif_transpose(_decode(data))
+    image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+    if crop:
+        image = ImageOps.fit(image, (width, height))
+    else:
+        image.thumbnail((width, height))
+    out = io.BytesIO()
+    image.save(out, "WEBP", quality=WEBP_QUALITY, method=4)
+    return out.getvalue()
+
+
+def _write_atomic(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class ImageStore:
+    """
+    Content-addressed image cache on disk.
+
+    Originals are stored once under the sha256 of their bytes, whatever URL or file they came
+    from; resized WebP variants are rendered on first request and stored next to them:
+
+    - ``originals/``: images uploaded or ingested from local files, never evicted (they have no
+      other copy);
+    - ``fetched/``: originals downloaded from an allowed remote host, which can be fetched again;
+    - ``variants/``: rendered variants;
+    - ``urls/``: the digest of every fetched URL, so a URL is downloaded only once.
+
+    Files of ``fetched/`` and ``variants/`` are evicted least recently used first once they
+    exceed ``max_bytes``; serving a variant refreshes its mtime.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, allowed_hosts: List[str]):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.allowed_hosts = set(allowed_hosts)
+        self._cache_bytes: Optional[int] = None
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    def _file(self, kind: str, name: str) -> Path:
+        return self.root / kind / name[:2] / name
+
+    # -- originals ---------------------------------------------------------------------
+
+    def put_bytes(self, data: bytes, pinned: bool = True) -> str:
+        """Store an original image and return its digest (raises ValueError if it is not an image)."""
+        if len(data) > MAX_ORIGINAL_BYTES:
+            raise ValueError("Image is too large")
+        try:
+            _decode(data)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Not a valid image: {str(e)}")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._file("originals" if pinned else "fetched", digest)
+        if not path.exists():
+            _write_atomic(path, data)
+            if not pinned:
+                self._account(len(data))
+        return digest
+
+    def put_file(self, path: Path) -> str:
+        return self.put_bytes(path.read_bytes())
+
+    def original(self, digest: str) -> Optional[Path]:
+        for kind in ("originals", "fetched"):
+            path = self._file(kind, digest)
+            if path.exists():
+                return path
+        return None
+
+    async def fetch(self, url: str) -> str:
+        """Digest of the image at ``url``, downloading it only if it is not cached yet."""
+        url_file = self._file("urls", hashlib.sha256(url.encode("utf-8")).hexdigest())
+        digest = await asyncio.to_thread(self._fetched_digest, url_file)
+        if digest:
+            return digest
+        self._check_host(url)
+        return await self._once(f"url:{url}", self._download(url, url_file))
+
+    def _fetched_digest(self, url_file: Path) -> Optional[str]:
+        """Digest of an URL downloaded before, if its original is still cached."""
+        try:
+            digest = url_file.read_text()
+        except FileNotFoundError:
+            return None
+        return digest if self.original(digest) else None
+
+    def _check_host(self, url: str):
+        host = urlsplit(url).hostname
+        if not is_remote(url) or host not in self.allowed_hosts:
+            raise ValueError(f"Image host not allowed: {host}")
+
+    async def _download(self, url: str, url_file: Path) -> str:
+        import httpx  # only the workers that proxy images pay for the import
+
+        # Redirects are followed here rather than by httpx, so that every hop is checked
+        # against the allowed hosts
+        location = url
+        try:
+            async with httpx.AsyncClient(timeout=FETCH_TIMEOUT_SECONDS, follow_redirects=False) as client:
+                for _ in range(MAX_REDIRECTS + 1):
+                    async with client.stream("GET", location) as response:
+                        if response.is_redirect:
+                            location = urljoin(location, response.headers["location"])
+                            self._check_host(location)
+                            continue
+                        response.raise_for_status()
+                        chunks, size = [], 0
+                        async for chunk in response.aiter_bytes():
+                            size += len(chunk)
+                            if size > MAX_ORIGINAL_BYTES:
+                                raise ValueError("Image is too large")
+                            chunks.append(chunk)
+                        break
+                else:
+                    raise FetchFailed(f"More than {MAX_REDIRECTS} redirects")
+        except httpx.HTTPError as e:
+            raise FetchFailed(str(e))
+        digest = await asyncio.to_thread(self.put_bytes, b"".join(chunks), False)
+        await asyncio.to_thread(_write_atomic, url_file, digest.encode("ascii"))
+        return digest
+
+    # -- variants ----------------------------------------------------------------------
+
+    async def variant(self, digest: str, variant: str) -> bytes:
+        """
+        Bytes of a rendered variant, read in one go so that an eviction cannot remove the file
+        before it is served (raises LookupError for an unknown image, or a fetched original
+        evicted meanwhile, and ValueError for an image that cannot be rendered).
+        """
+        path = self._file("variants", f"{digest}-{variant}.webp")
+        data = await asyncio.to_thread(self._read_variant, path)
+        if data is not None:
+            return data
+        return await self._once(f"variant:{path.name}", asyncio.to_thread(self._render_to, digest, variant, path))
+
+    @staticmethod
+    def _read_variant(path: Path) -> Optional[bytes]:
+        try:
+            os.utime(path)
+            return path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def _render_to(self, digest: str, variant: str, path: Path) -> bytes:
+        original = self.original(digest)
+        try:
+            source = original.read_bytes() if original else None
+        except FileNotFoundError:
+            source = None  # a fetched original evicted since it was found
+        if source is None:
+            raise LookupError(f"Unknown image {digest}")
+        data = _render(source, variant)
+        _write_atomic(path, data)
+        self._account(len(data))
+        return data
+
+    async def _once(self, key: str, work) -> object:
+        """Concurrent requests for the same download or rendering share a single run."""
+        future = self._in_flight.get(key)
+        if future is None:
+            future = self._in_flight[key] = asyncio.ensure_future(work)
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            work.close()
+        return await asyncio.shield(future)
+
+    # -- eviction ----------------------------------------------------------------------
+
+    def _evictable(self) -> List[Tuple[float, int, Path]]:
+        files = []
+        for kind in ("fetched", "variants"):
+            for path in (self.root / kind).glob("*/*"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue  # evicted by another worker
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _account(self, written: int):
+        # Called from worker threads; an approximate total is enough to decide when to scan
+        if self._cache_bytes is None:
+            self._cache_bytes = sum(size for _, size, _ in self._evictable())
+        self._cache_bytes += written
+        if self._cache_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self, target: float = 0.9):
+        """Delete the least recently used evictable files until they fit in ``target * max_bytes``."""
+        files = sorted(self._evictable())
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, path in files:
+            if total <= target * self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        self._cache_bytes = total
+        logger.info("Image cache evicted", extra={"files": removed, "bytes": total})
+
+
+_store: Optional[ImageStore] = None
+
+
+def get_image_store() -> ImageStore:
+    global _store
+    if _store is None:
+        _store = ImageStore(
+            Path(settings.IMAGE_CACHE_DIR),
+            max_bytes=settings.IMAGE_CACHE_MAX_BYTES,
+            allowed_hosts=[host.strip() for host in settings.IMAGE_PROXY_HOSTS.split(",") if host.strip()],
+        )
+    return _store
@@ -0,0 +1,317 @@
+# app/services/ingestion.py
+import asyncio
+import csv
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.core.config import settings
+from app.models.database import db
+from app.models.schemas import ProductBase
+from app.services.catalog.geo import locate
+from app.services.image_service import IMAGE_PATH_PREFIX, get_image_store, image_path, is_remote
+from app.services.write_behind import get_write_behind
+from app.utils.logger import logger
+
+FEED_FORMATS = ("jsonl", "csv")
+# Lines parsed per worker task, and upserts per bulk_write
+CHUNK_SIZE = 1000
+# Rejected lines kept in the report; all of them go to the rejects file
+MAX_REJECT_SAMPLES = 20
+
+# (line number, raw line for JSONL or row dict for CSV)
+RawRecord = Tuple[int, object]
+
+
+def feed_format(path: Path, format: Optional[str] = None) -> str:
+    format = format or path.suffix.lstrip(".").lower()
+    if format == "ndjson":
+        format = "jsonl"
+    if format not in FEED_FORMATS:
+        raise ValueError(f"Unsupported feed format {format!r}, expected one of {', '.join(FEED_FORMATS)}")
+    return format
+
+
+def read_feed(path: Path, format: str, chunk_size: int = CHUNK_SIZE) -> Iterator[List[RawRecord]]:
+    """Yield the feed in chunks of raw records, so only a few chunks are ever in memory."""
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if format == "csv":
+            reader = csv.DictReader(f)
+            records = ((reader.line_num, row) for row in reader)
+        else:
+            records = ((line_no, line) for line_no, line in enumerate(f, start=1) if line.strip())
+        chunk: List[RawRecord] = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _csv_product(row: dict) -> dict:
+    """CSV columns are the Product fields; images are "|"-separated and specs a JSON object."""
+    product = {key: value for key, value in row.items() if key and value not in (None, "")}
+    if "images" in product:
+        product["images"] = [image.strip() for image in product["images"].split("|") if image.strip()]
+    if "specs" in product:
+        product["specs"] = json.loads(product["specs"])
+    if "isNew" in product:
+        product["isNew"] = product["isNew"].strip().lower() in ("1", "true", "yes", "oui")
+    return product
+
+
+def _store_local_images(product: dict, image_root: Path):
+    """Copy images given as local file paths into the image cache and reference them by digest."""
+    def stored(image: str) -> str:
+        if not image or is_remote(image) or image.startswith(IMAGE_PATH_PREFIX):
+            return image
+        path = image_root / image
+        if not path.is_file():
+            raise ValueError(f"Image file not found: {image}")
+        return image_path(get_image_store().put_file(path))
+
+    product["image"] = stored(product["image"])
+    product["images"] = [stored(image) for image in product["images"]]
+
+
+def parse_chunk(chunk: List[RawRecord], format: str,
+                image_root: Optional[Path] = None) -> Tuple[List[dict], List[dict]]:
+    """
+    Parse and validate a chunk against the Product schema (runs in a worker process).
+
+    With ``image_root``, images that are not URLs are read from files relative to it and
+    stored in the image cache, so a feed and its pictures can be ingested offline.
+
+    Returns the product documents ready to upsert and the rejected lines with their error.
+    """
+    products, rejects = [], []
+    for line_no, raw in chunk:
+        try:
+            data = _csv_product(raw) if format == "csv" else json.loads(raw)
+            if "price" not in data and data.get("numericPrice") is not None:
+                data["price"] = f"{float(data['numericPrice']):.2f} TND"
+            product = ProductBase(**data).model_dump()
+            if image_root is not None:
+                _store_local_images(product, image_root)
+        except ValidationError as e:
+            rejects.append({"line": line_no, "error": "; ".join(
+                f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+            )})
+            continue
+        except (ValueError, TypeError) as e:
+            rejects.append({"line": line_no, "error": str(e)})
+            continue
+        product["location"] = locate(product["address"])
+        products.append(product)
+    return products, rejects
+
+
+def _upsert(product: dict, now: datetime) -> UpdateOne:
+    # The product page URL identifies a product across feed runs
+    return UpdateOne(
+        {"link": product["link"]},
+        {"$set": {**product, "updated_at": now}, "$setOnInsert": {"created_at": now}},
+        upsert=True,
+    )
+
+
+class IngestReport:
+    """Counters of an ingestion run, updated as it progresses."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.status = "running"
+        self.lines = 0
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.rejected = 0
+        self.reject_samples: List[dict] = []
+        self.started_at = time.perf_counter()
+        self.seconds = 0.0
+        self.error: Optional[str] = None
+
+    def add_rejects(self, rejects: List[dict]):
+        self.rejected += len(rejects)
+        room = MAX_REJECT_SAMPLES - len(self.reject_samples)
+        if room > 0:
+            self.reject_samples.extend(rejects[:room])
+
+    def as_dict(self) -> dict:
+        seconds = self.seconds or time.perf_counter() - self.started_at
+        return {
+            "source": self.source,
+            "status": self.status,
+            "lines": self.lines,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "rejected": self.rejected,
+            "reject_samples": self.reject_samples,
+            "seconds": round(seconds, 2),
+            "lines_per_second": round(self.lines / seconds) if seconds else 0,
+            "error": self.error,
+        }
+
+
+async def ingest_feed(
+    path: Path,
+    format: Optional[str] = None,
+    ordered: bool = False,
+    chunk_size: int = CHUNK_SIZE,
+    workers: Optional[int] = None,
+    rejects_path: Optional[Path] = None,
+    report: Optional[IngestReport] = None,
+    on_progress: Optional[Callable[[IngestReport], None]] = None,
+    image_root: Optional[Path] = None,
+) -> IngestReport:
+    """
+    Stream a JSONL/CSV vendor feed into the products collection.
+
+    Chunks are parsed and validated in a process pool while earlier chunks are written with
+    one ``bulk_write`` of upserts each. The pool's processes are spawned, not forked, so none
+    inherits the event loop, sockets or threads of a web worker, and it is shut down from a
+    thread. At most ``2 * workers`` chunks are in flight, so
+    memory stays constant whatever the size of the file. With ``ordered`` a chunk stops at
+    its first failing write; otherwise failing writes are rejected and the rest go through.
+    Local image files are resolved against ``image_root`` (see ``parse_chunk``).
+    """
+    format = feed_format(path, format)
+    workers = workers or os.cpu_count() or 1
+    report = report or IngestReport(str(path))
+    await db.products.create_index("link", unique=True)
+
+    loop = asyncio.get_running_loop()
+    chunks = read_feed(path, format, chunk_size)
+    rejects_file = await asyncio.to_thread(open, rejects_path, "w", encoding="utf-8") if rejects_path else None
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        in_flight = deque()
+        exhausted = False
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < 2 * workers:
+                chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    exhausted = True
+                else:
+                    in_flight.append((len(chunk), loop.run_in_executor(pool, parse_chunk, chunk, format, image_root)))
+            if not in_flight:
+                break
+
+            lines, future = in_flight.popleft()
+            products, rejects = await future
+            rejects += await _write(products, ordered, report)
+            report.lines += lines
+            report.add_rejects(rejects)
+            if rejects_file and rejects:
+                await asyncio.to_thread(rejects_file.write, "".join(
+                    json.dumps(reject, ensure_ascii=False) + "\n" for reject in rejects
+                ))
+            if on_progress:
+                on_progress(report)
+        report.status = "done"
+    except Exception as e:
+        report.status = "failed"
+        report.error = str(e)
+        raise
+    finally:
+        await asyncio.to_thread(pool.shutdown, cancel_futures=True)
+        if rejects_file:
+            await asyncio.to_thread(rejects_file.close)
+        report.seconds = time.perf_counter() - report.started_at
+    logger.info("Product feed ingested", extra=report.as_dict())
+    return report
+
+
+async def _write(products: List[dict], ordered: bool, report: IngestReport) -> List[dict]:
+    """Upsert one chunk; returns the products whose write failed as rejects."""
+    if not products:
+        return []
+    now = datetime.utcnow()
+    try:
+        result = await db.products.bulk_write([_upsert(p, now) for p in products], ordered=ordered)
+        details, failed = result.bulk_api_result, []
+    except BulkWriteError as e:
+        details = e.details
+        failed = [{"link": products[err["index"]]["link"], "error": err["errmsg"]} for err in details["writeErrors"]]
+        if ordered:
+            # Writes after the first error were not attempted
+            first = details["writeErrors"][0]["index"]
+            failed += [{"link": p["link"], "error": "not attempted (ordered write)"} for p in products[first + 1:]]
+    report.inserted += details["nUpserted"]
+    report.updated += details["nModified"]
+    report.unchanged += details["nMatched"] - details["nModified"]
+    return failed
+
+
+# Ingestion jobs started through the API and still running in this worker
+_tasks: set = set()
+
+
+def _job_update(report: IngestReport) -> dict:
+    expires_at = datetime.utcnow() + timedelta(days=settings.INGEST_JOB_RETENTION_DAYS)
+    return {"$set": {**report.as_dict(), "expires_at": expires_at}}
+
+
+def _save_job(job_id: str, report: IngestReport) -> bool:
+    """Queue the job's progress; the ingest_jobs document is what every worker reads."""
+    return get_write_behind().submit("ingest_jobs", "_id", job_id, _job_update(report), upsert=True)
+
+
+async def _run_ingest_job(job_id: str, path: Path, format: str, ordered: bool, workers: Optional[int]):
+    report = IngestReport(path.name)
+    try:
+        await db.ingest_jobs.create_index("expires_at", expireAfterSeconds=0)
+        await ingest_feed(
+            path, format, ordered=ordered, workers=workers,
+            rejects_path=path.with_suffix(".rejects.jsonl"), report=report,
+            on_progress=lambda report: _save_job(job_id, report),
+        )
+    except asyncio.CancelledError:
+        report.status = "failed"
+        report.error = "Interrupted by a shutdown"
+        raise
+    except Exception as e:
+        report.status = "failed"
+        report.error = report.error or str(e)
+        logger.error(f"Product feed ingestion failed: {str(e)}")
+    finally:
+        report.seconds = report.seconds or time.perf_counter() - report.started_at
+        # Queued after any progress update, so the final status is the one that stays
+        if not _save_job(job_id, report):
+            await db.ingest_jobs.update_one({"_id": job_id}, _job_update(report), upsert=True)
+        await asyncio.to_thread(path.unlink, missing_ok=True)
+
+
+def start_ingest_job(path: Path, format: str, ordered: bool = False, workers: Optional[int] = None) -> str:
+    """Run ``ingest_feed`` in the background; poll ``get_ingest_job`` for its progress."""
+    job_id = path.stem
+    _save_job(job_id, IngestReport(path.name))
+    task = asyncio.create_task(_run_ingest_job(job_id, path, format, ordered, workers))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return job_id
+
+
+async def get_ingest_job(job_id: str) -> Optional[dict]:
+    return await db.ingest_jobs.find_one({"_id": job_id}, {"_id": 0, "expires_at": 0})
+
+
+async def stop_ingest_jobs():
+    """Interrupt the jobs of this worker (on shutdown) and wait for their pools to shut down."""
+    tasks = list(_tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,94 @@
+# app/services/login_handoff.py
+import hashlib
+import json
+import os
+import secrets
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+from app.utils.logger import logger
+
+# Codes are exchanged by the callback page right after the redirect
+HANDOFF_TTL_SECONDS = 60
+# Expired codes are swept once every this many codes created by a worker
+SWEEP_EVERY = 256
+
+
+class LoginHandoffStore:
+    """
+    Single-use, short-lived login codes shared by the workers of a host.
+
+    The OAuth callback stores the login result under a random code and redirects with the
+    code only; the front end exchanges it once. Each code is a small file named after the
+    hash of the code (so a directory listing does not reveal codes); redeeming renames the
+    file first, which only one worker can do, so a code is never accepted twice.
+    Put ``root`` on a tmpfs to keep it off the disk.
+    """
+
+    def __init__(self, root: Path, ttl: float = HANDOFF_TTL_SECONDS):
+        self.root = root
+        self.ttl = ttl
+        self._created = 0
+
+    def _path(self, code: str) -> Path:
+        return self.root / hashlib.sha256(code.encode("ascii")).hexdigest()
+
+    def create(self, payload: dict) -> str:
+        self.root.mkdir(mode=0o700, parents=True, exist_ok=True)
+        code = secrets.token_urlsafe(24)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp, self._path(code))
+        self._created += 1
+        if self._created % SWEEP_EVERY == 0:
+            self.sweep()
+        return code
+
+    def redeem(self, code: str) -> Optional[dict]:
+        """The payload of ``code``, or None if it is unknown, expired or already redeemed."""
+        if not code or len(code) > 64:
+            return None
+        path = self._path(code)
+        claimed = path.with_name(f".claimed-{path.name}")
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            return None
+        try:
+            if time.time() - claimed.stat().st_mtime > self.ttl:
+                return None
+            return json.loads(claimed.read_text(encoding="utf-8"))
+        finally:
+            claimed.unlink(missing_ok=True)
+
+    def sweep(self):
+        """Delete codes that expired without being redeemed."""
+        if not self.root.exists():
+            return
+        deadline = time.time() - self.ttl
+        removed = 0
+        for path in self.root.iterdir():
+            if path.name.startswith(".claimed-"):
+                continue  # being redeemed
+            try:
+                if path.stat().st_mtime < deadline:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        if removed:
+            logger.info("Expired login codes removed", extra={"codes": removed})
+
+
+_store: Optional[LoginHandoffStore] = None
+
+
+def get_login_handoff_store() -> LoginHandoffStore:
+    global _store
+    if _store is None:
+        _store = LoginHandoffStore(Path(settings.LOGIN_HANDOFF_DIR))
+    return _store
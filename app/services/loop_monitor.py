@@ -0,0 +1,107 @@
+# app/services/loop_monitor.py
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Deque, List, Optional, Tuple
+
+from app.core.config import settings
+from app.utils.logger import logger
+
+# Seconds of lag samples kept for the health endpoints
+LAG_HISTORY_SECONDS = 60
+MAX_SLOW_CALLBACKS = 50
+
+
+class LoopMonitor:
+    """
+    Event loop lag and blocking-callback detector for one worker.
+
+    A task sleeps ``interval`` seconds in a loop and records how late it wakes up: that lag is
+    how long any request on this worker waited for the loop. A watchdog thread checks the
+    task's heartbeat; when the loop has not run it for more than ``slow_threshold`` seconds,
+    it captures the stack of the loop thread, i.e. the code blocking it, and logs it. The
+    stall's duration is filled in once the loop runs again.
+    """
+
+    def __init__(self, interval: float = 0.05, slow_threshold: float = 0.1):
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.samples: Deque[Tuple[float, float]] = deque(maxlen=int(LAG_HISTORY_SECONDS / interval))
+        self.slow_callbacks: Deque[dict] = deque(maxlen=MAX_SLOW_CALLBACKS)
+        self._beat = time.monotonic()
+        self._stall: Optional[dict] = None
+        self._loop_thread: Optional[int] = None
+        self._stopped = threading.Event()
+
+    # -- loop side ---------------------------------------------------------------------
+
+    async def run(self):
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+        try:
+            while True:
+                started = time.monotonic()
+                await asyncio.sleep(self.interval)
+                now = time.monotonic()
+                lag = max(0.0, now - started - self.interval)
+                self._beat = now
+                self.samples.append((now, lag))
+                stall = self._stall
+                if stall is not None:
+                    stall["seconds"] = round(now - stall["since"], 3)
+                    self._stall = None
+        finally:
+            self._stopped.set()
+
+    def lag(self, window: float = 5.0) -> float:
+        """Worst loop lag over the last ``window`` seconds, including a stall in progress."""
+        since = time.monotonic() - window
+        worst = max((lag for at, lag in reversed(self.samples) if at >= since), default=0.0)
+        return max(worst, time.monotonic() - self._beat - self.interval)
+
+    def percentile(self, q: float) -> float:
+        lags = sorted(lag for _, lag in self.samples)
+        return lags[min(len(lags) - 1, int(q * len(lags)))] if lags else 0.0
+
+    # -- watchdog thread ---------------------------------------------------------------
+
+    def _watch(self):
+        while not self._stopped.wait(self.slow_threshold / 2):
+            beat = self._beat
+            if self._stall is not None or time.monotonic() - beat - self.interval < self.slow_threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            stall = {
+                "at": datetime.utcnow(),
+                "since": beat + self.interval,
+                "seconds": None,  # filled in when the loop runs again
+                "stack": stack,
+            }
+            self.slow_callbacks.append(stall)
+            self._stall = stall
+            logger.warning("Event loop blocked", extra={"threshold_ms": self.slow_threshold * 1000, "stack": stack})
+
+    def recent_slow_callbacks(self) -> List[dict]:
+        return [
+            {"at": stall["at"], "seconds": stall["seconds"], "stack": stall["stack"]}
+            for stall in reversed(self.slow_callbacks)
+        ]
+
+
+_monitor: Optional[LoopMonitor] = None
+
+
+def get_loop_monitor() -> LoopMonitor:
+    global _monitor
+    if _monitor is None:
+        _monitor = LoopMonitor(
+            interval=settings.LOOP_MONITOR_INTERVAL,
+            slow_threshold=settings.SLOW_CALLBACK_SECONDS,
+        )
+    return _monitor
@@ -0,0 +1,345 @@
+import asyncio
+import hashlib
+import json
+from collections import Counter
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+from bson import ObjectId
+
+from app.core.config import settings
+from app.models.database import db
+from app.services.catalog.facets import compute_facets
+from app.services.catalog.geo import distances_from, proximity_from
+from app.services.catalog.governorates import GOVERNORATES, UNKNOWN_GOVERNORATE, governorate_id
+from app.services.catalog.preferences import personal_boost, vendor_buckets
+from app.services.catalog.query_parser import ParsedQuery, QueryParser
+from app.services.catalog.snapshot import SnapshotWatcher, current_version, read_snapshot
+from app.services.catalog.spelling import SpellCorrector
+from app.services.catalog.store import CatalogBuilder, CatalogStore, INDEX_PROJECTION
+from app.services.catalog.text_index import product_text, tokenize
+from app.services.catalog.updater import Changes, IndexUpdater, capture_checkpoint
+from app.services.personalization_service import RERANK_DEPTH, get_preference_cache
+from app.utils.logger import logger
+
+# Relevance multiplier for a product in the user's own governorate (decays with distance)
+PROXIMITY_WEIGHT = 0.5
+
+# Products hydrated per query when streaming a whole result
+STREAM_BATCH_SIZE = 500
+
+
+def catalog_etag(catalog: CatalogStore) -> str:
+    """ETag of the catalog's content: the snapshot it was read from and the changes applied
+    since, so workers serving the same snapshot up to the same change agree on it."""
+    key = json.dumps([catalog.version, catalog.checkpoint], default=str, sort_keys=True)
+    return f'W/"{hashlib.sha1(key.encode()).hexdigest()[:16]}"'
+
+
+class SearchIndexes:
+    """The catalog and the helpers derived from it, swapped as a single object on reload."""
+
+    def __init__(self, catalog: CatalogStore, query_parser: Optional[QueryParser] = None,
+                 spell_corrector: Optional[SpellCorrector] = None):
+        self.catalog = catalog
+        self.query_parser = query_parser or QueryParser(catalog.vendors.values)
+        self.spell_corrector = spell_corrector or SpellCorrector.from_index(catalog.text_index)
+        # Hashed vendor of every vendor id, for personalized re-ranking
+        self.vendor_buckets = vendor_buckets(catalog.vendors.values)
+        self.etag = catalog_etag(catalog)
+
+    def apply_changes(self, changes: Changes, checkpoint: dict) -> "SearchIndexes":
+        """New indexes with ``changes`` applied, up to date with ``checkpoint``; the helpers
+        are extended rather than rebuilt."""
+        upserts = [doc for doc in changes.values() if doc is not None]
+        deleted_ids = [product_id for product_id, doc in changes.items() if doc is None]
+        catalog = self.catalog.apply_changes(upserts, deleted_ids)
+        catalog.checkpoint = checkpoint
+        frequencies = Counter(term for doc in upserts for term in set(tokenize(product_text(doc))))
+        # Vendors are only ever appended to the pool: the parser is stale iff the pool grew
+        query_parser = self.query_parser if len(catalog.vendors) == len(self.catalog.vendors) else None
+        return SearchIndexes(catalog, query_parser, self.spell_corrector.add(frequencies))
+
+
+# Indexes shared by all requests of this worker; a request keeps the object it started with
+_indexes: SearchIndexes = SearchIndexes(CatalogStore.empty())
+# False until the first catalog is installed: the worker is not ready to serve searches
+_catalog_loaded = False
+# Keeps _indexes in sync with the products collection between snapshots
+_updater: Optional[IndexUpdater] = None
+
+
+def get_search_indexes() -> SearchIndexes:
+    return _indexes
+
+
+def get_catalog() -> CatalogStore:
+    return _indexes.catalog
+
+
+def set_search_indexes(indexes: SearchIndexes):
+    global _indexes
+    _indexes = indexes
+
+
+def catalog_loaded() -> bool:
+    return _catalog_loaded
+
+
+async def install_catalog(store: CatalogStore):
+    """Derive the search helpers off the event loop, then swap them in with one assignment."""
+    global _catalog_loaded
+    set_search_indexes(await asyncio.to_thread(SearchIndexes, store))
+    _catalog_loaded = True
+
+
+async def install_snapshot(store: CatalogStore):
+    """Swap in a snapshot and replay the changes made since it was built."""
+    await install_catalog(store)
+    if _updater is not None and store.checkpoint is not None:
+        _updater.reset(store.checkpoint)
+
+
+async def apply_catalog_changes(changes: Changes, checkpoint: dict):
+    indexes = get_search_indexes()
+    while True:
+        updated = await asyncio.to_thread(indexes.apply_changes, changes, checkpoint)
+        if get_search_indexes() is indexes:
+            set_search_indexes(updated)
+            return
+        # A snapshot was swapped in meanwhile: changes are idempotent, apply them on top of it
+        indexes = get_search_indexes()
+
+
+async def load_catalog() -> CatalogStore:
+    """Stream the products collection into a new columnar catalog and make it current."""
+    checkpoint = await capture_checkpoint(db.products)
+    builder = CatalogBuilder()
+    async for doc in db.products.find({}, INDEX_PROJECTION):
+        builder.add(doc)
+    store = builder.build()
+    store.checkpoint = checkpoint
+    await install_catalog(store)
+    logger.info("Product catalog loaded", extra=store.memory_usage())
+    return store
+
+
+async def reload_catalog() -> dict:
+    return (await load_catalog()).checkpoint
+
+
+async def start_index_updater() -> IndexUpdater:
+    """Create the updater following the current catalog; the caller runs ``updater.run()``."""
+    global _updater
+    checkpoint = get_catalog().checkpoint
+    if checkpoint is None:
+        # Snapshot written before checkpoints were recorded: only follow changes from now on
+        logger.warning("Search catalog has no change checkpoint, following new changes only")
+        checkpoint = await capture_checkpoint(db.products)
+    _updater = IndexUpdater(
+        db.products,
+        apply_catalog_changes,
+        reload_catalog,
+        checkpoint,
+        batch_size=settings.SEARCH_UPDATE_BATCH_SIZE,
+        batch_seconds=settings.SEARCH_UPDATE_BATCH_SECONDS,
+        poll_seconds=settings.SEARCH_UPDATE_POLL_SECONDS,
+    )
+    return _updater
+
+
+async def load_catalog_snapshot() -> Optional[SnapshotWatcher]:
+    """
+    Serve the current on-disk snapshot when there is one and return a watcher that
+    hot-swaps newer snapshots; otherwise build the catalog from Mongo and return None.
+    """
+    root = Path(settings.SEARCH_SNAPSHOT_DIR)
+    version = current_version(root)
+    if not version:
+        await load_catalog()
+        return None
+    store = await asyncio.to_thread(read_snapshot, root / version)
+    await install_catalog(store)
+    logger.info("Search snapshot loaded", extra={"version": version, "products": len(store)})
+    return SnapshotWatcher(root, install_snapshot, settings.SEARCH_SNAPSHOT_POLL_SECONDS, version)
+
+
+class Ranking(NamedTuple):
+    mask: np.ndarray
+    scores: Optional[np.ndarray]
+    rerank: Optional[Callable[[np.ndarray], np.ndarray]]
+    parsed: ParsedQuery
+    corrections: Dict[str, str]
+    origin: int
+
+
+def serialize_product(doc: dict) -> dict:
+    doc["_id"] = str(doc["_id"])
+    return doc
+
+
+class ProductService:
+    def __init__(self, indexes: Optional[SearchIndexes] = None):
+        indexes = indexes or get_search_indexes()
+        self.catalog = indexes.catalog
+        self.query_parser = indexes.query_parser
+        self.spell_corrector = indexes.spell_corrector
+        self.vendor_buckets = indexes.vendor_buckets
+
+    async def search(
+        self,
+        q: Optional[str] = None,
+        sort: str = "relevance",
+        vendors: Optional[List[str]] = None,
+        governorates: Optional[List[str]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        is_new: Optional[bool] = None,
+        min_rating: Optional[float] = None,
+        page: int = 1,
+        page_size: int = 20,
+        facets: bool = False,
+        near: Optional[str] = None,
+        max_distance_km: Optional[float] = None,
+        user_email: Optional[str] = None,
+        collapse: bool = True,
+    ) -> dict:
+        """
+        Filter, sort and paginate the catalog in memory, then hydrate only the requested page.
+
+        Constraints written in the query ("moins de 100 TND", "nouvelle", "à Sfax"...) are
+        extracted first and applied as filters, so BM25 only scores the remaining candidates.
+        Explicit parameters take precedence over the parsed ones. Misspelled or transliterated
+        words are corrected against the catalog vocabulary before scoring.
+
+        Products close to ``near`` (or to the governorate of the user's stored address)
+        are boosted in the relevance order and can be filtered by distance.
+
+        For logged-in users with feedback history, the top RERANK_DEPTH results of the
+        relevance order are re-ranked by their affinity with the user's preference vector.
+
+        With ``collapse``, near-duplicate listings of a vendor are shown once, as their best
+        ranked member.
+        """
+        catalog = self.catalog
+        ranking = await self._rank(q, sort, vendors, governorates, min_price, max_price, is_new, min_rating,
+                                   near, max_distance_km, user_email)
+        rows, total = catalog.select(ranking.mask, sort, offset=(page - 1) * page_size, limit=page_size,
+                                     scores=ranking.scores, rerank=ranking.rerank, rerank_depth=RERANK_DEPTH,
+                                     collapse=collapse)
+        items = await self.get_products_by_ids([pid.decode() for pid in catalog.take("ids", rows)])
+        result = {
+            "items": items,
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "sort": sort,
+            "query": ranking.parsed.as_dict(),
+            "corrections": ranking.corrections,
+            "origin": GOVERNORATES[ranking.origin] if ranking.origin != UNKNOWN_GOVERNORATE else None,
+        }
+        if facets:
+            result["facets"] = compute_facets(catalog, ranking.mask)
+        return result
+
+    async def stream_search(
+        self,
+        q: Optional[str] = None,
+        sort: str = "relevance",
+        vendors: Optional[List[str]] = None,
+        governorates: Optional[List[str]] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        is_new: Optional[bool] = None,
+        min_rating: Optional[float] = None,
+        near: Optional[str] = None,
+        max_distance_km: Optional[float] = None,
+        user_email: Optional[str] = None,
+        collapse: bool = True,
+        batch_size: int = STREAM_BATCH_SIZE,
+    ) -> AsyncIterator[List[dict]]:
+        """
+        Every result of ``search``, in the same order, as batches of hydrated products.
+
+        Only the ranked row numbers are held for the whole result; each batch is read with its
+        own ``$in`` cursor when the previous one has been consumed, so memory does not grow
+        with the result size and the first batch is sent before the others are read.
+        """
+        catalog = self.catalog
+        ranking = await self._rank(q, sort, vendors, governorates, min_price, max_price, is_new, min_rating,
+                                   near, max_distance_km, user_email)
+        rows, _ = catalog.select(ranking.mask, sort, offset=0, limit=len(catalog), scores=ranking.scores,
+                                 rerank=ranking.rerank, rerank_depth=RERANK_DEPTH, collapse=collapse)
+        for start in range(0, len(rows), batch_size):
+            ids = [ObjectId(pid.decode()) for pid in catalog.take("ids", rows[start:start + batch_size])]
+            by_id = {}
+            async for doc in db.products.find({"_id": {"$in": ids}}, batch_size=batch_size):
+                by_id[doc["_id"]] = doc
+            yield [serialize_product(by_id[pid]) for pid in ids if pid in by_id]
+
+    async def _rank(self, q, sort, vendors, governorates, min_price, max_price, is_new, min_rating,
+                    near, max_distance_km, user_email) -> "Ranking":
+        """Matching rows, their scores and the personal re-ranking of a search (see ``search``)."""
+        catalog = self.catalog
+        parsed = self.query_parser.parse(q)
+        governorates = governorates or parsed.governorates
+        mask = catalog.mask(
+            vendors=vendors or parsed.vendors,
+            governorates=[governorate_id(g) for g in governorates] if governorates else None,
+            min_price=min_price if min_price is not None else parsed.min_price,
+            max_price=max_price if max_price is not None else parsed.max_price,
+            is_new=is_new if is_new is not None else parsed.is_new,
+            min_rating=min_rating,
+        )
+
+        scores = None
+        tokens, corrections = self.spell_corrector.correct(tokenize(parsed.text))
+        if tokens:
+            scores = catalog.score(tokens, candidates=mask)
+            mask &= scores > 0
+
+        origin = governorate_id(near)
+        if origin == UNKNOWN_GOVERNORATE and user_email:
+            origin = await self.get_user_governorate(user_email)
+        if origin != UNKNOWN_GOVERNORATE:
+            product_governorates = catalog.column("governorate_id")
+            if max_distance_km is not None:
+                mask &= distances_from(origin, product_governorates) <= max_distance_km
+            if sort == "relevance":
+                boost = 1 + PROXIMITY_WEIGHT * proximity_from(origin, product_governorates)
+                scores = boost if scores is None else scores * boost
+
+        rerank = None
+        preferences = get_preference_cache().get(user_email) if user_email and sort == "relevance" else None
+        if preferences is not None:
+            def rerank(rows):
+                return personal_boost(catalog, self.vendor_buckets, preferences, rows)
+
+        return Ranking(mask, scores, rerank, parsed, corrections, origin)
+
+    async def get_user_governorate(self, email: str) -> int:
+        """Governorate id of the user's stored address (resolved from the name, no geocoding)."""
+        user = await db.users.find_one({"email": email}, {"address.gouvernorat": 1})
+        address = (user or {}).get("address") or {}
+        return governorate_id(address.get("gouvernorat"))
+
+    async def get_similar_products(self, product_id: str, limit: int = 10) -> List[dict]:
+        """
+        Products similar to ``product_id``, from the neighbour lists precomputed by
+        ``app/commands/build_similar_products.py``: one lookup by id, then one hydration query.
+        """
+        doc = await db.product_similar.find_one({"_id": ObjectId(product_id)}, {"neighbors": 1})
+        neighbours = [str(pid) for pid in (doc or {}).get("neighbors", [])]
+        # Deleted neighbours are skipped by the hydration, so ask for a few more than needed
+        return (await self.get_products_by_ids(neighbours[:limit * 2]))[:limit]
+
+    async def get_products_by_ids(self, product_ids: List[str]) -> List[dict]:
+        """Fetch products in one query and return them in the order of ``product_ids``."""
+        if not product_ids:
+            return []
+        docs = await db.products.find(
+            {"_id": {"$in": [ObjectId(pid) for pid in product_ids]}}
+        ).to_list(length=None)
+        by_id = {str(doc["_id"]): doc for doc in docs}
+        return [serialize_product(by_id[pid]) for pid in product_ids if pid in by_id]
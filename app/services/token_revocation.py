@@ -0,0 +1,166 @@
+# app/services/token_revocation.py
+import asyncio
+import hashlib
+import math
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from pymongo.errors import PyMongoError
+
+from app.core.config import settings
+from app.models.database import db
+from app.utils.logger import logger
+
+# Each sync re-reads this much before the previous one, for clock skew between workers
+# and revocations written while the filter was being rebuilt
+SYNC_OVERLAP = timedelta(seconds=30)
+MAX_CHECKED = 10_000
+
+
+class BloomFilter:
+    """Bit array answering "maybe present" or "certainly absent", sized for ``capacity`` items."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _hashes(self, item: str) -> Tuple[int, int]:
+        # Double hashing: position i is (h1 + i * h2) mod size
+        digest = int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest(), "little")
+        return digest % self.size, ((digest >> 64) | 1) % self.size
+
+    def add(self, item: str):
+        position, step = self._hashes(item)
+        bits, size = self.bits, self.size
+        added = False
+        for _ in range(self.hashes):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                added = True
+            position = (position + step) % size
+        # Items added again (e.g. by overlapping syncs) do not count
+        self.count += added
+
+    def __contains__(self, item: str) -> bool:
+        if not self.count:
+            return False
+        position, step = self._hashes(item)
+        bits, size = self.bits, self.size
+        for _ in range(self.hashes):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False  # most lookups stop at the first or second position
+            position = (position + step) % size
+        return True
+
+
+class TokenRevocations:
+    """
+    Revoked access tokens, by ``jti``.
+
+    Revocations are stored in ``db.revoked_tokens`` until the token would have expired anyway
+    (TTL index on ``expires_at``). Each worker keeps a Bloom filter of the revoked ids, synced
+    every ``sync_seconds`` from the revocations written since the last sync and rebuilt every
+    ``rebuild_seconds`` (or when it is over capacity) to drop expired ones. A token absent from
+    the filter is valid without any I/O; only filter hits are checked against the collection,
+    and the answer is kept in a small LRU. Until the first rebuild the filter is empty, so
+    every token is checked against the collection.
+    """
+
+    def __init__(self, capacity: int = 100_000, sync_seconds: float = 2.0, rebuild_seconds: float = 3600.0):
+        self.capacity = capacity
+        self.sync_seconds = sync_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self.filter = BloomFilter(capacity)
+        self.checked: "OrderedDict[str, bool]" = OrderedDict()
+        self._synced_at: Optional[datetime] = None
+        self._rebuilt_at: Optional[datetime] = None
+        self._indexed = False
+
+    async def ensure_indexes(self):
+        await db.revoked_tokens.create_index("expires_at", expireAfterSeconds=0)
+        await db.revoked_tokens.create_index("revoked_at")
+        self._indexed = True
+
+    def _remember(self, jti: str, revoked: bool):
+        self.checked[jti] = revoked
+        self.checked.move_to_end(jti)
+        if len(self.checked) > MAX_CHECKED:
+            self.checked.popitem(last=False)
+
+    def _add(self, jti: str):
+        self.filter.add(jti)
+        if jti in self.checked:
+            self._remember(jti, True)
+
+    async def revoke(self, jti: str, expires_at: datetime):
+        now = datetime.utcnow()
+        if expires_at <= now:
+            return
+        await db.revoked_tokens.update_one(
+            {"_id": jti},
+            {"$set": {"expires_at": expires_at, "revoked_at": now}},
+            upsert=True,
+        )
+        self._add(jti)
+        self._remember(jti, True)
+
+    async def is_revoked(self, jti: str) -> bool:
+        if self._rebuilt_at is not None and jti not in self.filter:
+            return False
+        revoked = self.checked.get(jti)
+        if revoked is None:
+            revoked = await db.revoked_tokens.count_documents(
+                {"_id": jti, "expires_at": {"$gt": datetime.utcnow()}}, limit=1
+            ) > 0
+            self._remember(jti, revoked)
+        return revoked
+
+    async def rebuild(self):
+        now = datetime.utcnow()
+        active = await db.revoked_tokens.find({"expires_at": {"$gt": now}}, {"_id": 1}).to_list(length=None)
+        bloom = BloomFilter(max(self.capacity, 2 * len(active)))
+        for doc in active:
+            bloom.add(doc["_id"])
+        self.filter = bloom
+        self.checked.clear()
+        self._synced_at = self._rebuilt_at = now
+        logger.info("Token revocation filter rebuilt", extra={"revoked": len(active), "bits": bloom.size})
+
+    async def sync(self):
+        now = datetime.utcnow()
+        cursor = db.revoked_tokens.find({"revoked_at": {"$gt": self._synced_at - SYNC_OVERLAP}}, {"_id": 1})
+        async for doc in cursor:
+            self._add(doc["_id"])
+        self._synced_at = now
+
+    async def run(self):
+        while True:
+            try:
+                if not self._indexed:
+                    await self.ensure_indexes()
+                if (self._rebuilt_at is None or self.filter.count > self.filter.capacity
+                        or (datetime.utcnow() - self._rebuilt_at).total_seconds() > self.rebuild_seconds):
+                    await self.rebuild()
+                else:
+                    await self.sync()
+            except PyMongoError as e:
+                logger.warning(f"Token revocation sync failed: {str(e)}")
+            await asyncio.sleep(self.sync_seconds)
+
+
+_revocations: Optional[TokenRevocations] = None
+
+
+def get_token_revocations() -> TokenRevocations:
+    global _revocations
+    if _revocations is None:
+        _revocations = TokenRevocations(
+            capacity=settings.TOKEN_REVOCATION_CAPACITY,
+            sync_seconds=settings.TOKEN_REVOCATION_SYNC_SECONDS,
+        )
+    return _revocations
@@ -0,0 +1,241 @@
+# app/services/trending_service.py
+import asyncio
+import heapq
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+
+from app.core.config import settings
+from app.models.database import db
+from app.services.catalog.geo import location_governorate_id
+from app.services.catalog.governorates import GOVERNORATES, UNKNOWN_GOVERNORATE
+from app.services.personalization_service import event_product, find_event_products
+from app.utils.logger import logger
+
+# Weight of each feedback event type in the trending score (other types are ignored)
+TRENDING_WEIGHTS = {"view": 1.0, "click": 2.0, "favorite": 5.0}
+# An event counts half as much after this long
+TRENDING_HALF_LIFE_SECONDS = 3600.0
+
+SKETCH_DEPTH = 4
+SKETCH_WIDTH = 1 << 15
+# Products tracked per scope (global and each governorate); more than ever served
+TRACKED_PER_SCOPE = 200
+
+GLOBAL_SCOPE = "*"
+
+# Events older than this many half-lives weigh under 2% of a new one: not replayed at startup
+REPLAY_HALF_LIVES = 6
+# Events are read once every worker's writer had time to write them (flush interval, write
+# timeout and clock skew between workers); spilled events written later than that are skipped
+SETTLE_DELAY = timedelta(seconds=15)
+FEED_PROJECTION = {"type": 1, "product_id": 1, "product_name": 1, "received_at": 1}
+
+
+class CountMinSketch:
+    """
+    Fixed-size frequency estimates: ``depth`` rows of ``width`` float counters, a key adds to
+    one counter per row and its estimate is the smallest of them. Estimates never undercount
+    and overcount by at most ~e/width of the total weight with probability 1 - e^-depth.
+    """
+
+    def __init__(self, depth: int = SKETCH_DEPTH, width: int = SKETCH_WIDTH):
+        self.depth = depth
+        self.width = width
+        # Row-major depth x width; an update touches ``depth`` scalars, so it stays in Python
+        self.counters = np.zeros(depth * width, dtype=np.float64)
+        self._view = self.counters.data  # memoryview: much faster scalar access than the array
+
+    def _cells(self, key: str) -> List[int]:
+        # Double hashing: row i uses h1 + i * h2, h2 odd so the rows differ
+        data = key.encode("utf-8")
+        h1 = zlib.crc32(data)
+        h2 = zlib.adler32(data) | 1
+        return [row * self.width + (h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def add(self, key: str, weight: float) -> float:
+        """Add ``weight`` to ``key`` and return its new estimate."""
+        counters = self._view
+        estimate = float("inf")
+        for cell in self._cells(key):
+            counters[cell] += weight
+            estimate = min(estimate, counters[cell])
+        return estimate
+
+    def estimate(self, key: str) -> float:
+        return float(self.counters[self._cells(key)].min())
+
+    def scale(self, factor: float):
+        self.counters *= factor
+
+
+class TopK:
+    """
+    The ``capacity`` keys with the largest estimates seen so far, kept in a min-heap.
+
+    Estimates only grow, so an updated key's old heap entry is left in place and skipped when
+    it reaches the top (its score no longer matches ``scores``).
+    """
+
+    def __init__(self, capacity: int = TRACKED_PER_SCOPE):
+        self.capacity = capacity
+        self.scores: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+
+    def _min(self) -> Tuple[float, str]:
+        while self._heap[0][0] != self.scores.get(self._heap[0][1]):
+            heapq.heappop(self._heap)
+        return self._heap[0]
+
+    def update(self, key: str, score: float):
+        if key not in self.scores and len(self.scores) >= self.capacity:
+            if score <= self._min()[0]:
+                return
+            del self.scores[heapq.heappop(self._heap)[1]]
+        self.scores[key] = score
+        heapq.heappush(self._heap, (score, key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(s, k) for k, s in self.scores.items()]
+            heapq.heapify(self._heap)
+
+    def top(self, limit: int) -> List[Tuple[str, float]]:
+        return heapq.nlargest(limit, self.scores.items(), key=lambda item: item[1])
+
+    def scale(self, factor: float):
+        self.scores = {key: score * factor for key, score in self.scores.items()}
+        self._heap = [(s, k) for k, s in self.scores.items()]
+        heapq.heapify(self._heap)
+
+
+class TrendingTracker:
+    """
+    Exponentially time-decayed event counts per product, globally and per governorate.
+
+    Decay uses forward decay: an event at time ``t`` adds ``w * 2^((t - t0) / half_life)``
+    instead of every counter being decayed as time passes, which gives the same order with
+    O(1) updates. All counters are rescaled (and ``t0`` moved) before the factor overflows.
+    Memory is one sketch plus TRACKED_PER_SCOPE entries per scope, whatever the catalog size.
+
+    The tracker lives in the worker's memory; ``TrendingFeed`` fills it with the events of
+    every worker, so all workers serve the same ranking.
+    """
+
+    def __init__(self, half_life: float = TRENDING_HALF_LIFE_SECONDS, capacity: int = TRACKED_PER_SCOPE):
+        self.half_life = half_life
+        self.capacity = capacity
+        self.sketch = CountMinSketch()
+        self.scopes: Dict[str, TopK] = {}
+        self.t0 = time.time()
+
+    def _boost(self, now: float) -> float:
+        exponent = (now - self.t0) / self.half_life
+        if exponent > 64:
+            factor = 2.0 ** -exponent
+            self.sketch.scale(factor)
+            for top in self.scopes.values():
+                top.scale(factor)
+            self.t0, exponent = now, 0.0
+        return 2.0 ** exponent
+
+    def add(self, product_id: str, governorate: int, weight: float, now: Optional[float] = None):
+        weight *= self._boost(now if now is not None else time.time())
+        scopes = [GLOBAL_SCOPE]
+        if governorate != UNKNOWN_GOVERNORATE:
+            scopes.append(GOVERNORATES[governorate])
+        for scope in scopes:
+            # The sketch is shared: per-governorate keys are prefixed with the scope
+            key = product_id if scope == GLOBAL_SCOPE else f"{scope}:{product_id}"
+            estimate = self.sketch.add(key, weight)
+            top = self.scopes.get(scope)
+            if top is None:
+                top = self.scopes[scope] = TopK(self.capacity)
+            top.update(product_id, estimate)
+
+    def record(self, events: List[dict], products: Dict[str, dict]):
+        """Count written feedback events (``products`` from ``find_event_products``)."""
+        for event in events:
+            weight = TRENDING_WEIGHTS.get(event["type"])
+            product = event_product(products, event) if weight else None
+            if product is not None:
+                received_at = event["received_at"].replace(tzinfo=timezone.utc)  # stored as naive UTC
+                self.add(str(product["_id"]), location_governorate_id(product), weight, received_at.timestamp())
+
+    def top(self, governorate: int = UNKNOWN_GOVERNORATE, limit: int = 20) -> List[Tuple[str, float]]:
+        """Trending product ids with their decayed, weighted event count as of now."""
+        scope = GLOBAL_SCOPE if governorate == UNKNOWN_GOVERNORATE else GOVERNORATES[governorate]
+        top = self.scopes.get(scope)
+        if top is None:
+            return []
+        decay = 2.0 ** ((self.t0 - time.time()) / self.half_life)
+        return [(product_id, score * decay) for product_id, score in top.top(limit)]
+
+
+class TrendingFeed:
+    """
+    Feeds a tracker from ``db.feedback_events``, which every worker writes to.
+
+    At startup it replays the events of the last REPLAY_HALF_LIVES half-lives, then it keeps
+    tailing the collection every ``poll_seconds``. Events are read in (received_at, _id)
+    order up to SETTLE_DELAY ago, so that events still buffered by a worker are not skipped.
+    """
+
+    def __init__(self, tracker: TrendingTracker, poll_seconds: float = 5.0, batch_size: int = 1000):
+        self.tracker = tracker
+        self.poll_seconds = poll_seconds
+        self.batch_size = batch_size
+        self.received_at = datetime.utcnow() - timedelta(seconds=tracker.half_life * REPLAY_HALF_LIVES)
+        self.last_id: Optional[ObjectId] = None
+        self._indexed = False
+
+    async def ensure_indexes(self):
+        await db.feedback_events.create_index([("received_at", 1), ("_id", 1)])
+        self._indexed = True
+
+    async def poll(self) -> int:
+        """Count the next batch of settled events; returns the number of events read."""
+        query = {"type": {"$in": list(TRENDING_WEIGHTS)}, "received_at": {"$lte": datetime.utcnow() - SETTLE_DELAY}}
+        if self.last_id is None:
+            query["received_at"]["$gte"] = self.received_at
+        else:
+            query["$or"] = [
+                {"received_at": {"$gt": self.received_at}},
+                {"received_at": self.received_at, "_id": {"$gt": self.last_id}},
+            ]
+        events = await db.feedback_events.find(query, FEED_PROJECTION).sort(
+            [("received_at", 1), ("_id", 1)]
+        ).limit(self.batch_size).to_list(length=None)
+        if events:
+            self.tracker.record(events, await find_event_products(events))
+            self.received_at, self.last_id = events[-1]["received_at"], events[-1]["_id"]
+        return len(events)
+
+    async def run(self):
+        while True:
+            try:
+                if not self._indexed:
+                    await self.ensure_indexes()
+                while await self.poll() == self.batch_size:
+                    pass  # catching up (the replay at startup)
+            except PyMongoError as e:
+                logger.warning(f"Trending feed failed: {str(e)}")
+            await asyncio.sleep(self.poll_seconds)
+
+
+_tracker = TrendingTracker()
+_feed: Optional[TrendingFeed] = None
+
+
+def get_trending_tracker() -> TrendingTracker:
+    return _tracker
+
+
+def get_trending_feed() -> TrendingFeed:
+    global _feed
+    if _feed is None:
+        _feed = TrendingFeed(_tracker, poll_seconds=settings.TRENDING_POLL_SECONDS)
+    return _feed
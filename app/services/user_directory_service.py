@@ -0,0 +1,186 @@
+import base64
+import json
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+
+from app.models.database import db
+from app.services.auth_service import get_user_etags
+from app.utils.logger import logger
+
+# Name search is case-insensitive: the query and its index use this collation
+NAME_COLLATION = {"locale": "en", "strength": 2}
+# Every listing query is an equality or prefix filter plus one of these sort orders, each
+# backed by an index ending with _id so that pages are read from the index in order
+USER_INDEXES = [
+    ([("email", ASCENDING), ("_id", ASCENDING)], {}),
+    ([("name", ASCENDING), ("_id", ASCENDING)], {"collation": NAME_COLLATION}),
+    ([("roles", ASCENDING), ("_id", ASCENDING)], {}),
+    ([("strategy", ASCENDING), ("_id", ASCENDING)], {}),
+    ([("status", ASCENDING), ("_id", ASCENDING)], {}),
+]
+DIRECTORY_PROJECTION = {"refresh_token": 0, "favorites": 0, "preferences": 0}
+
+
+def encode_cursor(sort_value, last_id: ObjectId) -> str:
+    raw = json.dumps([sort_value, str(last_id)], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[object, ObjectId]:
+    try:
+        sort_value, last_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return sort_value, ObjectId(last_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def prefix_range(prefix: str) -> dict:
+    # U+FFFF sorts after every character, in binary order as under a collation
+    return {"$gte": prefix, "$lt": prefix + "\uffff"}
+
+
+def after_cursor(sort_field: Optional[str], cursor: Optional[str]) -> dict:
+    """Filter selecting the documents after ``cursor`` in (sort_field, _id) order."""
+    if not cursor:
+        return {}
+    sort_value, last_id = decode_cursor(cursor)
+    if sort_field is None:
+        return {"_id": {"$gt": last_id}}
+    return {"$or": [
+        {sort_field: {"$gt": sort_value}},
+        {sort_field: sort_value, "_id": {"$gt": last_id}},
+    ]}
+
+
+def role_values(role_ids: List[ObjectId]) -> list:
+    # Roles are ObjectIds, but logins used to write them back as strings
+    return role_ids + [str(role_id) for role_id in role_ids]
+
+
+def serialize_user(doc: dict) -> dict:
+    doc["_id"] = str(doc["_id"])
+    doc["roles"] = [str(role_id) for role_id in doc.get("roles", [])]
+    if doc.get("storeId") is not None:
+        doc["storeId"] = str(doc["storeId"])
+    return doc
+
+
+class UserDirectoryService:
+    """
+    User listing and role management for administrators.
+
+    Listings use keyset pagination: a page is the next ``limit`` users after the cursor in
+    (sort field, _id) order, read from an index, so page 1000 costs the same as page 1.
+    """
+
+    async def ensure_indexes(self):
+        for keys, options in USER_INDEXES:
+            await db.users.create_index(keys, **options)
+
+    async def role_ids(self, names: List[str]) -> Dict[str, ObjectId]:
+        names = list(dict.fromkeys(names))
+        roles = {role["name"]: role["_id"] async for role in db.roles.find({"name": {"$in": names}}, {"name": 1})}
+        unknown = [name for name in names if name not in roles]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown role: {', '.join(unknown)}")
+        return roles
+
+    async def list_users(self, email_prefix: Optional[str] = None, name_prefix: Optional[str] = None,
+                         role: Optional[str] = None, strategy: Optional[str] = None,
+                         status: Optional[str] = None, cursor: Optional[str] = None, limit: int = 50) -> dict:
+        """
+        One page of users matching all the given filters and the cursor of the next page.
+        Sorted by email with an email prefix, by name with a name prefix, else by _id.
+        """
+        if name_prefix and email_prefix:
+            raise HTTPException(status_code=400, detail="Search by email or by name, not both")
+        filters = []
+        options = {}
+        sort_field = None
+        if email_prefix:
+            sort_field = "email"
+            filters.append({"email": prefix_range(email_prefix.lower())})
+        elif name_prefix:
+            sort_field = "name"
+            options["collation"] = NAME_COLLATION
+            filters.append({"name": prefix_range(name_prefix)})
+        if role:
+            role_id = (await self.role_ids([role]))[role]
+            filters.append({"roles": {"$in": role_values([role_id])}})
+        if strategy:
+            filters.append({"strategy": strategy})
+        if status:
+            filters.append({"status": status})
+        after = after_cursor(sort_field, cursor)
+        if after:
+            filters.append(after)
+
+        sort = [(sort_field, ASCENDING), ("_id", ASCENDING)] if sort_field else [("_id", ASCENDING)]
+        query = {"$and": filters} if filters else {}
+        docs = await db.users.find(query, DIRECTORY_PROJECTION, **options).sort(sort).limit(limit + 1).to_list(length=None)
+        next_cursor = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            last = docs[-1]
+            next_cursor = encode_cursor(last.get(sort_field) if sort_field else None, last["_id"])
+        return {"users": [serialize_user(doc) for doc in docs], "next_cursor": next_cursor}
+
+    async def bulk_update_roles(self, user_ids: List[str], add: List[str], remove: List[str]) -> dict:
+        """
+        Add and remove roles of many users with a single unordered ``bulk_write``: one update
+        per user pulling the removed roles (and the string form of the added ones), one adding
+        the added roles.
+        """
+        if not add and not remove:
+            raise HTTPException(status_code=400, detail="Nothing to add or remove")
+        overlap = set(add) & set(remove)
+        if overlap:
+            raise HTTPException(status_code=400, detail=f"Role both added and removed: {', '.join(sorted(overlap))}")
+        invalid = [uid for uid in user_ids if not ObjectId.is_valid(uid)]
+        if invalid:
+            raise HTTPException(status_code=400, detail=f"Invalid user id: {invalid[0]}")
+        ids = [ObjectId(uid) for uid in dict.fromkeys(user_ids)]
+        roles = await self.role_ids(add + remove)
+        add_ids = [roles[name] for name in add]
+        remove_ids = [roles[name] for name in remove]
+
+        # $pull and $addToSet cannot target the same field in one update
+        pulled = role_values(remove_ids) + [str(role_id) for role_id in add_ids]
+        updates = [{"$pull": {"roles": {"$in": pulled}}, "$inc": {"revision": 1}}]
+        if add_ids:
+            updates.append({"$addToSet": {"roles": {"$each": add_ids}}})
+        requests = [UpdateOne({"_id": user_id}, update) for user_id in ids for update in updates]
+        result = await db.users.bulk_write(requests, ordered=False)
+        # Cached profile ETags are keyed by email
+        etags = get_user_etags()
+        async for user in db.users.find({"_id": {"$in": ids}}, {"email": 1}):
+            etags.invalidate(user["email"])
+        report = {
+            "users": len(ids),
+            "users_found": result.matched_count // len(updates),
+            "operations": len(requests),
+            "modified": result.modified_count,
+            "added": add,
+            "removed": remove,
+        }
+        logger.info("User roles updated in bulk", extra=report)
+        return report
+
+    async def update_user_role(self, user_id: str, role: str) -> dict:
+        """Replace the roles of one user by ``role``."""
+        if not ObjectId.is_valid(user_id):
+            raise HTTPException(status_code=400, detail="Invalid user id")
+        role_id = (await self.role_ids([role]))[role]
+        user = await db.users.find_one_and_update(
+            {"_id": ObjectId(user_id)},
+            {"$set": {"roles": [role_id]}, "$inc": {"revision": 1}},
+            projection=DIRECTORY_PROJECTION,
+            return_document=ReturnDocument.AFTER,
+        )
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        get_user_etags().invalidate(user["email"])
+        return serialize_user(user)
@@ -0,0 +1,247 @@
+# app/services/write_behind.py
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError, ServerSelectionTimeoutError
+
+from app.core.config import settings
+from app.models.database import db
+from app.utils.logger import logger
+
+# Update operators that can be merged when several updates of a document are queued
+MERGEABLE_OPERATORS = ("$set", "$setOnInsert", "$inc", "$addToSet")
+
+# Write errors of one document worth retrying: a concurrent upsert of the same document
+# (duplicate key) and a write conflict; any other error would fail again
+RETRYABLE_WRITE_ERRORS = {11000, 112}
+MAX_WRITE_ATTEMPTS = 5
+
+
+def merge_updates(older: dict, newer: dict) -> dict:
+    """One update with the effect of applying ``older`` then ``newer``."""
+    merged = {op: dict(fields) for op, fields in older.items()}
+    for op, fields in newer.items():
+        target = merged.setdefault(op, {})
+        for field, value in fields.items():
+            if op == "$inc":
+                target[field] = target.get(field, 0) + value
+            elif op == "$addToSet":
+                values = list(target.get(field, {"$each": []})["$each"])
+                values += [v for v in value["$each"] if v not in values]
+                target[field] = {"$each": values}
+            else:
+                target[field] = value
+    return merged
+
+
+class PendingWrite:
+    __slots__ = ("update", "on_written", "upsert", "on_inserted", "attempts")
+
+    def __init__(self, update: dict, on_written: Optional[Callable[[], None]], upsert: bool = False,
+                 on_inserted: Optional[Callable[[], None]] = None):
+        self.update = update
+        self.on_written = on_written
+        self.upsert = upsert
+        self.on_inserted = on_inserted
+        self.attempts = 0
+
+    def without_increments(self) -> Optional["PendingWrite"]:
+        """This write minus its ``$inc``, safe to repeat if it was applied; None if nothing is left."""
+        update = {op: fields for op, fields in self.update.items() if op != "$inc"}
+        if not update:
+            return None
+        write = PendingWrite(update, self.on_written, self.upsert)
+        write.attempts = self.attempts
+        return write
+
+    def merge(self, newer: "PendingWrite"):
+        """Fold a newer update of the same document into this one."""
+        self.update = merge_updates(self.update, newer.update)
+        self.on_written = newer.on_written or self.on_written
+        self.upsert = self.upsert or newer.upsert
+        self.on_inserted = newer.on_inserted or self.on_inserted
+
+
+class WriteBehind:
+    """
+    In-process runner for updates a request does not need to wait for.
+
+    ``submit`` queues an update of one document, keyed by (collection, filter key); a second
+    update of the same document before the next flush is merged into the queued one, so a
+    user logging in repeatedly costs one write per flush. A background task writes the queue
+    every ``flush_seconds`` (or once ``batch_size`` documents are pending) with one unordered
+    ``bulk_write`` per collection. Updates that failed are queued again under any newer update
+    of the same document: all of them when nothing reached the server, only the documents
+    with a retryable write error otherwise (the others are dropped and logged), and without
+    their ``$inc`` when the outcome is unknown (a timeout), as the write may have been applied.
+
+    The queue holds at most ``max_pending`` documents: past that, and once the runner is
+    closed, ``submit`` returns False and the caller must write itself. ``close`` drains the
+    queue on shutdown, including what callbacks of the drained writes submit.
+    """
+
+    def __init__(self, max_pending: int = 10_000, batch_size: int = 500, flush_seconds: float = 0.5,
+                 write_timeout: float = 5.0):
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.write_timeout = write_timeout
+        self.pending: "OrderedDict[Tuple[str, str, object], PendingWrite]" = OrderedDict()
+        self._flush_needed = asyncio.Event()
+        self._closed = False
+
+    def submit(self, collection: str, filter_field: str, filter_value, update: dict,
+               on_written: Optional[Callable[[], None]] = None, upsert: bool = False,
+               on_inserted: Optional[Callable[[], None]] = None) -> bool:
+        """Queue ``update`` of the document of ``collection`` where ``filter_field == filter_value``.
+
+        ``on_written`` is called once the update is stored (the latest one of coalesced updates);
+        with ``upsert`` the document is created if missing, and ``on_inserted`` is then called
+        if it was (at most once: not when a write that timed out is retried). Returns False
+        when the update was not queued.
+        """
+        unknown = set(update) - set(MERGEABLE_OPERATORS)
+        if unknown:
+            raise ValueError(f"Unsupported update operators: {', '.join(sorted(unknown))}")
+        if self._closed:
+            return False
+        key = (collection, filter_field, filter_value)
+        write = PendingWrite(update, on_written, upsert, on_inserted)
+        queued = self.pending.get(key)
+        if queued is not None:
+            queued.merge(write)
+            return True
+        if len(self.pending) >= self.max_pending:
+            return False
+        self.pending[key] = write
+        if len(self.pending) >= self.batch_size:
+            self._flush_needed.set()
+        return True
+
+    async def _write(self, collection: str, batch: List[Tuple[tuple, PendingWrite]]) -> List[Tuple[tuple, PendingWrite]]:
+        """Write ``batch``; returns the writes to queue again."""
+        requests = [UpdateOne({field: value}, write.update, upsert=write.upsert) for (_, field, value), write in batch]
+        try:
+            result = await asyncio.wait_for(
+                db[collection].bulk_write(requests, ordered=False), timeout=self.write_timeout)
+        except BulkWriteError as e:
+            return self._written_partly(collection, batch, e.details)
+        except ServerSelectionTimeoutError as e:
+            # Nothing was sent: every write can be repeated as is
+            logger.warning(f"Background writes to {collection} failed, requeueing {len(batch)}: {str(e)}")
+            return batch
+        except (PyMongoError, asyncio.TimeoutError) as e:
+            # The writes may have been applied: repeat them without their counters, which must
+            # not count twice, and without on_inserted, which must not run twice
+            retry = [(key, write.without_increments()) for key, write in batch]
+            retry = [(key, write) for key, write in retry if write is not None]
+            logger.warning(f"Background writes to {collection} failed, requeueing {len(retry)} without increments: {str(e)}",
+                           extra={"dropped": len(batch) - len(retry)})
+            return retry
+        inserted = result.upserted_ids or {}
+        for index, (_, write) in enumerate(batch):
+            self._written(write, index in inserted)
+        return []
+
+    def _written_partly(self, collection: str, batch: List[Tuple[tuple, PendingWrite]],
+                        details: dict) -> List[Tuple[tuple, PendingWrite]]:
+        """Settle a bulk write some documents of failed: only those are retried, if worth it."""
+        errors = {error["index"]: error for error in details.get("writeErrors", [])}
+        inserted = {upserted["index"] for upserted in details.get("upserted", [])}
+        if details.get("writeConcernErrors"):
+            logger.warning(f"Background writes to {collection} not acknowledged by the write concern",
+                           extra={"errors": len(details["writeConcernErrors"])})
+        retry = []
+        for index, (key, write) in enumerate(batch):
+            error = errors.get(index)
+            if error is None:
+                self._written(write, index in inserted)
+            elif error.get("code") in RETRYABLE_WRITE_ERRORS and write.attempts + 1 < MAX_WRITE_ATTEMPTS:
+                write.attempts += 1
+                retry.append((key, write))
+            else:
+                logger.error(f"Background write to {collection} dropped: {error.get('errmsg')}",
+                             extra={"filter": {key[1]: str(key[2])}, "code": error.get("code")})
+        if retry:
+            logger.warning(f"Background writes to {collection} failed, requeueing {len(retry)}")
+        return retry
+
+    @staticmethod
+    def _written(write: PendingWrite, inserted: bool):
+        try:
+            if write.on_written:
+                write.on_written()
+            if write.on_inserted and inserted:
+                write.on_inserted()
+        except Exception as e:
+            logger.error(f"Background write callback failed: {str(e)}")
+
+    def _requeue(self, batch: List[Tuple[tuple, PendingWrite]]):
+        for key, write in reversed(batch):
+            newer = self.pending.pop(key, None)
+            if newer is not None:
+                write.merge(newer)
+            self.pending[key] = write
+            self.pending.move_to_end(key, last=False)  # oldest first
+
+    async def flush(self) -> bool:
+        """Write the queued updates; returns False if some failed (they stay queued)."""
+        ok = True
+        while self.pending and ok:
+            batch = [self.pending.popitem(last=False) for _ in range(min(self.batch_size, len(self.pending)))]
+            by_collection: Dict[str, list] = {}
+            for key, write in batch:
+                by_collection.setdefault(key[0], []).append((key, write))
+            for collection, writes in by_collection.items():
+                retry = await self._write(collection, writes)
+                if retry:
+                    self._requeue(retry)
+                    ok = False
+        return ok
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_needed.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_needed.clear()
+            count = len(self.pending)
+            if not count:
+                continue
+            try:
+                started = time.perf_counter()
+                await self.flush()
+                logger.debug("Background writes flushed", extra={
+                    "documents": count, "ms": round((time.perf_counter() - started) * 1000, 1),
+                })
+            except Exception as e:
+                logger.error(f"Background write flush failed: {str(e)}")
+
+    async def close(self, timeout: float = 10.0):
+        """Drain what is left, retrying failed writes until ``timeout``, then stop queueing."""
+        deadline = time.monotonic() + timeout
+        # Updates submitted meanwhile (e.g. by on_inserted callbacks) are written by the same
+        # loop: flush only returns True once nothing is pending
+        while not await self.flush():
+            if time.monotonic() >= deadline:
+                logger.error("Background writes lost on shutdown", extra={"documents": len(self.pending)})
+                break
+            await asyncio.sleep(0.5)
+        self._closed = True
+
+
+_runner: Optional[WriteBehind] = None
+
+
+def get_write_behind() -> WriteBehind:
+    global _runner
+    if _runner is None:
+        _runner = WriteBehind(
+            max_pending=settings.WRITE_BEHIND_MAX_PENDING,
+            flush_seconds=settings.WRITE_BEHIND_FLUSH_SECONDS,
+        )
+    return _runner
@@ -0,0 +1,59 @@
+# app/utils/etag.py
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Request, Response
+
+# Browsers store the response but revalidate it with If-None-Match on every use
+REVALIDATE = "private, no-cache"
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True when ``If-None-Match`` lists ``etag`` (weak comparison, as for GET requests)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in tags
+
+
+def not_modified(etag: str, cache_control: str = REVALIDATE) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def set_etag(response: Response, etag: str, cache_control: str = REVALIDATE):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+
+
+class RevisionCache:
+    """
+    Per-worker LRU of the current ETag of recently read resources, so a matching
+    ``If-None-Match`` can be answered with a 304 without reading the database.
+
+    Writes made by this worker invalidate their entry; writes made by other workers are
+    picked up once the entry is older than ``ttl``.
+    """
+
+    def __init__(self, ttl: float = 5.0, max_entries: int = 100_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.entries.get(key)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            return None
+        return entry[0]
+
+    def put(self, key: str, etag: str):
+        self.entries[key] = (etag, time.monotonic())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, key: str):
+        self.entries.pop(key, None)
@@ -0,0 +1,82 @@
+# app/utils/streaming.py
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Callable, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+try:
+    import brotli
+except ImportError:  # brotli is optional: gzip is offered without it
+    brotli = None
+
+# Lines are sent once this many bytes are pending (and at the end of every source batch)
+FLUSH_BYTES = 64 * 1024
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Preferred supported content coding of an Accept-Encoding header (brotli, then gzip), None for identity."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    supported = ("br", "gzip") if brotli is not None else ("gzip",)
+    best = max(supported, key=lambda coding: accepted.get(coding, accepted.get("*", 0.0)))
+    return best if accepted.get(best, accepted.get("*", 0.0)) > 0 else None
+
+
+def _compressor(encoding: Optional[str]) -> Tuple[Callable[[bytes], bytes], Callable[[], bytes], Callable[[], bytes]]:
+    """(compress, flush, finish) functions of a streaming compressor."""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=5)
+        return compressor.process, compressor.flush, compressor.finish
+    if encoding == "gzip":
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+        return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+    return (lambda data: data), (lambda: b""), (lambda: b"")
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+async def encode_ndjson(batches: AsyncIterator[list], encoding: Optional[str]) -> AsyncIterator[bytes]:
+    """
+    One JSON line per record, compressed incrementally. The compressor is flushed at the end
+    of every batch, so the client can decode the records of a batch as soon as it arrives.
+    """
+    compress, flush, finish = _compressor(encoding)
+    async for batch in batches:
+        pending = []
+        size = 0
+        for record in batch:
+            line = json.dumps(record, default=_default, ensure_ascii=False).encode("utf-8") + b"\n"
+            pending.append(line)
+            size += len(line)
+            if size >= FLUSH_BYTES:
+                yield compress(b"".join(pending))
+                pending, size = [], 0
+        yield compress(b"".join(pending)) + flush()
+    yield finish()
+
+
+def ndjson_response(request: Request, batches: AsyncIterator[list], headers: Optional[dict] = None) -> StreamingResponse:
+    """Stream record batches as NDJSON, compressed with the coding the client prefers."""
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(encode_ndjson(batches, encoding), media_type="application/x-ndjson", headers=headers)
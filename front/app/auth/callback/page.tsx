@@ -3,6 +3,8 @@
 import { useEffect, useState } from 'react';
 import { useRouter } from 'next/navigation';
 
+const API_BASE = process.env.NEXT_PUBLIC_API_BASE_URL || 'http://localhost:8000';
+
 export default function AuthCallbackPage() {
     const router = useRouter();
     const [status, setStatus] = useState<string>('Traitement de la connexion...');
@@ -21,8 +23,32 @@ export default function AuthCallbackPage() {
             const accessToken = params.get('access_token');
             const tokenType = params.get('token_type');
             const userParam = params.get('user');
+            const code = params.get('code');
+
+            // Handoff flow: backend stores tokens in HttpOnly cookies and redirects with a
+            // single-use ?code=..., exchanged once for the user
+            if (code) {
+                window.history.replaceState({}, document.title, window.location.pathname);
+                fetch(`${API_BASE}/api/v1/auth/handoff`, {
+                    method: 'POST',
+                    credentials: 'include',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ code }),
+                })
+                    .then((res) => {
+                        // An expired or already used code still leaves the session cookies set
+                        if (!res.ok && res.status !== 404) throw new Error(`HTTP ${res.status}`);
+                        setStatus('Connexion réussie — redirection...');
+                        router.replace('/account');
+                    })
+                    .catch((e) => {
+                        console.error('Erreur lors de l’échange du code de connexion:', e);
+                        setStatus("Échec de l'authentification: échange du code impossible");
+                    });
+                return;
+            }
 
-            // New flow: backend stores tokens in HttpOnly cookies and redirects with ?user=...
+            // Legacy flow: backend redirects with the user JSON in ?user=...
             // If access_token is missing but user JSON is present, consider the login successful
             if (!accessToken && !userParam) {
                 const err = params.get('error') || 'Jeton d’accès manquant';
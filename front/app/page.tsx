@@ -11,6 +11,7 @@ import { mockProducts } from '../data/mockProducts';
 import { filterProducts, generateBotResponse } from '../utils/productUtils';
 import { addGuestFavorite, removeGuestFavorite, getGuestFavorites } from '../utils/favorites';
 import { on } from '../utils/events';
+import { trackFeedback } from '../utils/feedback';
 
 export default function Home() {
   const [chatState, setChatState] = useState<ChatState>({
@@ -98,6 +99,7 @@ export default function Home() {
   };
 
   const handleProductClick = (product: Product) => {
+    trackFeedback('click', product.name, chatState.currentSearchQuery);
     setSelectedProduct(product);
     setIsModalOpen(true);
   };
@@ -108,11 +110,13 @@ export default function Home() {
       newFavorites.delete(productName);
       // remove from guest favorites storage as well
       removeGuestFavorite(productName);
+      trackFeedback('unfavorite', productName, chatState.currentSearchQuery);
       pushToast(`"${productName}" retiré des favoris`);
     } else {
       newFavorites.add(productName);
       // add to guest favorites storage
       addGuestFavorite(productName);
+      trackFeedback('favorite', productName, chatState.currentSearchQuery);
       pushToast(`"${productName}" ajouté aux favoris`);
     }
 
@@ -129,16 +133,20 @@ export default function Home() {
     if (type === 'like') {
       if (newLikedProducts.has(productName)) {
         newLikedProducts.delete(productName);
+        trackFeedback('unlike', productName, chatState.currentSearchQuery);
       } else {
         newLikedProducts.add(productName);
         newDislikedProducts.delete(productName);
+        trackFeedback('like', productName, chatState.currentSearchQuery);
       }
     } else {
       if (newDislikedProducts.has(productName)) {
         newDislikedProducts.delete(productName);
+        trackFeedback('undislike', productName, chatState.currentSearchQuery);
       } else {
         newDislikedProducts.add(productName);
         newLikedProducts.delete(productName);
+        trackFeedback('dislike', productName, chatState.currentSearchQuery);
       }
     }
 
@@ -2,6 +2,7 @@
 
 import { useState, useRef, useEffect } from 'react';
 import { ChatMessage, Product } from '../types';
+import { imageUrl } from '../utils/images';
 
 interface ChatInterfaceProps {
     onSendMessageAction: (message: string) => void;
@@ -143,7 +144,7 @@ export default function ChatInterface({
                                 {/* Product Image Container */}
                                 <div className="relative w-full h-20 mb-2">
                                     <img
-                                        src={product.image}
+                                        src={imageUrl(product.image, 'thumb')}
                                         loading="lazy"
                                         onError={(e) => {
                                             const target = e.target as HTMLImageElement;
@@ -3,6 +3,7 @@
 import { useEffect, useMemo, useRef, useState } from 'react';
 import { Product } from '../types';
 import { addGuestFavorite, removeGuestFavorite, getGuestFavorites } from '../utils/favorites';
+import { imageUrl } from '../utils/images';
 
 interface ProductModalProps {
     product: Product | null;
@@ -173,7 +174,7 @@ export default function ProductModal({ product, isOpen, onCloseAction, onAddToCa
                             <div ref={carouselRef} onTouchStart={onTouchStart} onTouchMove={onTouchMove} onTouchEnd={onTouchEnd} style={{ touchAction: 'pan-y' }} className="flex overflow-x-auto snap-x snap-mandatory scroll-smooth">
                                 {images.map((src, i) => (
                                     <div key={i} className="flex-shrink-0 w-full md:w-[420px] h-64 md:h-80 snap-center relative">
-                                        <img src={src} alt={`${product.name} ${i + 1}`} className="w-full h-full object-cover cursor-zoom-in" onClick={() => setZoomOpen(true)} onError={(e) => { (e.target as HTMLImageElement).onerror = null; (e.target as HTMLImageElement).src = 'https://placehold.co/420x300/9CA3AF/ffffff?text=Img'; }} />
+                                        <img src={imageUrl(src, 'modal')} alt={`${product.name} ${i + 1}`} className="w-full h-full object-cover cursor-zoom-in" onClick={() => setZoomOpen(true)} onError={(e) => { (e.target as HTMLImageElement).onerror = null; (e.target as HTMLImageElement).src = 'https://placehold.co/420x300/9CA3AF/ffffff?text=Img'; }} />
                                     </div>
                                 ))}
                                 {/* Centered arrows overlay */}
@@ -377,7 +378,7 @@ function ZoomOverlay({ images, index, setIndex, onClose }: { images: string[]; i
                 ✕
             </button>
             <button className="absolute left-4 text-white p-2 rounded bg-black/50" onClick={e => { e.stopPropagation(); setIndex((index - 1 + images.length) % images.length); }} aria-label="Précédent">‹</button>
-            <img src={images[index]} alt={`zoom-${index}`} className="max-w-full max-h-full object-contain" onClick={e => e.stopPropagation()} onError={e => { (e.target as HTMLImageElement).onerror = null; (e.target as HTMLImageElement).src = 'https://placehold.co/1200x900/9CA3AF/ffffff?text=Img'; }} />
+            <img src={imageUrl(images[index], 'zoom')} alt={`zoom-${index}`} className="max-w-full max-h-full object-contain" onClick={e => e.stopPropagation()} onError={e => { (e.target as HTMLImageElement).onerror = null; (e.target as HTMLImageElement).src = 'https://placehold.co/1200x900/9CA3AF/ffffff?text=Img'; }} />
             <button className="absolute right-4 text-white p-2 rounded bg-black/50" onClick={e => { e.stopPropagation(); setIndex((index + 1) % images.length); }} aria-label="Suivant">›</button>
         </div>
     );
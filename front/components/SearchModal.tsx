@@ -4,6 +4,7 @@ import { useEffect, useMemo, useRef, useState } from "react";
 import { Product } from "../types";
 import { mockProducts } from "../data/mockProducts";
 import { emit } from "../utils/events";
+import { imageUrl } from "../utils/images";
 
 interface SearchModalProps {
     open: boolean;
@@ -260,7 +261,7 @@ export default function SearchModal({ open, onCloseAction }: SearchModalProps) {
                             <div key={p.name} style={{ transitionDelay: `${i * 40}ms` }} className={`border rounded-xl overflow-hidden flex flex-col transform transition-all duration-300 card-enter card-hover ${entered ? 'opacity-100 translate-y-0' : 'opacity-0 translate-y-2'}`}>
                                 {/* Large image top with price overlay */}
                                 <div className="relative w-full card-image-lg bg-gray-50 img-zoom">
-                                    <img loading="lazy" src={p.image} alt={p.name} className="w-full h-full object-cover" onError={(e) => { const t = e.target as HTMLImageElement; t.onerror = null; t.src = 'https://placehold.co/320x200/9CA3AF/ffffff?text=Img'; }} />
+                                    <img loading="lazy" src={imageUrl(p.image, 'card')} alt={p.name} className="w-full h-full object-cover" onError={(e) => { const t = e.target as HTMLImageElement; t.onerror = null; t.src = 'https://placehold.co/320x200/9CA3AF/ffffff?text=Img'; }} />
                                     <div className="absolute right-3 bottom-3 price-pill-brand text-sm">{p.price}</div>
                                 </div>
 
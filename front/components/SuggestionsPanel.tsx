@@ -3,6 +3,7 @@
 import { useState, useEffect, useRef, useCallback } from 'react';
 import { Product, SortKey } from '../types';
 import { sortProducts } from '../utils/productUtils';
+import { imageUrl } from '../utils/images';
 
 interface SuggestionsPanelProps {
     products: Product[];
@@ -167,7 +168,7 @@ export default function SuggestionsPanel({
                                 <div className="relative w-full card-image-lg bg-gray-50 img-zoom">
                                     <img
                                         loading="lazy"
-                                        src={product.image}
+                                        src={imageUrl(product.image, 'card')}
                                         onError={(e) => {
                                             const target = e.target as HTMLImageElement;
                                             target.onerror = null;
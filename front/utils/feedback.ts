@@ -0,0 +1,68 @@
+export type FeedbackType = 'like' | 'unlike' | 'dislike' | 'undislike' | 'favorite' | 'unfavorite' | 'click' | 'view';
+
+interface FeedbackEvent {
+    type: FeedbackType;
+    product_name: string;
+    query?: string;
+    ts: string;
+}
+
+const FLUSH_SIZE = 20;
+const FLUSH_DELAY_MS = 3000;
+const SESSION_KEY = 'touskie_session_id';
+
+let queue: FeedbackEvent[] = [];
+let timer: ReturnType<typeof setTimeout> | null = null;
+
+function endpoint() {
+    const base = process.env.NEXT_PUBLIC_API_BASE_URL || 'http://localhost:8000';
+    return `${base.replace(/\/$/, '')}/api/v1/feedback/events`;
+}
+
+function sessionId(): string {
+    try {
+        let id = sessionStorage.getItem(SESSION_KEY);
+        if (!id) {
+            id = Math.random().toString(36).slice(2) + Date.now().toString(36);
+            sessionStorage.setItem(SESSION_KEY, id);
+        }
+        return id;
+    } catch (e) {
+        return '';
+    }
+}
+
+export function flushFeedback() {
+    if (timer) {
+        clearTimeout(timer);
+        timer = null;
+    }
+    if (queue.length === 0) return;
+    const events = queue.splice(0, queue.length);
+    // keepalive lets the request finish when the page is being closed
+    fetch(endpoint(), {
+        method: 'POST',
+        credentials: 'include',
+        keepalive: true,
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ session_id: sessionId(), events }),
+    }).catch(() => {
+        // feedback is best effort
+    });
+}
+
+export function trackFeedback(type: FeedbackType, productName: string, query?: string) {
+    // Only track on the client side
+    if (typeof window === 'undefined') return;
+
+    queue.push({ type, product_name: productName, query: query || undefined, ts: new Date().toISOString() });
+    if (queue.length >= FLUSH_SIZE) {
+        flushFeedback();
+    } else if (!timer) {
+        timer = setTimeout(flushFeedback, FLUSH_DELAY_MS);
+    }
+}
+
+if (typeof window !== 'undefined') {
+    window.addEventListener('pagehide', flushFeedback);
+}
@@ -0,0 +1,24 @@
+export type ImageVariant = 'thumb' | 'card' | 'modal' | 'zoom';
+
+// Images stored by the backend image service are referenced by this path prefix
+const STORED_PREFIX = '/api/v1/images/';
+
+function apiBase() {
+    return (process.env.NEXT_PUBLIC_API_BASE_URL || 'http://localhost:8000').replace(/\/$/, '');
+}
+
+/**
+ * URL of a resized variant of a product image, served by the backend image service.
+ * Stored images map to their immutable variant URL; remote images go through the proxy,
+ * which downloads the original once. Anything else is returned unchanged.
+ */
+export function imageUrl(src: string | undefined, variant: ImageVariant): string {
+    if (!src) return '';
+    if (src.startsWith(STORED_PREFIX)) {
+        return `${apiBase()}${src}/${variant}`;
+    }
+    if (src.startsWith('http://') || src.startsWith('https://')) {
+        return `${apiBase()}/api/v1/images/proxy/${variant}?url=${encodeURIComponent(src)}`;
+    }
+    return src;
+}
@@ -0,0 +1,43 @@
+import asyncio
+import uuid
+from datetime import datetime
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
+
+from app.core.config import settings
+from app.services import analytics_service
+from app.services.analytics_service import AnalyticsService, signup_backfill_pipeline
+
+
+def test_backfill_since_starts_at_its_bucket():
+    pipeline = signup_backfill_pipeline("hour", datetime(2025, 3, 4, 15, 30))
+    assert pipeline[0]["$match"]["$expr"]["$gte"][1] == datetime(2025, 3, 4, 15)
+
+
+def test_backfill_from_mid_bucket_counts_the_whole_bucket(monkeypatch):
+    async def backfill():
+        client = AsyncIOMotorClient(settings.MONGODB_URL, serverSelectionTimeoutMS=2000)
+        try:
+            await client.admin.command("ping")
+        except PyMongoError:
+            client.close()
+            pytest.skip("MongoDB is not reachable")
+        database = client[f"test_analytics_{uuid.uuid4().hex[:8]}"]
+        monkeypatch.setattr(analytics_service, "db", database)
+        try:
+            await database.users.insert_many([
+                {"created_at": datetime(2025, 3, 3, 18), "signup_provider": "google"},
+                {"created_at": datetime(2025, 3, 4, 9), "signup_provider": "google"},
+                {"created_at": datetime(2025, 3, 4, 18), "signup_provider": "google"},
+                {"first_register": datetime(2025, 3, 4, 20), "linked_accounts": [{"provider": "facebook"}]},
+            ])
+            await AnalyticsService().backfill_signups("day", since=datetime(2025, 3, 4, 12))
+            return await database.analytics_rollups.find({}, {"signups": 1}).to_list(length=None)
+        finally:
+            await client.drop_database(database.name)
+            client.close()
+
+    rollups = asyncio.run(backfill())
+    assert rollups == [{"_id": "day:2025-03-04", "signups": {"google": 2, "facebook": 1}}]